@@ -7,17 +7,14 @@ along with a plot and a filtered csv data file. Both the generated results lie i
 
 import os
 import numpy as np
-import matplotlib as mpl
 from subprocess import (PIPE, run)
-import matplotlib.pylab as plt
 
-from util import (read_data, kep_state, rkf78, golay_window)
-from filters import (sav_golay, triple_moving_average)
+from util import (read_data, kep_state, rkf78, instrument)
+from filters import segmentation
 from kep_determination import (lamberts_kalman, interpolation)
 
 
 SOURCE_ABSOLUTE = os.getcwd() + "/src"  # Absolute path of source directory
-os.system("cd %s; git init" % (SOURCE_ABSOLUTE))
 
 
 def untracked_files():
@@ -73,14 +70,10 @@ def process(data_file, error_apriori, name):
     # Get positional data
     data = data_file
 
-    # Apply the Triple moving average filter with window = 3
-    data_after_filter = triple_moving_average.generate_filtered_data(data, 3)
-
-    # Use the golay_window.py script to find the window for the savintzky golay filter based on the error you input
-    window = golay_window.window(error_apriori, data_after_filter)
-
-    # Apply the Savintzky - Golay filter with window = 31 and polynomail parameter = 6
-    data_after_filter = sav_golay.golay(data_after_filter, window, 3)
+    # Apply the Triple moving average filter with window = 3 and the Savintzky - Golay filter with a window based
+    # on the error you input, separately on every segment between two gaps in the data
+    with instrument.timer("filtering"):
+        data_after_filter = segmentation.filter_track(data, error_apriori)
 
     # Compute the residuals between filtered data and initial data and then the sum and mean values of each axis
     res = data_after_filter[:, 1:4] - data[:, 1:4]
@@ -98,17 +91,20 @@ def process(data_file, error_apriori, name):
     # Save the filtered data into a new csv called "filtered"
     np.savetxt(os.getcwd() + "/dst/" + "%s_filtered.csv" % (name), data_after_filter, delimiter=",")
     # Apply Lambert's solution for the filtered data set
-    kep_lamb = lamberts_kalman.create_kep(data_after_filter)
+    with instrument.timer("lambert"):
+        kep_lamb = lamberts_kalman.create_kep(data_after_filter)
     # Apply the interpolation method
-    kep_inter = interpolation.main(data_after_filter)
+    with instrument.timer("interpolation"):
+        kep_inter = interpolation.main(data_after_filter)
 
     # Apply Kalman filters to find the best approximation of the keplerian elements for both solutions
     # set we a estimate of measurement vatiance R = 0.01 ** 2
-    kep_final_lamb = lamberts_kalman.kalman(kep_lamb, 0.01 ** 2)
-    kep_final_lamb = np.transpose(kep_final_lamb)
+    with instrument.timer("kalman"):
+        kep_final_lamb = lamberts_kalman.kalman(kep_lamb, 0.01 ** 2)
+        kep_final_lamb = np.transpose(kep_final_lamb)
 
-    kep_final_inter = lamberts_kalman.kalman(kep_inter, 0.01 ** 2)
-    kep_final_inter = np.transpose(kep_final_inter)
+        kep_final_inter = lamberts_kalman.kalman(kep_inter, 0.01 ** 2)
+        kep_final_inter = np.transpose(kep_final_inter)
 
     kep_final_lamb[5, 0] = kep_final_inter[5, 0]
 
@@ -131,12 +127,17 @@ def process(data_file, error_apriori, name):
     x = state
     h = 0.1
     tetol = 1e-04
-    for i in range(0, 150):
-        keep_state[:, i] = np.ravel(rkf78.rkf78(6, ti, tf, h, tetol, x))
-        t_hold[i, 0] = tf
-        tf = tf + 1
+    with instrument.timer("propagation"):
+        for i in range(0, 150):
+            keep_state[:, i] = np.ravel(rkf78.rkf78(6, ti, tf, h, tetol, x))
+            t_hold[i, 0] = tf
+            tf = tf + 1
     positions = keep_state[0:3, :]
 
+    # matplotlib is imported only when a plot is produced
+    import matplotlib as mpl
+    import matplotlib.pylab as plt
+
     mpl.rcParams['legend.fontsize'] = 10
     fig = plt.figure()
     ax = fig.gca(projection='3d')
@@ -154,6 +155,7 @@ def process(data_file, error_apriori, name):
 
 def main():
 
+    os.system("cd %s; git init" % (SOURCE_ABSOLUTE))
     while True:
         raw_files = untracked_files()
         if not raw_files:
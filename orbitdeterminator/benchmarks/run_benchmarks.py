@@ -0,0 +1,217 @@
+'''
+Benchmarks the filters, the orbit determination methods and the propagators on synthetic tracks.
+
+Results are stored as JSON so that two runs can be compared:
+
+    python benchmarks/run_benchmarks.py -o new.json
+    python benchmarks/run_benchmarks.py -o new.json --compare old.json --tolerance 1.25
+
+The comparison exits with status 1 if any benchmark got slower than tolerance times its previous best time.
+'''
+
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+
+import json
+import time
+import argparse
+import platform
+import numpy as np
+
+from util import (synthetic_track, kep_state, rkf78)
+
+# ISS like orbit used for all the synthetic tracks
+_KEP = np.array([6785.6420, 0.0003456, 51.6418, 290.0933, 266.6543, 212.4306])
+
+
+def _triple_moving_average(track):
+    from filters import triple_moving_average
+    return lambda: triple_moving_average.generate_filtered_data(track, 3)
+
+
+def _sav_golay(track):
+    from filters import sav_golay
+    window = min(31, len(track) - (1 - len(track) % 2))
+    return lambda: sav_golay.golay(track, window, 3)
+
+
+def _sav_golay_irregular(track):
+    from filters import sav_golay
+    window = min(31, len(track) - (1 - len(track) % 2))
+    return lambda: sav_golay.golay(track, window, 3, irregular=True)
+
+
+def _create_kep(track):
+    from kep_determination import lamberts_kalman
+    import pykep
+    return lambda: lamberts_kalman.create_kep(track)
+
+
+def _interpolation(track):
+    from kep_determination import interpolation
+    return lambda: interpolation.main(track)
+
+
+def _gibbs(track):
+    from kep_determination.gibbsMethod import Gibbs
+    points = track[:, 1:4].tolist()
+
+    def run():
+        for i in range(1, len(points) - 1):
+            v2 = Gibbs.gibbs(points[i - 1], points[i], points[i + 1])
+            Gibbs.orbital_elements(points[i], v2)
+    return run
+
+
+def _ellipse_fit(track):
+    from kep_determination import ellipse_fit
+    points = track[:, 1:4]
+    return lambda: ellipse_fit.determine_kep(points)
+
+
+def _state():
+    return np.ravel(kep_state.kep_state(np.reshape(_KEP, (6, 1))))
+
+
+def _cowell_rk4(track):
+    from propagation import cowell
+    s = _state()
+    duration = track[-1, 0] - track[0, 0]
+    return lambda: cowell.rk4(s, 0, duration)
+
+
+def _rkf78(track):
+    s = np.reshape(_state(), (6, 1))
+    duration = track[-1, 0] - track[0, 0]
+    return lambda: rkf78.rkf78(6, 0.0, duration, 0.1, 1e-04, s.copy())
+
+
+def _sgp4(track):
+    from propagation.sgp4 import SGP4
+    obj = SGP4()
+    obj.compute_necessary_kep([_KEP[0], _KEP[2], _KEP[4], _KEP[1], _KEP[3], _KEP[5]])
+    return lambda: obj.propagate(0, len(track) - 1)
+
+
+BENCHMARKS = {
+    "triple_moving_average": _triple_moving_average,
+    "sav_golay": _sav_golay,
+    "sav_golay_irregular": _sav_golay_irregular,
+    "create_kep": _create_kep,
+    "interpolation": _interpolation,
+    "gibbs": _gibbs,
+    "ellipse_fit": _ellipse_fit,
+    "cowell_rk4": _cowell_rk4,
+    "rkf78": _rkf78,
+    "sgp4": _sgp4,
+}
+
+
+def run(names=None, length=1000, cadence=1.0, noise=0.01, gap_period=None, gap_fraction=0.0, repeat=3, seed=0):
+    '''
+    Runs the benchmarks on one synthetic track
+
+    Args:
+        names (list): names of the benchmarks to run, all of BENCHMARKS if None
+        length (int): number of points of the synthetic track
+        cadence (float): seconds between two points of the track
+        noise (float): standard deviation of the noise of the track in km
+        gap_period (float): time between two passes in seconds, None for no gaps
+        gap_fraction (float): fraction of every gap_period without observations
+        repeat (int): number of timed runs of every benchmark
+        seed (int): seed of the synthetic track
+
+    Returns:
+        dict: the results, with the track parameters and the machine description under "meta"
+    '''
+    track, _ = synthetic_track.generate_track(_KEP, length=length, cadence=cadence, noise=noise,
+                                              gap_period=gap_period, gap_fraction=gap_fraction, seed=seed)
+    results = {}
+    for name in (names or BENCHMARKS):
+        try:
+            func = BENCHMARKS[name](track)
+        except ImportError as err:
+            results[name] = {"skipped": str(err)}
+            continue
+
+        # untimed warm up run, so lazy imports and caches are not measured
+        func()
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        results[name] = {"min": min(times), "median": float(np.median(times)), "repeat": repeat}
+
+    meta = {
+        "length": len(track), "cadence": cadence, "noise": noise, "gap_period": gap_period,
+        "gap_fraction": gap_fraction, "seed": seed, "python": platform.python_version(),
+        "numpy": np.__version__, "machine": platform.machine(), "platform": platform.platform(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+    return {"meta": meta, "benchmarks": results}
+
+
+def compare(old, new, tolerance=1.25):
+    '''
+    Finds the benchmarks that got slower between two runs
+
+    Args:
+        old (dict): results of the reference run
+        new (dict): results of the new run
+        tolerance (float): allowed ratio between the new and the old best time
+
+    Returns:
+        dict: benchmark name -> ratio new / old for every regression
+    '''
+    regressions = {}
+    for name, res in new["benchmarks"].items():
+        ref = old["benchmarks"].get(name, {})
+        if "min" not in res or "min" not in ref or ref["min"] <= 0:
+            continue
+        ratio = res["min"] / ref["min"]
+        if ratio > tolerance:
+            regressions[name] = ratio
+
+    return regressions
+
+
+def read_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-o', '--output', type=str, help="JSON file for the results", default='benchmarks.json')
+    parser.add_argument('-b', '--benchmarks', type=str, nargs='*', help="benchmarks to run", default=None)
+    parser.add_argument('-n', '--length', type=int, help="number of points of the synthetic track", default=1000)
+    parser.add_argument('--cadence', type=float, help="seconds between observations", default=1.0)
+    parser.add_argument('--noise', type=float, help="noise of the observations in km", default=0.01)
+    parser.add_argument('--gap_period', type=float, help="seconds between two passes", default=None)
+    parser.add_argument('--gap_fraction', type=float, help="fraction of a pass period without data", default=0.0)
+    parser.add_argument('-r', '--repeat', type=int, help="timed runs of every benchmark", default=3)
+    parser.add_argument('-s', '--seed', type=int, help="seed of the synthetic track", default=0)
+    parser.add_argument('-c', '--compare', type=str, help="JSON results of a previous run", default=None)
+    parser.add_argument('-t', '--tolerance', type=float, help="allowed slowdown ratio", default=1.25)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = read_args()
+    results = run(args.benchmarks, args.length, args.cadence, args.noise, args.gap_period, args.gap_fraction,
+                  args.repeat, args.seed)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+    for name, res in sorted(results["benchmarks"].items()):
+        if "skipped" in res:
+            print("%-22s skipped (%s)" % (name, res["skipped"]))
+        else:
+            print("%-22s %10.6f s" % (name, res["min"]))
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        for name, ratio in sorted(regressions.items()):
+            print("REGRESSION %s: %.2fx slower" % (name, ratio))
+        if regressions:
+            sys.exit(1)
@@ -8,23 +8,84 @@ import numpy as np
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
-from scipy.signal import savgol_filter
-from util import read_data
+from util import (read_data, orbit_arrays)
 
 
 
-def golay(data, window, degree):
+def irregular_weights(t, window, degree, chunk=4096):
+    '''
+    Computes the Savintzky-Golay weights for points with irregular times. For every point a polynomial of the given
+    degree is fitted by least squares to the window of points around it, using the true times, and evaluated at the
+    time of the point. Near the ends the first or last full window is used, like the 'interp' mode of
+    scipy.signal.savgol_filter.
+
+    Args:
+        t (numpy array): times of the points, in increasing order
+        window (int): window size, odd
+        degree (int): degree of the polynomial, smaller than window
+        chunk (int): number of points whose local fits are computed together, limits the memory used
+
+    Returns:
+        tuple: (start, weights), the first point of the window of every point and the nxwindow weights, so that the
+        filtered value of point i is weights[i] . values[start[i]:start[i] + window]
+    '''
+    t = np.asarray(t, dtype=float)
+    n = len(t)
+    if window > n:
+        raise ValueError("window must be less than or equal to the size of the data.")
+    if degree >= window:
+        raise ValueError("degree must be less than window.")
+
+    start = np.clip(np.arange(n) - window // 2, 0, n - window)
+    weights = np.empty((n, window))
+    powers = np.arange(degree + 1)
+    e0 = np.zeros(degree + 1)
+    e0[0] = 1.0
+
+    for first in range(0, n, chunk):
+        rows = np.arange(first, min(first + chunk, n))
+        # times of every window relative to its point, scaled to about [-1, 1] for a well conditioned fit
+        dt = t[start[rows, None] + np.arange(window)] - t[rows, None]
+        scale = np.max(np.abs(dt), axis=1, keepdims=True)
+        scale[scale == 0] = 1.0
+        V = (dt / scale)[:, :, None] ** powers
+
+        # the constant coefficient of the fit is e0 . R^-1 Q^T y
+        Q, R = np.linalg.qr(V)
+        u = np.linalg.solve(np.swapaxes(R, 1, 2), np.broadcast_to(e0, (len(rows), degree + 1))[:, :, None])
+        weights[rows] = (Q @ u)[:, :, 0]
+
+    return start, weights
+
+
+def golay(data, window, degree, irregular=False):
     '''
     Apply the Savintzky-Golay filter to a positional data set.
 
     Args:
-        data (numpy array): containing all of the positional data in the format of (time, x, y, z)
+        data (numpy array or StateArray): containing all of the positional data in the format of (time, x, y, z)
         window (int): window size of the Savintzky-Golay filter
         degree (int): degree of the polynomial in Savintzky-Golay filter
+        irregular (bool): fit the polynomials on the true times of the points, for data sets whose points are not
+                          equally spaced in time. The default assumes equal spacing, like scipy.signal.savgol_filter
 
     Returns:
         numpy array: filtered data in the same format
     '''
+    data = orbit_arrays.as_track(data)
+
+    new_positions = np.zeros((len(data), 4))
+    new_positions[:, 0] = data[:, 0]
+
+    if irregular:
+        start, weights = irregular_weights(data[:, 0], window, degree)
+        idx = start[:, None] + np.arange(window)
+        for k in range(1, 4):
+            new_positions[:, k] = np.einsum('ij,ij->i', weights, data[idx, k])
+        return new_positions
+
+    # scipy.signal is slow to import, so load it only when the filter is used
+    from scipy.signal import savgol_filter
 
     x = data[:, 1]
     y = data[:, 2]
@@ -35,11 +96,9 @@ def golay(data, window, degree):
     z_new = savgol_filter(z, window, degree)
 
 
-    new_positions = np.zeros((len(data), 4))
     new_positions[:, 1] = x_new
     new_positions[:, 2] = y_new
     new_positions[:, 3] = z_new
-    new_positions[:, 0] = data[:, 0]
 
     return new_positions
 
@@ -0,0 +1,122 @@
+'''
+Splits a positional data set (time, x, y, z) into segments at the time gaps between passes and filters every
+segment on its own, so that the filters never smooth across a gap. The segments are filtered with the triple moving
+average and the Savintzky - Golay filter, with the Savintzky - Golay window computed from the length of every
+segment, and stitched back together in order.
+'''
+
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from functools import partial
+import numpy as np
+from util import (golay_window, orbit_arrays, instrument)
+from filters import (sav_golay, triple_moving_average)
+
+
+def gap_threshold(data, factor=10.0):
+    '''
+    Default gap threshold: factor times the median time between two consecutive points
+
+    Args:
+        data (numpy array): positional data set in format (time, x, y, z)
+        factor (float): multiple of the median cadence above which a time difference is a gap
+
+    Returns:
+        float: the threshold in seconds
+    '''
+    dt = np.diff(data[:, 0])
+    if len(dt) == 0:
+        return np.inf
+    return factor * np.median(dt)
+
+
+def split_gaps(data, max_gap=None):
+    '''
+    Splits a positional data set at every time difference larger than max_gap
+
+    Args:
+        data (numpy array or StateArray): positional data set in format (time, x, y, z)
+        max_gap (float): largest time difference inside a segment, gap_threshold(data) if None
+
+    Returns:
+        list: the segments in order, as views of data
+    '''
+    data = orbit_arrays.as_track(data)
+    if max_gap is None:
+        max_gap = gap_threshold(data)
+
+    breaks = np.nonzero(np.diff(data[:, 0]) > max_gap)[0] + 1
+    return np.split(data, breaks)
+
+
+def filter_segment(segment, error_apriori, window=3, degree=3, irregular=False):
+    '''
+    Applies the triple moving average and the Savintzky - Golay filter to one segment without gaps
+
+    Args:
+        segment (numpy array): positional data set in format (time, x, y, z)
+        error_apriori (float): apriori estimation of the measurements error in km
+        window (int): window of the triple moving average
+        degree (int): degree of the polynomial in Savintzky-Golay filter
+        irregular (bool): fit the Savintzky-Golay polynomials on the true times, see sav_golay.golay
+
+    Returns:
+        numpy array: the filtered segment, in the same format
+    '''
+    filtered = triple_moving_average.generate_filtered_data(segment, window)
+
+    # the window has to be odd, larger than the degree and not longer than the segment
+    shortest = degree + 1 + degree % 2
+    longest = len(segment) - (1 - len(segment) % 2)
+    if longest < shortest:
+        return filtered
+    # sub-timer of "filtering", which the callers wrap around the whole filter
+    with instrument.timer("filtering.window_selection"):
+        golay = min(max(golay_window.window(error_apriori, filtered), shortest), longest)
+
+    return sav_golay.golay(filtered, golay, degree, irregular)
+
+
+def filter_track(data, error_apriori, max_gap=None, workers=1, min_parallel=8, irregular=False):
+    '''
+    Splits a positional data set at its gaps, filters the segments independently and stitches them back together
+
+    Args:
+        data (numpy array or StateArray): positional data set in format (time, x, y, z)
+        error_apriori (float): apriori estimation of the measurements error in km
+        max_gap (float): largest time difference inside a segment, gap_threshold(data) if None
+        workers (int): number of processes used when there are at least min_parallel segments
+        min_parallel (int): smallest number of segments that is filtered in parallel
+        irregular (bool): fit the Savintzky-Golay polynomials on the true times, see sav_golay.golay
+
+    Returns:
+        numpy array: the filtered data set, with the same length and times as data
+    '''
+    return filter_segments(split_gaps(data, max_gap), error_apriori, workers, min_parallel, irregular)
+
+
+def filter_segments(segments, error_apriori, workers=1, min_parallel=8, irregular=False):
+    '''
+    Filters segments returned by split_gaps independently and stitches them back together
+
+    Args:
+        segments (list): the segments of a positional data set in format (time, x, y, z)
+        error_apriori (float): apriori estimation of the measurements error in km
+        workers (int): number of processes used when there are at least min_parallel segments
+        min_parallel (int): smallest number of segments that is filtered in parallel
+        irregular (bool): fit the Savintzky-Golay polynomials on the true times, see sav_golay.golay
+
+    Returns:
+        numpy array: the filtered data set, with the same length and times as the segments
+    '''
+    func = partial(filter_segment, error_apriori=error_apriori, irregular=irregular)
+
+    if workers > 1 and len(segments) >= min_parallel:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            filtered = list(pool.map(func, segments, chunksize=max(1, len(segments) // (4 * workers))))
+    else:
+        filtered = [func(segment) for segment in segments]
+
+    return np.concatenate(filtered)
@@ -8,10 +8,9 @@ n = window size
 import os
 import sys
 import numpy as np
-import matplotlib.pyplot as plt
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
-from mpl_toolkits.mplot3d import Axes3D
 from util import read_data as rd
+from util import orbit_arrays
 
 
 def weighted_average(params):
@@ -68,12 +67,13 @@ def generate_filtered_data(filename, window):
     Apply the filter and generate the filtered data
 
     Args:
-        filename (string): the name of the .csv file containing the positional data
+        filename (numpy array or StateArray): the positional data in the format of (time, x, y, z)
         window (int): window size applied into the filter
 
     Returns:
         numpy array: the final filtered array
     '''
+    filename = orbit_arrays.as_track(filename)
     averaged_x = (triple_moving_average(list(filename[:,1]), window))
     averaged_y = triple_moving_average(list(filename[:,2]), window)
     averaged_z = triple_moving_average(list(filename[:,3]), window)
@@ -84,6 +84,8 @@ def generate_filtered_data(filename, window):
     return output
 
 if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+    from mpl_toolkits.mplot3d import Axes3D
 
     signal = rd.load_data(os.getcwd() + '/' + sys.argv[1])
 
@@ -0,0 +1,281 @@
+'''
+Runs several orbit determination methods on the same filtered data set (time, x, y, z) and combines their results.
+
+The methods are Lambert's solution and the interpolation method followed by the kalman filter, Gibbs' method on
+triplets of points followed by the kalman filter, and the ellipse fit. They run concurrently on a process pool and
+every result is scored with the same residual: the RMS distance in km between the points of the data set and the
+orbit the elements describe, measured in the orbital plane at the argument of latitude of every point. It only
+depends on the shape and the orientation of the orbit, so the elements of all the methods are comparable although
+their true anomalies refer to different points.
+
+Two methods agree when the RMS distance between their orbits at the data points is below the agreement threshold.
+As soon as enough methods agree the methods still running are stopped. The result is the elements of the method with
+the lowest residual or, by default, a blend of the elements of all the methods that agree with it weighted by their
+residuals. The true anomaly of the result is the one of the first point of the data set.
+'''
+
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+
+import time
+import queue
+import multiprocessing
+import numpy as np
+
+from util import (orbit_arrays, instrument)
+
+# in the order they are run, the fastest first
+METHODS = ("gibbs", "interpolation", "ellipse_fit", "lamberts")
+
+
+def _lamberts(data):
+    from kep_determination import lamberts_kalman
+    return lamberts_kalman.kalman(lamberts_kalman.create_kep(data), 0.01 ** 2)
+
+
+def _interpolation(data):
+    from kep_determination import (lamberts_kalman, interpolation)
+    return lamberts_kalman.kalman(interpolation.main(data), 0.01 ** 2)
+
+
+def _gibbs(data, triplets=100):
+    from kep_determination import lamberts_kalman
+    from kep_determination.gibbsMethod import Gibbs
+
+    # the three points of a triplet are a quarter of the data set apart, Gibbs' method needs well separated points
+    spacing = max(1, (len(data) - 1) // 4)
+    first = np.unique(np.linspace(0, len(data) - 1 - 2 * spacing, triplets).astype(int))
+
+    elements = []
+    for i in first:
+        r1, r2, r3 = (list(data[j, 1:4]) for j in (i, i + spacing, i + 2 * spacing))
+        try:
+            elements.append(Gibbs.orbital_elements(r2, Gibbs.gibbs(r1, r2, r3)))
+        except (ValueError, ZeroDivisionError):
+            # degenerate triplets, e.g. collinear points
+            continue
+
+    kep = lamberts_kalman.check_keplerian(orbit_arrays.ElementArray.from_gibbs(elements).elements())
+    return lamberts_kalman.kalman(kep, 0.01 ** 2)
+
+
+def _ellipse_fit(data):
+    from kep_determination import ellipse_fit
+    kep, _ = ellipse_fit.determine_kep(data[:, 1:4])
+    return kep
+
+
+_FUNCTIONS = {
+    "lamberts": _lamberts,
+    "interpolation": _interpolation,
+    "gibbs": _gibbs,
+    "ellipse_fit": _ellipse_fit,
+}
+
+
+def _run_method(name, data):
+    '''
+    Runs one method, the exceptions are returned so that one failing method does not stop the others
+
+    Returns:
+        tuple: (name, elements or None, error message or None, seconds)
+    '''
+    start = time.perf_counter()
+    try:
+        kep = np.ravel(_FUNCTIONS[name](data))[0:6].astype(float)
+        if len(kep) < 6 or not np.all(np.isfinite(kep)):
+            raise ValueError("no valid set of elements")
+        return name, kep, None, time.perf_counter() - start
+    except Exception as err:
+        return name, None, "%s: %s" % (type(err).__name__, err), time.perf_counter() - start
+
+
+def orbit_points(kep, data):
+    '''
+    Computes the points of the orbit at the argument of latitude of every point of the data set
+
+    Args:
+        kep (numpy array): keplerian elements (a, e, i, ω, Ω, v), the true anomaly is not used
+        data (numpy array): positional data set in (time, x, y, z) format
+
+    Returns:
+        tuple: (nx3 points of the orbit, arguments of latitude of the data points in radians)
+    '''
+    a, e = kep[0], kep[1]
+    inc, argp, raan = np.radians(kep[2:5])
+
+    # unit vectors towards the ascending node and 90 degrees ahead of it in the orbital plane
+    node = np.array([np.cos(raan), np.sin(raan), 0.0])
+    ahead = np.array([-np.sin(raan) * np.cos(inc), np.cos(raan) * np.cos(inc), np.sin(inc)])
+
+    r = data[:, 1:4]
+    u = np.arctan2(r.dot(ahead), r.dot(node))
+    radius = a * (1 - e ** 2) / (1 + e * np.cos(u - argp))
+
+    return radius[:, None] * (np.cos(u)[:, None] * node + np.sin(u)[:, None] * ahead), u
+
+
+def shape_residual(kep, data):
+    '''
+    Common residual of all the methods
+
+    Args:
+        kep (numpy array): keplerian elements (a, e, i, ω, Ω, v)
+        data (numpy array): positional data set in (time, x, y, z) format
+
+    Returns:
+        float: RMS distance in km between the data points and the orbit
+    '''
+    points, _ = orbit_points(kep, data)
+    return np.sqrt(np.mean(np.sum((points - data[:, 1:4]) ** 2, axis=1)))
+
+
+def orbit_distance(kep1, kep2, data):
+    '''
+    Distance between two orbits
+
+    Args:
+        kep1 (numpy array): keplerian elements (a, e, i, ω, Ω, v)
+        kep2 (numpy array): keplerian elements (a, e, i, ω, Ω, v)
+        data (numpy array): positional data set in (time, x, y, z) format
+
+    Returns:
+        float: RMS distance in km between the points of the two orbits closest to the data points
+    '''
+    points1, _ = orbit_points(kep1, data)
+    points2, _ = orbit_points(kep2, data)
+    return np.sqrt(np.mean(np.sum((points1 - points2) ** 2, axis=1)))
+
+
+def first_anomaly(kep, data):
+    '''
+    Returns:
+        float: true anomaly of the first point of the data set on the orbit of kep, in degrees
+    '''
+    _, u = orbit_points(kep, data[0:1])
+    return np.degrees(u[0] - np.radians(kep[3])) % 360.0
+
+
+def blend(keps, residuals, data):
+    '''
+    Averages sets of keplerian elements weighted by the inverse of their squared residuals, the angles are averaged
+    on the circle
+
+    Args:
+        keps (numpy array): mx6 sets of keplerian elements (a, e, i, ω, Ω, v)
+        residuals (numpy array): shape residual of every set
+        data (numpy array): positional data set in (time, x, y, z) format
+
+    Returns:
+        numpy array: the blended elements, with the true anomaly of the first point of the data set
+    '''
+    keps = np.asarray(keps, dtype=float)
+    w = 1 / np.maximum(np.asarray(residuals, dtype=float), 1e-12) ** 2
+    w = w / np.sum(w)
+
+    kep = np.empty(6)
+    kep[0:3] = w.dot(keps[:, 0:3])
+    angles = np.radians(keps[:, 3:5])
+    kep[3:5] = np.degrees(np.arctan2(w.dot(np.sin(angles)), w.dot(np.cos(angles)))) % 360.0
+    kep[5] = first_anomaly(kep, data)
+
+    return kep
+
+
+def _failed(name, err):
+    '''
+    Failure record of a method whose worker raised or whose result could not be sent back, in the format of
+    _run_method
+    '''
+    return name, None, "%s: %s" % (type(err).__name__, err), float("nan")
+
+
+def _agreeing(results, name, agreement, data):
+    return [other for other in results
+            if orbit_distance(results[name]["kep"], results[other]["kep"], data) <= agreement]
+
+
+def _quorum(results, agreement, quorum, data):
+    return any(len(_agreeing(results, name, agreement, data)) >= quorum for name in results)
+
+
+def determine(data, methods=METHODS, agreement=1.0, quorum=2, workers=None, blended=True, timeout=None):
+    '''
+    Runs the methods concurrently and combines their results
+
+    Args:
+        data (numpy array or StateArray): filtered positional data set in (time, x, y, z) format
+        methods (tuple): methods to run, from METHODS
+        agreement (float): distance in km between two orbits below which they agree
+        quorum (int): number of agreeing methods after which the methods still running are stopped, None to wait
+                      for all of them
+        workers (int): number of processes, one per method if None, 1 runs the methods in order in this process
+        blended (bool): blend the elements of the methods that agree with the best one instead of picking it
+        timeout (float): seconds to wait for the methods running on the pool, the ones that did not finish by then
+                         are stopped, e.g. when their worker died. No limit if None
+
+    Returns:
+        dict: "kep" the final elements (a, e, i, ω, Ω, v) with the true anomaly of the first point, "best" the
+        method with the lowest residual, "agreeing" the methods that agree with it, "results" for every finished
+        method its "kep", "residual" and "time" or its "error", and "stopped" the methods that did not finish
+    '''
+    data = np.asarray(orbit_arrays.as_track(data), dtype=float)
+    for name in methods:
+        if name not in _FUNCTIONS:
+            raise ValueError("unknown method %r, expected one of %s" % (name, METHODS))
+
+    results, errors = {}, {}
+
+    def collect(output):
+        name, kep, error, seconds = output
+        if error is not None:
+            errors[name] = {"error": error, "time": seconds}
+        else:
+            results[name] = {"kep": kep, "residual": shape_residual(kep, data), "time": seconds}
+        return quorum is not None and _quorum(results, agreement, quorum, data)
+
+    workers = workers or len(methods)
+    if workers <= 1:
+        for name in methods:
+            if collect(_run_method(name, data)):
+                break
+    else:
+        done = queue.Queue()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        pool = multiprocessing.Pool(min(workers, len(methods)))
+        try:
+            for name in methods:
+                # a method that cannot report its result is a failed method, not one that never finishes
+                pool.apply_async(_run_method, (name, data), callback=done.put,
+                                 error_callback=lambda err, name=name: done.put(_failed(name, err)))
+            for _ in methods:
+                try:
+                    output = done.get(timeout=None if deadline is None else max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if collect(output):
+                    break
+        finally:
+            # stops the methods that are still running
+            pool.terminate()
+            pool.join()
+
+    stopped = [name for name in methods if name not in results and name not in errors]
+    instrument.count("consensus_methods_failed", len(errors))
+    instrument.count("consensus_methods_stopped", len(stopped))
+    if not results:
+        raise RuntimeError("no method gave a valid set of elements: %s" % errors)
+
+    best = min(results, key=lambda name: results[name]["residual"])
+    agreeing = _agreeing(results, best, agreement, data)
+
+    if blended:
+        kep = blend([results[name]["kep"] for name in agreeing], [results[name]["residual"] for name in agreeing],
+                    data)
+    else:
+        kep = results[best]["kep"].copy()
+        kep[5] = first_anomaly(kep, data)
+
+    results.update(errors)
+    return {"kep": kep, "best": best, "agreeing": agreeing, "results": results, "stopped": stopped}
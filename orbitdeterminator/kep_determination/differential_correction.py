@@ -0,0 +1,190 @@
+'''
+Batch weighted least squares differential correction of a state vector from a positional data set (time, x, y, z).
+
+Starting from an initial estimate of the state at the epoch, e.g. from the interpolation method or Lambert's
+solution, the orbit is propagated to every observation with RK4 and the force model of propagation/cowell.py. The
+state transition matrix is integrated in the same pass from the variational equations, with the jacobian of the
+force model computed by central differences in one batched call of the force model per RK4 stage. The normal
+equations are accumulated observation by observation, so the memory does not grow with the length of the arc, and
+the correction of the state is solved from them. A few iterations are enough when the initial estimate is within
+some km of the orbit. The inverse of the normal matrix of the last iteration is the covariance of the state.
+'''
+
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+
+import numpy as np
+
+from util import (instrument, orbit_arrays)
+from propagation import cowell
+
+# steps of the central differences of the jacobian, in km and km/s
+DELTA = np.array([1e-2, 1e-2, 1e-2, 1e-5, 1e-5, 1e-5])
+
+
+def _derivatives(s, phi, force):
+    '''
+    Time derivatives of the state and of the state transition matrix
+
+    Args:
+        s (numpy array): the state vector [rx,ry,rz,vx,vy,vz]
+        phi (numpy array): 6x6 state transition matrix
+        force (function): batched force model, nx6 states -> nx6 derivatives
+
+    Returns:
+        tuple: (derivative of s, derivative of phi)
+    '''
+    steps = np.diag(DELTA)
+    f = force(np.vstack((s, s + steps, s - steps)))
+
+    # column j of the jacobian comes from the states moved along the j-th component
+    A = ((f[1:7] - f[7:13]) / (2 * DELTA[:, None])).T
+
+    return f[0], A.dot(phi)
+
+
+def propagate_stm(s, phi, t0, tf, h=30, force=cowell.sdot_batch):
+    '''
+    Propagates a state and its state transition matrix with RK4, with the same steps as cowell.rk4
+
+    Args:
+        s (numpy array): the state vector at t0 [rx,ry,rz,vx,vy,vz]
+        phi (numpy array): 6x6 state transition matrix at t0
+        t0 (float): initial time
+        tf (float): final time
+        h (float): step-size
+        force (function): batched force model, cowell.sdot_batch by default
+
+    Returns:
+        tuple: the state and the state transition matrix at tf
+    '''
+    t = t0
+    if tf < t0:
+        h = -h
+
+    while abs(tf - t) > 0.00001:
+        if abs(tf - t) < abs(h):
+            h = tf - t
+
+        k1, l1 = _derivatives(s, phi, force)
+        k2, l2 = _derivatives(s + h * k1 / 2, phi + h * l1 / 2, force)
+        k3, l3 = _derivatives(s + h * k2 / 2, phi + h * l2 / 2, force)
+        k4, l4 = _derivatives(s + h * k3, phi + h * l3, force)
+
+        s = s + h * (k1 + 2 * k2 + 2 * k3 + k4) / 6
+        phi = phi + h * (l1 + 2 * l2 + 2 * l3 + l4) / 6
+        t = t + h
+
+    return s, phi
+
+
+def initial_state(data, points=10):
+    '''
+    Initial estimate of the state at the first point, from the cubic splines of the interpolation method through the
+    first points of the data set
+
+    Args:
+        data (numpy array or StateArray): positional data set in (time, x, y, z) format
+        points (int): number of points used for the splines
+
+    Returns:
+        numpy array: the state vector [rx,ry,rz,vx,vy,vz] at the time of the first point
+    '''
+    from kep_determination import interpolation
+
+    data = orbit_arrays.as_track(data)
+    splines = interpolation.cubic_spline(data[0:points, 0:4])
+    velocity = interpolation.compute_velocity(splines, [data[0, 0]] * 3)
+
+    return np.concatenate((data[0, 1:4], velocity))
+
+
+def differential_correction(data, s0, t0=None, sigma=1.0, max_iterations=10, tol=1e-4, h=30,
+                            force=cowell.sdot_batch):
+    '''
+    Fits a state vector to the positional data set with batch weighted least squares
+
+    Args:
+        data (numpy array or StateArray): positional data set in (time, x, y, z) format, in increasing time order
+        s0 (numpy array): initial estimate of the state vector [rx,ry,rz,vx,vy,vz] at t0
+        t0 (float): epoch of the state, at or before the first point, the time of the first point if None
+        sigma (float or numpy array): standard deviation of the position errors of every point, in km
+        max_iterations (int): maximum number of iterations
+        tol (float): the iterations stop when the weighted RMS of the residuals changes by less than tol, relative
+        h (float): step-size of RK4
+        force (function): batched force model, nx6 states -> nx6 derivatives, cowell.sdot_batch by default
+
+    Returns:
+        dict: "state" the fitted state at the epoch, "epoch", "covariance" its 6x6 covariance, "rms" the RMS of the
+        position residuals in km, "weighted_rms", "iterations" and "converged"
+    '''
+    data = np.asarray(orbit_arrays.as_track(data), dtype=float)
+    t0 = data[0, 0] if t0 is None else t0
+    if np.any(np.diff(data[:, 0]) < 0) or data[0, 0] < t0:
+        raise ValueError("the observations must be in increasing time order and not before the epoch")
+
+    weights = np.broadcast_to(1.0 / np.asarray(sigma, dtype=float) ** 2, (len(data),))
+    x0 = np.array(s0, dtype=float)
+    old_rms, converged = None, False
+
+    for iteration in range(1, max_iterations + 1):
+        instrument.count("differential_correction_iterations")
+        N = np.zeros((6, 6))
+        b = np.zeros(6)
+        ssr, wssr = 0.0, 0.0
+
+        s, phi, t = x0, np.eye(6), t0
+        for obs, w in zip(data, weights):
+            s, phi = propagate_stm(s, phi, t, obs[0], h, force)
+            t = obs[0]
+
+            res = obs[1:4] - s[0:3]
+            H = phi[0:3]
+            N += w * H.T.dot(H)
+            b += w * H.T.dot(res)
+            ssr += res.dot(res)
+            wssr += w * res.dot(res)
+
+        # scaling the normal equations keeps them well conditioned with positions and velocities mixed
+        scale = 1 / np.sqrt(np.diag(N))
+        covariance = scale[:, None] * np.linalg.inv(N * np.outer(scale, scale)) * scale[None, :]
+        x0 = x0 + covariance.dot(b)
+
+        rms = np.sqrt(ssr / (3 * len(data)))
+        weighted_rms = np.sqrt(wssr / (3 * len(data)))
+        if old_rms is not None and abs(old_rms - weighted_rms) <= tol * weighted_rms:
+            converged = True
+            break
+        old_rms = weighted_rms
+
+    return {"state": x0, "epoch": t0, "covariance": covariance, "rms": rms, "weighted_rms": weighted_rms,
+            "iterations": iteration, "converged": converged}
+
+
+if __name__ == "__main__":
+    import argparse
+    import functools
+    from util import read_data
+    from filters import segmentation
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-f', '--file_path', type=str, help="path to .csv data file", default='orbit.csv')
+    parser.add_argument('-u', '--units', type=str, help="m for metres, k for kilometres", default='m')
+    parser.add_argument('-e', '--error', type=float, help="estimation of the measurement error in km", default=10.0)
+    parser.add_argument('-n', '--points', type=int, help="number of points of the arc", default=2000)
+    parser.add_argument('-j', '--degree', type=int, help="degree of the zonal harmonics, 2 to 6", default=2)
+    args = parser.parse_args()
+
+    data = read_data.load_data(args.file_path)[0:args.points]
+    if args.units == 'm':
+        data[:, 1:4] = data[:, 1:4] / 1000
+
+    # the initial estimate comes from the filtered data, the fit uses the observations
+    s0 = initial_state(segmentation.filter_track(data, args.error))
+    solution = differential_correction(data, s0, sigma=args.error,
+                                       force=functools.partial(cowell.sdot_batch, degree=args.degree))
+
+    print("state at %f: %s" % (solution["epoch"], solution["state"]))
+    print("standard deviations:", np.sqrt(np.diag(solution["covariance"])))
+    print("rms %.6f km after %d iterations" % (solution["rms"], solution["iterations"]))
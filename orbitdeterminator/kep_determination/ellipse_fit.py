@@ -5,9 +5,6 @@
 import math
 import argparse
 import numpy as np
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d import Axes3D
-from scipy.optimize import minimize
 from functools import partial
 
 def __read_args():
@@ -239,6 +236,9 @@ def determine_kep(data):
            res[2] - residuals in z axis
     """
 
+    # scipy.optimize is slow to import, so load it only when fitting
+    from scipy.optimize import minimize
+
     # try to fit a plane to the data first.
 
     # make a partial function of plane_err by supplying the data
@@ -362,6 +362,9 @@ def plot_kep(kep,data):
            nothing
     """
 
+    import matplotlib.pyplot as plt
+    from mpl_toolkits.mplot3d import Axes3D
+
     a = kep[0]
     e = kep[1]
     inc = math.radians(kep[2])
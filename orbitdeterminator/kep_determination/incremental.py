@@ -0,0 +1,135 @@
+'''
+Incremental orbit determination: the keplerian elements are updated as new blocks of observations arrive, instead
+of recomputing Lambert's solution, the splines and the kalman filters for the whole data set.
+
+Only the last point of the previous block is kept, so appending a block solves the Lambert problems and the splines
+of the new pairs of points only, and continues the running kalman filter of every element channel with the new sets
+of elements. The cost of an append is proportional to the number of new points.
+
+The kalman filter starts from the mean of the first sets of elements, like lamberts_kalman.kalman, so when all the
+points are appended in one block the estimate is the same as the one of main.process for the same points.
+'''
+
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+
+import numpy as np
+
+from util import orbit_arrays
+from kep_determination import (lamberts_kalman, interpolation)
+
+METHODS = ("lamberts", "interpolation")
+
+
+class _Channel(object):
+    '''
+    Running kalman filter of the six element channels of one method
+    '''
+
+    def __init__(self, R):
+        self.R = R
+        self.xhat = None
+        self.P = 1.0
+        self.count = 0
+
+    def update(self, kep):
+        if len(kep) == 0:
+            return
+        self.count += len(kep)
+
+        if self.xhat is None:
+            # the mean value of the first sets is the initial guess, as in lamberts_kalman.kalman
+            self.xhat = np.mean(kep, axis=0)
+            kep = kep[1:]
+        self.xhat, self.P = lamberts_kalman.kalman_update(kep, self.xhat, self.P, self.R)
+
+
+class IncrementalOD(object):
+    '''
+    Orbit determination that is updated block by block as the observations arrive
+
+    The blocks must be in time order and already filtered, e.g. with filters.segmentation.filter_segment.
+    '''
+
+    def __init__(self, R=0.01 ** 2, methods=METHODS):
+        '''
+        Args:
+            R (float): estimate of measurement variance of the kalman filters
+            methods (tuple): the methods used, "lamberts" and / or "interpolation"
+        '''
+        for method in methods:
+            if method not in METHODS:
+                raise ValueError("unknown method %r, expected one of %s" % (method, METHODS))
+
+        self.methods = tuple(methods)
+        self.channels = {method: _Channel(R) for method in self.methods}
+        self.last = None
+        self.traj = None
+        self.n_points = 0
+
+    def append(self, block):
+        '''
+        Adds a block of observations and updates the elements with the pairs of points it forms
+
+        Args:
+            block (numpy array or StateArray): positional data in (time, x, y, z) format, later than all the points
+                                               appended before
+
+        Returns:
+            dict: method -> current estimate of the keplerian elements, see elements
+        '''
+        block = np.asarray(orbit_arrays.as_track(block), dtype=float)[:, 0:4]
+        if len(block) == 0:
+            return self.estimates()
+        if np.any(np.diff(block[:, 0]) <= 0) or (self.last is not None and block[0, 0] <= self.last[0]):
+            raise ValueError("the observations must be appended in strictly increasing time order")
+
+        # the last point of the previous block forms a pair with the first point of this one
+        points = block if self.last is None else np.vstack((self.last, block))
+        pairs = len(points) - 1
+
+        if pairs > 0 and "lamberts" in self.channels:
+            if self.traj is None:
+                self.traj = lamberts_kalman.orbit_trajectory(list(points[0, 1:4]), list(points[1, 1:4]),
+                                                             points[1, 0] - points[0, 0])
+            kep = lamberts_kalman.create_kep_range(points, 0, pairs, self.traj)
+            self.channels["lamberts"].update(lamberts_kalman.check_keplerian(kep))
+
+        if pairs > 0 and "interpolation" in self.channels:
+            self.channels["interpolation"].update(interpolation.interpolate_range(points, 0, pairs))
+
+        self.last = block[-1].copy()
+        self.n_points += len(block)
+
+        return self.estimates()
+
+    def elements(self, method="lamberts"):
+        '''
+        Current estimate of one method
+
+        Args:
+            method (string): "lamberts" or "interpolation"
+
+        Returns:
+            numpy array: keplerian elements (a, e, i, ω, Ω, v) of shape (1, 6) like lamberts_kalman.kalman, None if
+            no set of elements has been computed yet
+        '''
+        channel = self.channels[method]
+        if channel.xhat is None:
+            return None
+        return channel.xhat[np.newaxis, :].copy()
+
+    def estimates(self):
+        '''
+        Returns:
+            dict: method -> current estimate of the keplerian elements, see elements
+        '''
+        return {method: self.elements(method) for method in self.methods}
+
+    def counts(self):
+        '''
+        Returns:
+            dict: method -> number of sets of elements the estimate is based on
+        '''
+        return {method: channel.count for method, channel in self.channels.items()}
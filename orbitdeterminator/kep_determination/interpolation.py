@@ -6,9 +6,8 @@ import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
 
 import numpy as np
-from scipy.interpolate import CubicSpline
 
-from util import (state_kep, read_data)
+from util import (state_kep, read_data, orbit_arrays)
 
 
 def cubic_spline(orbit_data):
@@ -22,6 +21,9 @@ def cubic_spline(orbit_data):
     Returns:
         list: component wise cubic splines of orbit data points of the format [spline_x, spline_y, spline_z]
     '''
+    # scipy.interpolate is slow to import, so load it only when splines are needed
+    from scipy.interpolate import CubicSpline
+
     time = orbit_data[:,:1]
     coordinates = list([orbit_data[:,1:2], orbit_data[:,2:3], orbit_data[:,3:4]])
     splines = list(map(lambda a:CubicSpline(time.ravel(),a.ravel()), coordinates))
@@ -45,22 +47,25 @@ def compute_velocity(spline, point):
 
     return np.array(velocity)
 
-def main(data_points):
+def interpolate_range(data_points, start, stop):
     '''
-    Apply the whole process of interpolation for keplerian element computation
+    Computes the keplerian elements for the points start to stop - 1 from the spline through every point and the
+    next one. This is the part of main that is independent for every point, it is used by main and by the parallel
+    version in kep_determination/parallel.py
 
     Args:
-        data_points (numpy array): positional data set in format of (x, y, z, time)
+        data_points (numpy array): positional data set in format of (time, x, y, z)
+        start (int): index of the first point
+        stop (int): index after the last point, at most len(data_points) - 1
 
     Returns:
-        numpy array: computed keplerian elements for every point of the orbit
+        numpy array: computed keplerian elements for every point in the range
     '''
 
     velocity_vectors = []
     keplerians = []
 
-    #for index in range(len(data_points)-1):
-    for index in range(1, 100):
+    for index in range(start, stop):
         # Take a pair of points from data_points
         spline_input = data_points[index:index+2]
 
@@ -79,9 +84,26 @@ def main(data_points):
     # Uncomment the below statement to save the velocity vectors in a csv file.
     # np.savetxt('velo.csv', velocity_vectors, delimiter=",")
 
+    return np.asarray(keplerians).reshape(-1, 6)
+
+def main(data_points):
+    '''
+    Apply the whole process of interpolation for keplerian element computation
+
+    Args:
+        data_points (numpy array or StateArray): positional data set in format of (time, x, y, z)
+
+    Returns:
+        numpy array: computed keplerian elements for every point of the orbit
+    '''
+
+    data_points = orbit_arrays.as_track(data_points)
+
+    #keplerians = interpolate_range(data_points, 0, len(data_points)-1)
+    keplerians = interpolate_range(data_points, 1, 100)
+
     # Take average of the keplerian elements corresponding to all the state vectors
     # orbit = np.array(keplerians).mean(axis=0)
-    keplerians = np.asarray(keplerians)
 
     return keplerians
 
@@ -7,10 +7,8 @@ using Lambert's solution for preliminary orbit determination and Kalman filters
 import sys
 import os.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
-from util import state_kep
+from util import (state_kep, instrument, orbit_arrays)
 import numpy as np
-import matplotlib.pylab as plt
-import pykep as pkp
 from math import *
 
 
@@ -26,7 +24,10 @@ def orbit_trajectory(x1_new, x2_new, time):
     Returns:
         bool: true if we want to keep retrogade, False if we want counter-clock wise
     '''
+    # pykep is heavy to import, so it is loaded only when a Lambert problem is solved
+    import pykep as pkp
 
+    instrument.count("lambert_solves")
     l = pkp.lambert_problem(x1_new, x2_new, time, 398600.4405, False, 0)
 
     # only one revolution is needed
@@ -68,6 +69,8 @@ def lamberts(x1, x2, traj):
 
     # traj = orbit_trajectory(x1_new, x2_new, time)
 
+    import pykep as pkp
+    instrument.count("lambert_solves")
     l = pkp.lambert_problem(x1_new, x2_new, time, 398600.4405, traj,0)
 
     # only one revolution is needed
@@ -78,13 +81,77 @@ def lamberts(x1, x2, traj):
     return v1
 
 
+# Reason codes of screen_keplerian, a rejected row can have several of them
+REJECT_HYPERBOLIC = 1    # eccentricity >= 1
+REJECT_NEGATIVE_A = 2    # negative semi major axis
+REJECT_SUBSURFACE = 4    # perigee below the surface of the Earth
+REJECT_NOT_FINITE = 8    # NaN or infinite values
+
+REASONS = {
+    REJECT_HYPERBOLIC: "hyperbolic",
+    REJECT_NEGATIVE_A: "negative_a",
+    REJECT_SUBSURFACE: "subsurface",
+    REJECT_NOT_FINITE: "not_finite",
+}
+
+
+def screen_keplerian(kep, r_min=6378.137):
+    '''
+    Screens all the sets of keplerian elements at once for hyperbolic orbits, negative semi major axes, orbits with
+    their perigee below r_min and non finite values. The angles of the kept sets are wrapped into [0, 360).
+
+    Args:
+        kep(numpy array or ElementArray): all the sets of keplerian elements in [semi major axis (a), eccentricity (e),
+                          inclination (i), argument of perigee (ω), right ascension of the ascending node (Ω),
+                          true anomaly (v)] format
+        r_min(float): minimum perigee radius in km, the equatorial radius of the Earth by default
+
+    Returns:
+        tuple: (kep_final, reasons), the kept sets of keplerian elements and for every input set the sum of the
+        REJECT_* codes that apply to it, 0 for the kept sets
+    '''
+    kep = np.asarray(orbit_arrays.as_elements(kep), dtype=float).reshape(-1, 6)
+    a, e = kep[:, 0], kep[:, 1]
+
+    with np.errstate(invalid='ignore'):
+        reasons = np.where(e >= 1.0, REJECT_HYPERBOLIC, 0)
+        reasons |= np.where(a < 0.0, REJECT_NEGATIVE_A, 0)
+        reasons |= np.where((a >= 0.0) & (e < 1.0) & (a * (1 - e) < r_min), REJECT_SUBSURFACE, 0)
+    reasons |= np.where(np.all(np.isfinite(kep), axis=1), 0, REJECT_NOT_FINITE)
+
+    for code, name in REASONS.items():
+        instrument.count("keplerian_rejected_" + name, int(np.count_nonzero(reasons & code)))
+
+    kep_final = kep[reasons == 0]
+    angles = np.mod(kep_final[:, 3:6], 360.0)
+    # tiny negative angles round up to 360 in the modulo
+    kep_final[:, 3:6] = np.where(angles >= 360.0, 0.0, angles)
+
+    return kep_final, reasons
+
+
+def rejection_counts(reasons):
+    '''
+    Counts the rejected sets of keplerian elements for every reason
+
+    Args:
+        reasons(numpy array): reason codes returned by screen_keplerian
+
+    Returns:
+        dict: reason name -> number of rejected sets, and "kept" -> number of kept sets
+    '''
+    counts = {name: int(np.count_nonzero(reasons & code)) for code, name in REASONS.items()}
+    counts["kept"] = int(np.count_nonzero(reasons == 0))
+    return counts
+
+
 def check_keplerian(kep):
     '''
     Checks all the sets of keplerian elements to see if they have wrong values like eccentricity greater that 1 or
-    a negative number for semi major axis
+    a negative number for semi major axis, see screen_keplerian
 
     Args:
-        kep(numpy array): all the sets of keplerian elements in [semi major axis (a), eccentricity (e),
+        kep(numpy array or ElementArray): all the sets of keplerian elements in [semi major axis (a), eccentricity (e),
                           inclination (i), argument of perigee (ω), right ascension of the ascending node (Ω),
                           true anomaly (v)] format
      
@@ -92,61 +159,38 @@ def check_keplerian(kep):
         numpy array: the final corrected set of keplerian elements that will be inputed in the kalman filter
     '''
 
-    kep_new = list()
-    for i in range(0, len(kep)):
-
-        if kep[i, 3] < 0.0:
-            kep[i, 3] = 360 + kep[i, 3]
-        elif kep[i, 4] < 0.0:
-            kep[i, 4] = 360 + kep[i, 4]
-
-        if kep[i, 1] > 1.0:
-            pass
-        elif kep[i, 0] < 0.0:
-            pass
-        else:
-            kep_new.append(kep[i, :])
-
-    kep_final = np.asarray(kep_new)
+    kep_final, _ = screen_keplerian(kep)
 
     return kep_final
 
 
-def create_kep(my_data):
+def create_kep_range(my_data, start, stop, traj):
     '''
-    Computes all the keplerian elements for every point of the orbit you provide using Lambert's solution
-    It implements a tool for deleting all the points that give extremely jittery state vectors
+    Computes the keplerian elements for the points start to stop - 1 of the orbit using Lambert's solution
+    between every point and the next one. This is the part of create_kep that is independent for every point,
+    it is used by create_kep and by the parallel version in kep_determination/parallel.py
 
     Args:
-            data(numpy array) : contains the positional data set in (Time, x, y, z) Format
+            my_data(numpy array) : contains the positional data set in (Time, x, y, z) Format
+            start(int) : index of the first point
+            stop(int) : index after the last point, at most len(my_data) - 1
+            traj(bool) : direction of the motion, as found by orbit_trajectory
 
 
     Returns:
-        numpy array: array containing all the keplerian elements computed for the orbit given in
-        [semi major axis (a), eccentricity (e), inclination (i), argument of perigee (ω),
-        right ascension of the ascending node (Ω), true anomaly (v)] format
+        numpy array: array containing the keplerian elements computed for the points that gave a velocity, before
+        the check of check_keplerian
     '''
-    v_hold = np.zeros((len(my_data), 3))
+    v_hold = np.zeros((stop - start, 3))
     # v_abs1 = np.empty([len(my_data)])
 
-    x1_new = [1, 1, 1]
-    x1_new[:] = my_data[0, 1:4]
-    x2_new = [1, 1, 1]
-    x2_new[:] = my_data[1, 1:4]
-    time = my_data[1, 0] - my_data[0, 0]
-    traj = orbit_trajectory(x1_new, x2_new, time)
-
-    v1 = lamberts(my_data[0, :], my_data[1, :], traj)
-    # v_abs1[0] = (v1[0] ** 2 + v1[1] ** 2 + v1[2] ** 2) ** (0.5)
-    v_hold[0] = v1
-
     # Produce all the 2 consecutive pairs and find the velocity with lamberts() method
-    for i in range(1, (len(my_data) - 1)):
+    for i in range(start, stop):
 
         j = i + 1
         v1 = lamberts(my_data[i, :], my_data[j, :], traj)
 
-        v_hold[i] = v1
+        v_hold[i - start] = v1
         # compute the absolute value of the velocity vector for every point
         # v_abs1[i] = (v1[0] ** 2 + v1[1] ** 2 + v1[2] ** 2) ** (0.5)
 
@@ -178,7 +222,7 @@ def create_kep(my_data):
     final_r = np.zeros((len(store_i), 3))
     j = 0
     for i in store_i:
-        final_r[j] = my_data[i, 1:4]
+        final_r[j] = my_data[start + i, 1:4]
         j += 1
 
     # finally we transform the state vectors = position vectors + velocity vectors into keplerian elements
@@ -186,6 +230,35 @@ def create_kep(my_data):
     for i in range(0, len(final_r)):
         kep[i] = np.ravel(state_kep.state_kep(final_r[i], final_v[i]))
 
+    return kep
+
+
+def create_kep(my_data):
+    '''
+    Computes all the keplerian elements for every point of the orbit you provide using Lambert's solution
+    It implements a tool for deleting all the points that give extremely jittery state vectors
+
+    Args:
+            data(numpy array or StateArray) : contains the positional data set in (Time, x, y, z) Format
+
+
+    Returns:
+        numpy array: array containing all the keplerian elements computed for the orbit given in
+        [semi major axis (a), eccentricity (e), inclination (i), argument of perigee (ω),
+        right ascension of the ascending node (Ω), true anomaly (v)] format
+    '''
+    my_data = orbit_arrays.as_track(my_data)
+
+    x1_new = [1, 1, 1]
+    x1_new[:] = my_data[0, 1:4]
+    x2_new = [1, 1, 1]
+    x2_new[:] = my_data[1, 1:4]
+    time = my_data[1, 0] - my_data[0, 0]
+    traj = orbit_trajectory(x1_new, x2_new, time)
+
+    # the last point has no next point, so it never gets a velocity
+    kep = create_kep_range(my_data, 0, len(my_data) - 1, traj)
+
     kep = check_keplerian(kep)
     # np.savetxt("kep11.csv", kep, delimiter=",")
     return kep
@@ -193,58 +266,54 @@ def create_kep(my_data):
 
 # find the mean value of all keplerian elements set and then do a kalman filtering to find the best fit
 
-def kalman(kep, R):
+def kalman_update(z, xhat, P, R, Q=1e-8):
     '''
-    Takes as an input lots of sets of keplerian elements and produces
-    the fitted value of them by applying kalman filters
+    Runs the scalar kalman filter of every element channel over a sequence of measurements, starting from a given
+    estimate. All the channels, and all the sets of a stack, are updated at once.
 
     Args:
-        kep(numpy array): containing keplerian elements in this format (a, e, i, ω, Ω, v)
+        z(numpy array): measurements of shape (..., n, 6)
+        xhat(numpy array): estimate before the first measurement, of shape (..., 6)
+        P(float or numpy array): error estimate of xhat
         R : estimate of measurement variance
+        Q(float): process variance
 
     Returns:
-        numpy array: final set of keplerian elements describing the orbit based on kalman filtering
+        tuple: (xhat, P) after the last measurement, so that the filter can be continued with new measurements
     '''
-    
-    # first find the mean values for every keplerian element
-    mean_kep = np.zeros((1, 6))
-    for i in range(0, 6):
-        mean_kep[0, i] = np.mean(kep[:, i])
-
-    # the mean value will be selected as the initial guess
+    for k in range(z.shape[-2]):
+        # time update
+        Pminus = P + Q
 
-    x_final = np.zeros((1, 6))
-    for i in range(0, 6):
+        # measurement update
+        K = Pminus / (Pminus + R)
+        xhat = xhat + K * (z[..., k, :] - xhat)
+        P = (1 - K) * Pminus
 
-        # intial parameters
-        n_iter = len(kep)
-        sz = n_iter  # size of array
-        z = np.zeros((sz, 6))
-        z[:, i] = kep[:, i]
+    return xhat, P
 
-        Q = 1e-8  # process variance
 
-        xhat = np.zeros((sz, 6))  # a posteri estimate of x
-        P = np.zeros((sz, 6))  # a posteri error estimate
-        xhatminus = np.zeros((sz, 6))  # a priori estimate of x
-        Pminus = np.zeros((sz, 6))  # a priori error estimate
-        K = np.zeros((sz, 6))  # gain or blending factor
-
-        # intial guesses
-        xhat[0, i] = mean_kep[0, i]
-        P[0, i] = 1.0
+def kalman(kep, R):
+    '''
+    Takes as an input lots of sets of keplerian elements and produces
+    the fitted value of them by applying kalman filters
 
-        for k in range(1, n_iter):
-            # time update
-            xhatminus[k, i] = xhat[k - 1, i]
-            Pminus[k, i] = P[k - 1, i] + Q
+    Every element is filtered separately, starting from the mean value of the element as the initial guess.
+    A stack of many orbits, e.g. from different satellites, can be filtered in one call.
 
-            # measurement update
-            K[k, i] = Pminus[k, i] / (Pminus[k, i] + R)
+    Args:
+        kep(numpy array or ElementArray): containing keplerian elements in this format (a, e, i, ω, Ω, v), or a
+                                          stack of them of shape (m, n, 6)
+        R : estimate of measurement variance
 
-            xhat[k, i] = xhatminus[k, i] + K[k, i] * (z[k, i] - xhatminus[k, i])
-            P[k, i] = (1 - K[k, i]) * Pminus[k, i]
+    Returns:
+        numpy array: final set of keplerian elements describing the orbit based on kalman filtering, of shape
+        (1, 6) or (m, 1, 6) for a stack
+    '''
+    kep = np.asarray(orbit_arrays.as_elements(kep), dtype=float)
 
-        x_final[:, i] = xhat[k, i]
+    # the mean value will be selected as the initial guess
+    xhat = np.mean(kep, axis=-2)
+    xhat, _ = kalman_update(kep[..., 1:, :], xhat, 1.0, R)
 
-    return x_final
+    return xhat[..., np.newaxis, :]
@@ -0,0 +1,145 @@
+'''
+Runs create_kep and the interpolation method on a process pool for long tracks.
+
+The filtered data set is copied once into a shared memory block. The point range is split into chunks which are
+sent to the workers as (shared memory name, first point, last point) only, every worker reads the points of its
+chunk, and the point after it, directly from the shared block. The chunks are merged back in order, so the output
+is the same, bit for bit, as the output of lamberts_kalman.create_kep and interpolation.main.
+
+Counters recorded with util.instrument inside the workers are not added to the counters of the main process.
+'''
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+
+from util import orbit_arrays
+from kep_determination import (lamberts_kalman, interpolation)
+
+
+def _attach(name):
+    '''
+    Attaches to an existing shared memory block without taking ownership of it
+    '''
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # before python 3.13 attaching registers the block again with the resource tracker, which is shared with
+        # the main process, so the block stays owned by the main process
+        return shared_memory.SharedMemory(name=name)
+
+
+def _run_chunk(name, shape, func, start, stop, args):
+    shm = _attach(name)
+    try:
+        data = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        result = func(data, start, stop, *args)
+        del data
+    finally:
+        shm.close()
+
+    return result
+
+
+def chunks(start, stop, n):
+    '''
+    Splits the range start to stop into at most n contiguous non empty chunks
+
+    Args:
+        start (int): first index
+        stop (int): index after the last one
+        n (int): number of chunks
+
+    Returns:
+        list: (first, stop) tuples of the chunks in order
+    '''
+    bounds = np.unique(np.linspace(start, stop, max(1, n) + 1).astype(int))
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+def map_chunks(data, func, start, stop, args=(), workers=None, n_chunks=None):
+    '''
+    Calls func(data, first, stop, *args) for the chunks of the range start to stop on a process pool, with data
+    in shared memory
+
+    Args:
+        data (numpy array): the data set, shared with the workers
+        func (function): a module level function
+        start (int): first index of the range
+        stop (int): index after the last one
+        args (tuple): extra arguments of func
+        workers (int): number of processes, the number of cpus if None
+        n_chunks (int): number of chunks, 4 per worker if None
+
+    Returns:
+        list: the results of func for every chunk, in order
+    '''
+    data = np.ascontiguousarray(data, dtype=np.float64)
+    workers = workers or os.cpu_count() or 1
+    ranges = chunks(start, stop, n_chunks or 4 * workers)
+
+    shm = shared_memory.SharedMemory(create=True, size=max(data.nbytes, 1))
+    try:
+        shared = np.ndarray(data.shape, dtype=np.float64, buffer=shm.buf)
+        shared[:] = data
+        del shared
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run_chunk, shm.name, data.shape, func, a, b, args) for a, b in ranges]
+            results = [f.result() for f in futures]
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return results
+
+
+def create_kep(my_data, workers=None, n_chunks=None):
+    '''
+    Parallel version of lamberts_kalman.create_kep, with the same output
+
+    Args:
+        my_data (numpy array or StateArray): contains the positional data set in (Time, x, y, z) Format
+        workers (int): number of processes, the number of cpus if None
+        n_chunks (int): number of chunks, 4 per worker if None
+
+    Returns:
+        numpy array: array containing all the keplerian elements computed for the orbit given in
+        [semi major axis (a), eccentricity (e), inclination (i), argument of perigee (ω),
+        right ascension of the ascending node (Ω), true anomaly (v)] format
+    '''
+    my_data = orbit_arrays.as_track(my_data)
+
+    x1_new = list(my_data[0, 1:4])
+    x2_new = list(my_data[1, 1:4])
+    time = my_data[1, 0] - my_data[0, 0]
+    traj = lamberts_kalman.orbit_trajectory(x1_new, x2_new, time)
+
+    kep = map_chunks(my_data, lamberts_kalman.create_kep_range, 0, len(my_data) - 1, (traj,), workers, n_chunks)
+
+    return lamberts_kalman.check_keplerian(np.concatenate(kep) if kep else np.zeros((0, 6)))
+
+
+def interpolate(data_points, workers=None, n_chunks=None, start=1, stop=100):
+    '''
+    Parallel version of interpolation.main, with the same output for the default range
+
+    Args:
+        data_points (numpy array or StateArray): positional data set in format of (time, x, y, z)
+        workers (int): number of processes, the number of cpus if None
+        n_chunks (int): number of chunks, 4 per worker if None
+        start (int): index of the first point, 1 like interpolation.main
+        stop (int): index after the last point, 100 like interpolation.main, len(data_points) - 1 for the whole
+                    track
+
+    Returns:
+        numpy array: computed keplerian elements for every point of the range
+    '''
+    data_points = orbit_arrays.as_track(data_points)
+    kep = map_chunks(data_points, interpolation.interpolate_range, start, stop, (), workers, n_chunks)
+
+    return np.concatenate(kep) if kep else np.zeros((0, 6))
@@ -4,16 +4,14 @@ and generates the final set of keplerian elements along with a plot and a filter
 '''
 
 
-from util import (read_data, kep_state, rkf78, golay_window)
-from filters import (sav_golay, triple_moving_average)
-from kep_determination import (lamberts_kalman, interpolation)
+from util import (read_data, kep_state, rkf78, golay_window, stage_cache, instrument)
+from filters import (sav_golay, triple_moving_average, segmentation)
+from kep_determination import (lamberts_kalman, interpolation, parallel, consensus)
 import argparse
 import numpy as np
-import matplotlib as mpl
-import matplotlib.pylab as plt
 
 
-def process(data_file, error_apriori, units):
+def process(data_file, error_apriori, units, cache=None, workers=1, max_gap=None, agreement=None):
     '''
     Given a .csv data file in the format of (time, x, y, z) applies both filters, generates a filtered.csv data
     file, prints out the final keplerian elements computed from both Lamberts and Interpolation and finally plots
@@ -22,29 +20,68 @@ def process(data_file, error_apriori, units):
     Args:
         data_file (string): The name of the .csv file containing the positional data
         error_apriori (float): apriori estimation of the measurements error in km
+        units (string): m for metres, k for kilometres
+        cache (StageCache): optional on-disk cache of the stage outputs, when the same file is processed again
+                            only the stages whose parameters changed are recomputed
+        workers (int): number of processes for Lambert's solution and the interpolation, the results are the same
+                       as with a single process
+        max_gap (float): time gap in seconds at which the data set is split into segments that are filtered
+                         separately, 10 times the median time between two points if None
+        agreement (float): if given, Lambert's solution, the interpolation, Gibbs' method and the ellipse fit run
+                           concurrently, see kep_determination/consensus.py, and stop once two of them agree within
+                           this distance in km
 
     Returns:
         Runs the whole process of the program
     '''
     # First read the csv file called "orbit" with the positional data
-    data = read_data.load_data(data_file)
+    if cache is None:
+        source = None
+    else:
+        with open(data_file, "rb") as f:
+            source = cache.digest(f.read())
 
-    if (units == 'm'):
-        # Transform m to km
-        data[:, 1:4] = data[:, 1:4] / 1000
+    def load():
+        data = read_data.load_data(data_file)
+        if (units == 'm'):
+            # Transform m to km
+            data[:, 1:4] = data[:, 1:4] / 1000
+        return data
 
+    data, key = stage_cache.run_stage(cache, "load", source, {"units": units}, load)
 
-    # Apply the Triple moving average filter with window = 3
-    data_after_filter = triple_moving_average.generate_filtered_data(data, 3)
 
+    # Split the data set at the gaps between passes, the filters must not smooth across them
+    if max_gap is None:
+        max_gap = segmentation.gap_threshold(data)
+    segments = segmentation.split_gaps(data, max_gap)
 
-    ## Use the golay_window.py script to find the window for the savintzky golay filter based on the error you input
-    window = golay_window.window(error_apriori, data_after_filter)
+    if len(segments) > 1:
+        # Filter every segment separately and stitch them together
+        with instrument.timer("filtering"):
+            data_after_filter, key = stage_cache.run_stage(cache, "segmented_filter", key,
+                {"error_apriori": error_apriori, "max_gap": float(max_gap)},
+                lambda: segmentation.filter_segments(segments, error_apriori, workers))
 
+    else:
+        # The window choice is a sub-timer of the filtering, like in segmentation.filter_segment
+        with instrument.timer("filtering"):
+            # Apply the Triple moving average filter with window = 3
+            data_after_filter, key = stage_cache.run_stage(cache, "triple_moving_average", key, {"window": 3},
+                lambda: triple_moving_average.generate_filtered_data(data, 3))
 
 
-    # Apply the Savintzky - Golay filter with window = 31 and polynomail parameter = 6
-    data_after_filter = sav_golay.golay(data_after_filter, window, 3)
+            ## Use the golay_window.py script to find the window for the savintzky golay filter based on the error you input
+            with instrument.timer("filtering.window_selection"):
+                window, _ = stage_cache.run_stage(cache, "golay_window", key, {"error_apriori": error_apriori},
+                    lambda: np.array(golay_window.window(error_apriori, data_after_filter)))
+                window = int(window)
+
+
+
+            # Apply the Savintzky - Golay filter with window = 31 and polynomail parameter = 6
+            data_after_filter, key = stage_cache.run_stage(cache, "sav_golay", key, {"window": window, "degree": 3},
+                lambda: sav_golay.golay(data_after_filter, window, 3))
 
 
     # Compute the residuals between filtered data and initial data and then the sum and mean values of each axis
@@ -62,32 +99,59 @@ def process(data_file, error_apriori, units):
     # Save the filtered data into a new csv called "filtered"
     np.savetxt("filtered.csv", data_after_filter, delimiter=",")
 
-    # Apply Lambert's solution for the filtered data set
-    kep_lamb = lamberts_kalman.create_kep(data_after_filter)
+    if agreement is not None:
+        # Run all the methods concurrently and combine the ones that agree
+        with instrument.timer("consensus"):
+            result = consensus.determine(data_after_filter, agreement=agreement,
+                                         workers=workers if workers > 1 else None)
+
+        for name, method in result["results"].items():
+            if "error" in method:
+                print(name, "failed:", method["error"])
+            else:
+                print(name, "residual %.6f km:" % method["residual"], method["kep"])
+        print("Methods stopped early:", result["stopped"])
+        print("Displaying the final keplerian elements, from", result["agreeing"])
+        print(result["kep"])
 
+        kep_final_inter = result["kep"].reshape(6, 1)
 
-    # Apply the interpolation method
-    kep_inter = interpolation.main(data_after_filter)
+    else:
+        # Apply Lambert's solution for the filtered data set
+        with instrument.timer("lambert"):
+            kep_lamb, key_lamb = stage_cache.run_stage(cache, "lamberts", key, {},
+                lambda: lamberts_kalman.create_kep(data_after_filter) if workers <= 1
+                        else parallel.create_kep(data_after_filter, workers))
 
 
-    # Apply Kalman filters to find the best approximation of the keplerian elements for both solutions
-    # set we a estimate of measurement vatiance R = 0.01 ** 2
-    kep_final_lamb = lamberts_kalman.kalman(kep_lamb, 0.01 ** 2)
-    kep_final_lamb = np.transpose(kep_final_lamb)
+        # Apply the interpolation method
+        with instrument.timer("interpolation"):
+            kep_inter, key_inter = stage_cache.run_stage(cache, "interpolation", key, {},
+                lambda: interpolation.main(data_after_filter) if workers <= 1
+                        else parallel.interpolate(data_after_filter, workers))
 
-    kep_final_inter = lamberts_kalman.kalman(kep_inter, 0.01 ** 2)
-    kep_final_inter = np.transpose(kep_final_inter)
 
-    kep_final_lamb[5, 0] = kep_final_inter[5, 0]
+        # Apply Kalman filters to find the best approximation of the keplerian elements for both solutions
+        # set we a estimate of measurement vatiance R = 0.01 ** 2
+        with instrument.timer("kalman"):
+            kep_final_lamb, _ = stage_cache.run_stage(cache, "kalman", key_lamb, {"R": 0.01 ** 2},
+                lambda: lamberts_kalman.kalman(kep_lamb, 0.01 ** 2))
+            kep_final_lamb = np.transpose(kep_final_lamb)
 
-    kep_final = np.zeros((6, 2))
-    kep_final[:, 0] = np.ravel(kep_final_lamb)
-    kep_final[:, 1] = np.ravel(kep_final_inter)
+            kep_final_inter, _ = stage_cache.run_stage(cache, "kalman", key_inter, {"R": 0.01 ** 2},
+                lambda: lamberts_kalman.kalman(kep_inter, 0.01 ** 2))
+            kep_final_inter = np.transpose(kep_final_inter)
 
+        kep_final_lamb[5, 0] = kep_final_inter[5, 0]
 
-    # Print the final orbital elements for both solutions
-    print("Displaying the final keplerian elements, first row : Lamberts, second row : Interpolation")
-    print(kep_final)
+        kep_final = np.zeros((6, 2))
+        kep_final[:, 0] = np.ravel(kep_final_lamb)
+        kep_final[:, 1] = np.ravel(kep_final_inter)
+
+
+        # Print the final orbital elements for both solutions
+        print("Displaying the final keplerian elements, first row : Lamberts, second row : Interpolation")
+        print(kep_final)
 
     # Plot the initial data set, the filtered data set and the final orbit
 
@@ -104,15 +168,19 @@ def process(data_file, error_apriori, units):
     x = state
     h = 0.1
     tetol = 1e-04
-    for i in range(0, 150):
-        keep_state[:, i] = np.ravel(rkf78.rkf78(6, ti, tf, h, tetol, x))
-        t_hold[i, 0] = tf
-        tf = tf + 1
+    with instrument.timer("propagation"):
+        for i in range(0, 150):
+            keep_state[:, i] = np.ravel(rkf78.rkf78(6, ti, tf, h, tetol, x))
+            t_hold[i, 0] = tf
+            tf = tf + 1
 
     positions = keep_state[0:3, :]
 
 
-    ## Finally we plot the graph
+    ## Finally we plot the graph, matplotlib is imported here so that importing this module stays cheap
+    import matplotlib as mpl
+    import matplotlib.pylab as plt
+
     mpl.rcParams['legend.fontsize'] = 10
     fig = plt.figure()
     ax = fig.gca(projection='3d')
@@ -133,10 +201,33 @@ def read_args():
     parser.add_argument('-f', '--file_path', type=str, help="path to .csv data file", default='orbit.csv')
     parser.add_argument('-e', '--error', type=float, help="estimation of the measurement error", default=10.0)
     parser.add_argument('-u', '--units', type=str, help="m for metres, k for kilometres", default='k')
+    parser.add_argument('-c', '--cache', type=str, help="directory of the stage cache, disabled if not given",
+                        default=None)
+    parser.add_argument('--cache_size', type=float, help="maximum size of the stage cache in MB", default=256)
+    parser.add_argument('-m', '--metrics', type=str, default=None,
+                        help="write stage timings and counters to this file, Prometheus format if it ends in .prom "
+                             "and JSON otherwise")
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help="number of processes for Lambert's solution and the interpolation")
+    parser.add_argument('-g', '--max_gap', type=float, default=None,
+                        help="time gap in seconds at which the data is split before filtering, "
+                             "10 times the median time step if not given")
+    parser.add_argument('-a', '--agreement', type=float, default=None,
+                        help="run all the methods concurrently and stop once two agree within this distance in km")
     return parser.parse_args()
 
 
 if __name__ == "__main__":
 
     args = read_args()
-    process(args.file_path, args.error, args.units)
+    if args.cache is None:
+        cache = None
+    else:
+        cache = stage_cache.StageCache(args.cache, int(args.cache_size * 2**20))
+    if args.metrics is not None:
+        instrument.enable()
+    try:
+        process(args.file_path, args.error, args.units, cache, args.workers, args.max_gap, args.agreement)
+    finally:
+        if args.metrics is not None:
+            instrument.export(args.metrics)
@@ -0,0 +1,274 @@
+"""Buffered output writers for simulator.py and dgsn_simulator.py.
+
+   save_r opens the output file, writes one line and closes it again on
+   every tick. The writers in this module only append the row to an
+   in-memory buffer. A background thread writes the buffer out when it
+   holds buffer_size rows or every flush_interval seconds, whichever comes
+   first, so the calc thread never waits on the disk. The buffer is
+   bounded by max_buffer rows: if the disk cannot keep up, write() blocks
+   until the background thread has caught up. If a flush fails the
+   background thread stops, the rows it could not write stay in the
+   buffer and the error is raised by the next write() or close().
+
+   routed_save_r serves many satellites, e.g. in multi_simulator.py, with
+   one buffer and one background thread. Its channel(i) is the op_writer
+   of satellite i, every row is tagged with i and written to the file of
+   its satellite on flush.
+"""
+
+import glob
+import threading
+import numpy as np
+
+class BufferedOpWriter():
+    """Base class of the buffered writers. Subclasses implement flush_rows."""
+
+    def __init__(self, name, buffer_size=1000, flush_interval=1.0, max_buffer=100000,
+                 columns=3, verbose=False):
+        """Initialize the class.
+
+           Args:
+               name(string): output file name
+               buffer_size(int): number of rows that triggers a flush
+               flush_interval(float): maximum time in seconds between two flushes
+               max_buffer(int): maximum number of rows held in memory
+               columns(int): number of values of the vector written after t,
+                             3 writes the position only like save_r
+               verbose(boolean): print the number of rows written after every flush
+        """
+
+        self.file_name = name
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max(max_buffer,buffer_size)
+        self.columns = columns
+        self.verbose = verbose
+
+        self.iter = 0
+        self.t = {}
+        self.buffer = []
+        self.cond = threading.Condition()
+        self.flush_thr = None
+        self.stopping = False
+        self.error = None
+
+    def open(self):
+        """Starts the background flush thread."""
+
+        self.t = {}
+        self.stopping = False
+        self.error = None
+        self.flush_thr = threading.Thread(target=self.__flush_loop, daemon=True)
+        self.flush_thr.start()
+
+    def write(self,t,s,key=None):
+        """Appends a row to the buffer. Rows with the same time as the
+           previous one are skipped, like in save_r.
+
+           Args:
+               t: the current time of simulation
+               s: the state or position vector at t
+               key(int): appended to the row as the last column if not
+                         None, rows with different keys are skipped
+                         independently
+        """
+
+        with self.cond:
+            self.__raise_error()
+            if self.t.get(key) == t:
+                return
+            self.t[key] = t
+
+            while len(self.buffer) >= self.max_buffer and self.flush_thr is not None and self.error is None:
+                self.cond.wait()
+            self.__raise_error()
+
+            self.buffer.append([t,*s[0:self.columns]] if key is None else [t,*s[0:self.columns],key])
+            if len(self.buffer) >= self.buffer_size:
+                self.cond.notify_all()
+
+            if self.flush_thr is None:
+                # not running, e.g. a late write after close()
+                rows, self.buffer = self.buffer, []
+                self.__write_rows(rows)
+
+    def close(self):
+        """Flushes everything that is still buffered and stops the
+           background thread."""
+
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+        if self.flush_thr is not None:
+            self.flush_thr.join()
+            self.flush_thr = None
+
+        with self.cond:
+            self.__raise_error()
+            rows, self.buffer = self.buffer, []
+        self.__write_rows(rows)
+
+    def __raise_error(self):
+        # called with the lock held, the error is raised once and the buffered rows are kept
+        if self.error is not None:
+            error, self.error = self.error, None
+            self.flush_thr = None
+            raise error
+
+    def __flush_loop(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.stopping or len(self.buffer) >= self.buffer_size,
+                                   timeout=self.flush_interval)
+                rows, self.buffer = self.buffer, []
+                stopping = self.stopping
+                self.cond.notify_all()
+
+            try:
+                self.__write_rows(rows)
+            except Exception as err:
+                with self.cond:
+                    # the rows go back in front of the ones buffered since, and write() stops waiting
+                    self.buffer = rows+self.buffer
+                    self.error = err
+                    self.cond.notify_all()
+                return
+            if stopping:
+                return
+
+    def __write_rows(self,rows):
+        if not rows:
+            return
+        self.flush_rows(np.array(rows,dtype=float))
+        self.iter += len(rows)
+        if self.verbose:
+            print("\rIteration:",self.iter,end=' '*10)
+
+    def flush_rows(self,rows):
+        """Writes a block of rows to the output. Called from the background
+           thread, never concurrently.
+
+           Args:
+               rows(nxm numpy array): the rows [t,*s]
+        """
+
+        raise NotImplementedError
+
+class buffered_save_r(BufferedOpWriter):
+    """Saves the position vector to a text file in the format of save_r,
+       one line "t x y z" per observation. Like simulator.save_r, a
+       "# Begin write" line is written when the writer is opened, unless
+       header is False as in dgsn_simulator.save_r."""
+
+    def __init__(self,name,header=True,**kwargs):
+        """Initialize the class.
+
+           Args:
+               name(string): output file name
+               header(boolean): write the "# Begin write" line on open
+               kwargs: the arguments of BufferedOpWriter
+        """
+
+        super().__init__(name,**kwargs)
+        self.header = header
+
+    def open(self):
+        if self.header:
+            with open(self.file_name,'a') as f:
+                f.write('# Begin write\r\n')
+        super().open()
+
+    def flush_rows(self,rows):
+        _append_lines(self.file_name,rows)
+
+class routed_save_r(BufferedOpWriter):
+    """Saves the position vectors of many satellites with a single buffer
+       and background thread, to one file per satellite in the format of
+       buffered_save_r. The op_writer of satellite i is channel(i), the
+       writer is opened with the first channel and closed with the last."""
+
+    def __init__(self,names,header=True,**kwargs):
+        """Initialize the class.
+
+           Args:
+               names(list): output file name of every satellite
+               header(boolean): write the "# Begin write" line on open
+               kwargs: the arguments of BufferedOpWriter
+        """
+
+        super().__init__(list(names),**kwargs)
+        self.header = header
+        self.channels_open = 0
+
+    def channel(self,i):
+        """Returns the op_writer of satellite i."""
+
+        return _Channel(self,i)
+
+    def open(self):
+        if self.header:
+            for name in self.file_name:
+                with open(name,'a') as f:
+                    f.write('# Begin write\r\n')
+        super().open()
+
+    def flush_rows(self,rows):
+        sat = rows[:,-1].astype(int)
+        for i in np.unique(sat):
+            _append_lines(self.file_name[i],rows[sat == i,:-1])
+
+class _Channel():
+    """The op_writer of one satellite of a routed_save_r."""
+
+    def __init__(self,writer,key):
+        self.writer = writer
+        self.key = key
+
+    def open(self):
+        self.writer.channels_open += 1
+        if self.writer.channels_open == 1:
+            self.writer.open()
+
+    def write(self,t,s):
+        self.writer.write(t,s,self.key)
+
+    def close(self):
+        self.writer.channels_open -= 1
+        if self.writer.channels_open == 0:
+            self.writer.close()
+
+def _append_lines(name,rows):
+    lines = ["{} {}\r\n".format(int(row[0]) if row[0].is_integer() else row[0],
+                                 " ".join(str(x) for x in row[1:])) for row in rows.tolist()]
+    with open(name,'a') as f:
+        f.write("".join(lines))
+
+class buffered_save_npy(BufferedOpWriter):
+    """Saves the rows [t,*s] as numbered .npy chunks, name.00000.npy,
+       name.00001.npy and so on. Use load_npy_chunks to read them back."""
+
+    chunk = 0
+
+    def open(self):
+        self.chunk = len(glob.glob(glob.escape(self.file_name)+'.*.npy'))
+        super().open()
+
+    def flush_rows(self,rows):
+        np.save("{}.{:05d}.npy".format(self.file_name,self.chunk),rows)
+        self.chunk += 1
+
+def load_npy_chunks(name):
+    """Reads the chunks written by buffered_save_npy.
+
+       Args:
+           name(string): file name given to buffered_save_npy
+
+       Returns:
+           nxm numpy array: all the rows in the order they were written
+    """
+
+    files = sorted(glob.glob(glob.escape(name)+'.*.npy'))
+    if not files:
+        return np.empty((0,0))
+
+    return np.concatenate([np.load(f) for f in files])
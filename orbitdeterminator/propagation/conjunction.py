@@ -0,0 +1,243 @@
+"""Screens a catalog of objects for close approaches.
+
+   The whole catalog is propagated together on a coarse time grid with a
+   batched propagator, cowell.rk4_batch by default. At every step the
+   positions are put in a k-d tree and only the pairs closer than the
+   distance the objects can cover in half a step are kept. These pairs
+   go through three cheap filters:
+
+   * linear motion: the closest approach of the straight line motion
+     around the step must be below the threshold
+   * apogee/perigee: the radial ranges of the two orbits must overlap
+   * orbit path: both objects must be close to the line of intersection
+     of the two orbital planes, with the radii of the orbits there within
+     the threshold
+
+   The remaining pairs are refined by finding the root of the range rate
+   between the neighbouring steps, propagating the pairs with the same
+   propagator, which gives the time and the distance of the closest
+   approach. Every step owns the approaches within half a step of it, so
+   each approach is reported once.
+"""
+
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+import numpy as np
+
+from util import instrument
+from propagation import cowell
+
+mu = 398600.4405
+
+def orbit_geometry(S):
+    """Returns the shape and the orientation of the osculating orbits of
+       many states.
+
+       Args:
+           S(nx6 numpy array): the state vectors [rx,ry,rz,vx,vy,vz]
+
+       Returns:
+           dict: "q" perigee radii, "Q" apogee radii (inf if unbound),
+                 "p" semi-latus rectum, "e" eccentricities, and the unit
+                 vectors "P" towards perigee, "W" normal to the orbit and
+                 "Qv" completing the perifocal frame, as nx3 arrays
+    """
+
+    r, v = S[:,0:3], S[:,3:6]
+    h = np.cross(r,v)
+    mag_h = np.sqrt(np.sum(h**2,axis=1))
+    mag_r = np.sqrt(np.sum(r**2,axis=1))
+    e_vec = np.cross(v,h)/mu-r/mag_r[:,None]
+    e = np.sqrt(np.sum(e_vec**2,axis=1))
+    p = mag_h**2/mu
+
+    # the perigee of circular orbits is undefined, their radius does not depend on it
+    P = np.where((e > 1e-10)[:,None],e_vec/np.maximum(e,1e-300)[:,None],r/mag_r[:,None])
+    W = h/mag_h[:,None]
+
+    with np.errstate(divide='ignore'):
+        Q = np.where(e < 1,p/(1-e),np.inf)
+
+    return {"q": p/(1+e), "Q": Q, "p": p, "e": e, "P": P, "W": W, "Qv": np.cross(W,P)}
+
+def apogee_perigee_filter(geometry,i,j,threshold):
+    """Keeps the pairs whose radial ranges overlap within the threshold.
+
+       Args:
+           geometry(dict): output of orbit_geometry
+           i(numpy array): first object of every pair
+           j(numpy array): second object of every pair
+           threshold(float): distance in km
+
+       Returns:
+           numpy array: True for the pairs that can come within the threshold
+    """
+
+    q, Q = geometry["q"], geometry["Q"]
+    return np.maximum(q[i],q[j])-np.minimum(Q[i],Q[j]) <= threshold
+
+def _radius(geometry,k,direction):
+    theta = np.arctan2(np.sum(direction*geometry["Qv"][k],axis=1),np.sum(direction*geometry["P"][k],axis=1))
+    return geometry["p"][k]/(1+geometry["e"][k]*np.cos(theta))
+
+def orbit_path_filter(geometry,i,j,threshold):
+    """Keeps the pairs whose orbits come within the threshold near the line
+       of intersection of their planes. Two objects within the threshold
+       are each within an angle alpha of that line, where the radius of
+       the orbit differs from its radius on the line by at most
+       alpha*Q^2*e/p. Nearly coplanar pairs are always kept.
+
+       Args:
+           geometry(dict): output of orbit_geometry
+           i(numpy array): first object of every pair
+           j(numpy array): second object of every pair
+           threshold(float): distance in km
+
+       Returns:
+           numpy array: True for the pairs that can come within the threshold
+    """
+
+    W = geometry["W"]
+    line = np.cross(W[i],W[j])
+    sin_d = np.sqrt(np.sum(line**2,axis=1))
+
+    q, Q, p, e = geometry["q"], geometry["Q"], geometry["p"], geometry["e"]
+    with np.errstate(divide='ignore',invalid='ignore'):
+        x_i = threshold/(q[i]*sin_d)
+        x_j = threshold/(q[j]*sin_d)
+        coplanar = (x_i >= 1) | (x_j >= 1) | ~np.isfinite(Q[i]) | ~np.isfinite(Q[j])
+
+        line = line/sin_d[:,None]
+        pad = (np.arcsin(np.minimum(x_i,1))*Q[i]**2*e[i]/p[i]+np.arcsin(np.minimum(x_j,1))*Q[j]**2*e[j]/p[j])
+
+        gap = np.minimum(np.abs(_radius(geometry,i,line)-_radius(geometry,j,line)),
+                         np.abs(_radius(geometry,i,-line)-_radius(geometry,j,-line)))
+
+    return coplanar | (gap <= threshold+pad)
+
+def _range_rate(S1,S2):
+    return np.sum((S1[:,0:3]-S2[:,0:3])*(S1[:,3:6]-S2[:,3:6]),axis=1)
+
+def refine(S1,S2,t,lo,hi,propagator=cowell.rk4_batch,iterations=40):
+    """Finds the time of closest approach of many pairs of objects by
+       bisection of the range rate, all the pairs at once.
+
+       Args:
+           S1(nx6 numpy array): states of the first objects at the times t
+           S2(nx6 numpy array): states of the second objects at the times t
+           t(numpy array): times of the states
+           lo(numpy array): start of the search interval of every pair
+           hi(numpy array): end of the search interval of every pair
+           propagator(function): batched propagator (S,t0,tf) -> states
+           iterations(int): number of bisections
+
+       Returns:
+           tuple: (times of closest approach, distances in km, relative
+                  speeds in km/s)
+    """
+
+    def at(tau):
+        S = propagator(np.vstack((S1,S2)),np.concatenate((t,t)),np.concatenate((tau,tau)))
+        return S[:len(S1)], S[len(S1):]
+
+    lo, hi = np.array(lo,dtype=float), np.array(hi,dtype=float)
+    g_lo = _range_rate(*at(lo))
+    g_hi = _range_rate(*at(hi))
+
+    # already receding at the start, or still approaching at the end: the minimum is on the boundary
+    tca = np.where(g_lo >= 0,lo,np.where(g_hi <= 0,hi,np.nan))
+    inside = np.isnan(tca)
+
+    a, b = lo[inside], hi[inside]
+    sub1, sub2, ts = S1[inside], S2[inside], t[inside]
+    for _ in range(iterations):
+        mid = (a+b)/2
+        S = propagator(np.vstack((sub1,sub2)),np.concatenate((ts,ts)),np.concatenate((mid,mid)))
+        g = _range_rate(S[:len(mid)],S[len(mid):])
+        a = np.where(g < 0,mid,a)
+        b = np.where(g < 0,b,mid)
+    tca[inside] = (a+b)/2
+
+    A, B = at(tca)
+    distance = np.sqrt(np.sum((A[:,0:3]-B[:,0:3])**2,axis=1))
+    speed = np.sqrt(np.sum((A[:,3:6]-B[:,3:6])**2,axis=1))
+
+    return tca, distance, speed
+
+def screen(S,t0,tf,threshold=5.0,step=10.0,propagator=cowell.rk4_batch):
+    """Finds all the approaches closer than the threshold between the
+       objects of a catalog.
+
+       Args:
+           S(nx6 numpy array): the state vectors of the catalog at t0
+           t0(float): initial time
+           tf(float): final time
+           threshold(float): distance of the reported approaches in km
+           step(float): coarse time step in seconds
+           propagator(function): batched propagator (S,t0,tf) -> states,
+                                 cowell.rk4_batch by default
+
+       Returns:
+           dict: "i", "j" the indices of the objects, "tca" the times of
+                 closest approach, "distance" in km and "speed" the
+                 relative speeds in km/s, as arrays sorted by time
+    """
+
+    # scipy.spatial is slow to import, so load it only when screening
+    from scipy.spatial import cKDTree
+
+    S = np.array(S,dtype=float,ndmin=2)
+    found = {"i": [], "j": [], "tca": [], "distance": [], "speed": []}
+
+    grid = np.append(np.arange(t0,tf,step),tf)
+    # every step owns the approaches between the midpoints with its neighbours
+    bounds = np.concatenate(([t0],(grid[1:]+grid[:-1])/2,[tf]))
+
+    for k, t in enumerate(grid):
+        if k > 0:
+            S = propagator(S,grid[k-1],t)
+        r, v = S[:,0:3], S[:,3:6]
+        half = max(t-bounds[k],bounds[k+1]-t)
+
+        # bound of the relative motion during half a step: straight line plus gravity
+        speed = np.sqrt(np.sum(v**2,axis=1))
+        r_min = np.min(np.sqrt(np.sum(r**2,axis=1)))
+        margin = 0.5*(2*mu/r_min**2)*half**2
+        radius = threshold+2*np.max(speed)*half+margin
+
+        pairs = cKDTree(r).query_pairs(radius,output_type='ndarray')
+        i, j = pairs[:,0], pairs[:,1]
+        instrument.count("conjunction_pairs",len(i))
+
+        # closest approach of the straight line motion within half a step
+        dr, dv = r[i]-r[j], v[i]-v[j]
+        dv2 = np.maximum(np.sum(dv**2,axis=1),1e-300)
+        tau = np.clip(-np.sum(dr*dv,axis=1)/dv2,-half,half)
+        keep = np.sqrt(np.sum((dr+dv*tau[:,None])**2,axis=1)) <= threshold+margin
+
+        geometry = orbit_geometry(S)
+        keep[keep] = apogee_perigee_filter(geometry,i[keep],j[keep],threshold+margin)
+        keep[keep] = orbit_path_filter(geometry,i[keep],j[keep],threshold+margin)
+        i, j = i[keep], j[keep]
+        instrument.count("conjunction_candidates",len(i))
+
+        if len(i) == 0:
+            continue
+
+        n = len(i)
+        lo = grid[k-1] if k > 0 else t0
+        hi = grid[k+1] if k+1 < len(grid) else tf
+        tca, distance, rel = refine(S[i],S[j],np.full(n,t),np.full(n,lo),np.full(n,hi),propagator)
+
+        last = k+1 == len(grid)
+        own = (tca >= bounds[k]) & ((tca < bounds[k+1]) | last) & (distance <= threshold)
+        for key, values in zip(("i","j","tca","distance","speed"),(i,j,tca,distance,rel)):
+            found[key].append(values[own])
+
+    result = {key: np.concatenate(values) if values else np.zeros(0) for key, values in found.items()}
+    result["i"] = result["i"].astype(int)
+    result["j"] = result["j"].astype(int)
+    order = np.argsort(result["tca"],kind="stable")
+
+    return {key: values[order] for key, values in result.items()}
@@ -1,9 +1,16 @@
-"""Numerical orbit propagator based on RK4. Takes into account J2 and drag perturbations."""
+"""Numerical orbit propagator based on RK4. Takes into account the zonal harmonics J2 to J6 of the gravity field,
+   J2 only by default, and drag perturbations."""
 
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+import math
 import numpy as np
+from util import instrument
 
 mu = 398600.4418  # gravitational parameter mu
 J2 = 1.08262668e-3 # J2 coefficient
+J3, J4, J5, J6 = -2.53265649e-6, -1.61962159e-6, -2.27296083e-7, 5.40681239e-7  # higher zonal coefficients
 Re = 6378.137  # equatorial radius of the Earth
 we = 7.292115e-5  # rotation rate of the Earth in rad/s
 ee = 0.08181819  # eccentricity of the Earth's shape
@@ -30,6 +37,159 @@ def drag(s):
 
     return acc
 
+def _density_table(h0=100.0,h1=1300.0,dh=10.0):
+    """Piecewise exponential fit of the density of drag, exact at the
+       limits of the bands. Every row is the logarithm of the density at
+       the base of a band and its decrease across the band. The density of
+       drag decreases up to 1312 km only, the last band is continued above
+       it."""
+
+    h = np.arange(h0,h1+dh/2,dh)
+    log_p = np.log(0.6)-(h-175)*(29.4-0.012*h)/915
+    return np.column_stack((log_p[:-1],-np.diff(log_p)))
+
+DENSITY_H0, DENSITY_DH = 100.0, 10.0
+DENSITY_TABLE = _density_table(DENSITY_H0,1300.0,DENSITY_DH)
+_LOG_P, _DECAY = DENSITY_TABLE[:,0].copy(), DENSITY_TABLE[:,1].copy()
+_DENSITY_ROWS = DENSITY_TABLE.tolist()
+_SWAP, _ROTATION = [1,0,2], np.array([-we,we,0])
+
+def density(h):
+    """Returns the density of the atmosphere from the table of bands
+       DENSITY_TABLE, within 0.05% of the density of drag between 100 and
+       1300 km.
+
+       Args:
+           h(float or numpy array): altitudes in km
+
+       Returns:
+           float or numpy array: densities in kg/km^3
+    """
+
+    x = (np.asarray(h,dtype=float)-DENSITY_H0)/DENSITY_DH
+    k = np.minimum(np.maximum(x,0),len(_LOG_P)-1).astype(int)
+    return np.exp(_LOG_P.take(k)-(x-k)*_DECAY.take(k))
+
+def drag_table(s):
+    """Returns the drag acceleration for a given state, with the density
+       of the table of bands. Same model as drag otherwise.
+
+       Args:
+           s(1x6 numpy array): the state vector [rx,ry,rz,vx,vy,vz]
+
+       Returns:
+           1x3 numpy array: the drag acceleration [ax,ay,az]
+    """
+
+    x, y, z, vx, vy, vz = s.tolist()
+    r2 = x*x+y*y+z*z
+    h = math.sqrt(r2)-Re+Re*ee*ee*z*z/r2
+
+    band = (h-DENSITY_H0)/DENSITY_DH
+    k = min(max(int(band),0),len(_DENSITY_ROWS)-1)
+    log_p, decay = _DENSITY_ROWS[k]
+    p = math.exp(log_p-(band-k)*decay)
+
+    vx, vy = vx+we*y, vy-we*x
+    K = -p*3.36131e-9*math.sqrt(vx*vx+vy*vy+vz*vz)
+    return np.array([K*vx,K*vy,K*vz])
+
+def drag_table_batch(S):
+    """Returns the drag acceleration for many states at once, with the
+       density of the table of bands.
+
+       Args:
+           S(nx6 numpy array): the state vectors [rx,ry,rz,vx,vy,vz]
+
+       Returns:
+           nx3 numpy array: the drag accelerations [ax,ay,az]
+    """
+
+    r2 = np.einsum('ij,ij->i',S[:,0:3],S[:,0:3])
+    h = np.sqrt(r2)+(Re*ee*ee)*S[:,2]**2/r2-Re
+
+    x = (h-DENSITY_H0)/DENSITY_DH
+    k = np.minimum(np.maximum(x,0),len(_LOG_P)-1).astype(int)
+    p = np.exp(_LOG_P.take(k)-(x-k)*_DECAY.take(k))
+
+    # velocity relative to the atmosphere, which rotates with the Earth
+    v_rel = S[:,3:6]-S[:,_SWAP]*_ROTATION
+    K = (-3.36131e-9)*p*np.sqrt(np.einsum('ij,ij->i',v_rel,v_rel))
+
+    return K[:,None]*v_rel
+
+# degree of the zonal harmonics of sdot and sdot_batch
+ZONAL_DEGREE = 2
+
+# n, Jn, (n+1)*Jn and the coefficients of the recurrence n*P_n = (2n-1)*u*P_(n-1)-(n-1)*P_(n-2) of every
+# zonal term
+ZONAL_TERMS = [(n,Jn,(n+1)*Jn,(2*n-1)/n,(n-1)/n) for n, Jn in zip(range(2,7),(J2,J3,J4,J5,J6))]
+
+def _zonal_terms(degree):
+    if not 0 <= degree <= len(ZONAL_TERMS)+1:
+        raise ValueError("the degree of the zonal harmonics must be between 0 and %d" % (len(ZONAL_TERMS)+1))
+    return ZONAL_TERMS[:max(degree-1,0)]
+
+def zonal_pert(s,degree=6):
+    """Returns the acceleration of the zonal harmonics J2 to J<degree> for
+       a given state. The Legendre polynomials of all the terms and their
+       derivatives are evaluated in one pass by recurrence.
+
+       Args:
+           s(1x6 numpy array): the state vector [rx,ry,rz,vx,vy,vz]
+           degree(int): highest degree of the zonal harmonics, 2 is J2 only
+
+       Returns:
+           1x3 numpy array: the zonal acceleration [ax,ay,az]
+    """
+
+    x, y, z = s[0:3].tolist()
+    r = math.sqrt(x*x+y*y+z*z)
+    u, rho = z/r, Re/r
+
+    # the radial term of degree n is (n+1)*P_n+u*dP_n/du, the sum of u*dP_n/du is u*axial
+    P0, P1, dP1 = 1.0, u, 1.0
+    rho_n, radial, axial = rho, 0.0, 0.0
+    for n, Jn, Kn, a, b in _zonal_terms(degree):
+        P, dP = a*u*P1-b*P0, u*dP1+n*P1
+        rho_n = rho_n*rho
+        radial += Kn*rho_n*P
+        axial += Jn*rho_n*dP
+        P0, P1, dP1 = P1, P, dP
+
+    k = mu/(r*r)
+    K = k*(radial+u*axial)/r
+    return np.array([K*x,K*y,K*z-k*axial])
+
+def zonal_pert_batch(S,degree=6):
+    """Returns the acceleration of the zonal harmonics J2 to J<degree> for
+       many states at once.
+
+       Args:
+           S(nx6 numpy array): the state vectors [rx,ry,rz,vx,vy,vz]
+           degree(int): highest degree of the zonal harmonics, 2 is J2 only
+
+       Returns:
+           nx3 numpy array: the zonal accelerations [ax,ay,az]
+    """
+
+    inv_r = 1/np.sqrt(np.einsum('ij,ij->i',S[:,0:3],S[:,0:3]))
+    u, rho = S[:,2]*inv_r, Re*inv_r
+
+    P0, P1, dP1 = 1.0, u, 1.0
+    rho_n, radial, axial = rho, 0.0, 0.0
+    for n, Jn, Kn, a, b in _zonal_terms(degree):
+        P, dP = a*u*P1-b*P0, u*dP1+n*P1
+        rho_n = rho_n*rho
+        radial = radial+Kn*rho_n*P
+        axial = axial+Jn*rho_n*dP
+        P0, P1, dP1 = P1, P, dP
+
+    k = mu*inv_r**2
+    acc = (k*(radial+u*axial)*inv_r)[:,None]*S[:,0:3]
+    acc[:,2] -= k*axial
+    return acc
+
 def j2_pert(s):
     """Returns the J2 acceleration for a given state.
 
@@ -49,26 +209,86 @@ def j2_pert(s):
 
     return comp
 
-def sdot(s):
+def sdot(s,degree=None):
     """Returns the time derivative of a given state.
 
        Args:
            s(1x6 numpy array): the state vector [rx,ry,rz,vx,vy,vz]
+           degree(int): degree of the zonal harmonics, ZONAL_DEGREE if None
 
        Returns:
            1x6 numpy array: the time derivative of s [vx,vy,vz,ax,ay,az]
     """
 
+    instrument.count("force_model_calls")
     mu = 398600.4405
     r = np.linalg.norm(s[0:3])
     a = -mu/(r**3)*s[0:3]
 
-    p_j2 = j2_pert(s)
-    p_drag = drag(s)
+    p_zonal = zonal_pert(s,ZONAL_DEGREE if degree is None else degree)
+    p_drag = drag_table(s)
 
-    a = a+p_j2+p_drag
+    a = a+p_zonal+p_drag
     return np.array([*s[3:6],*a])
 
+def drag_batch(S):
+    """Returns the drag acceleration for many states at once.
+
+       Args:
+           S(nx6 numpy array): the state vectors [rx,ry,rz,vx,vy,vz]
+
+       Returns:
+           nx3 numpy array: the drag accelerations [ax,ay,az]
+    """
+
+    r = np.sqrt(np.sum(S[:,0:3]**2,axis=1))
+    v_atm = we*np.column_stack((-S[:,1],S[:,0],np.zeros(len(S))))
+    v_rel = S[:,3:6] - v_atm
+
+    rs = Re*(1-(ee*S[:,2]/r)**2)
+    h = r-rs
+    p = 0.6*np.exp(-(h-175)*(29.4-0.012*h)/915)
+    coeff = 3.36131e-9
+    v = np.sqrt(np.sum(v_rel**2,axis=1))
+
+    return -(p*coeff*v)[:,None]*v_rel
+
+def j2_pert_batch(S):
+    """Returns the J2 acceleration for many states at once.
+
+       Args:
+           S(nx6 numpy array): the state vectors [rx,ry,rz,vx,vy,vz]
+
+       Returns:
+           nx3 numpy array: the J2 accelerations [ax,ay,az]
+    """
+
+    r = np.sqrt(np.sum(S[:,0:3]**2,axis=1))
+    K = -3*mu*J2*(Re**2)/2/r**5
+    comp = np.array([1,1,3]) - 5*((S[:,2]/r)**2)[:,None]
+
+    return K[:,None]*comp*S[:,0:3]
+
+def sdot_batch(S,degree=None):
+    """Returns the time derivative of many states at once. Same force
+       model as sdot.
+
+       Args:
+           S(nx6 numpy array): the state vectors [rx,ry,rz,vx,vy,vz]
+           degree(int): degree of the zonal harmonics, ZONAL_DEGREE if None
+
+       Returns:
+           nx6 numpy array: the time derivatives [vx,vy,vz,ax,ay,az]
+    """
+
+    instrument.count("force_model_calls",len(S))
+    mu = 398600.4405
+    r = np.sqrt(np.sum(S[:,0:3]**2,axis=1))
+    a = -(mu/r**3)[:,None]*S[:,0:3]
+
+    a = a+zonal_pert_batch(S,ZONAL_DEGREE if degree is None else degree)+drag_table_batch(S)
+    return np.hstack((S[:,3:6],a))
+
 def rkf45(s,t0,tf,h=10,tol=1e-6):
     """Runge-Kutta Fehlberg 4(5) Numerical Integrator
 
@@ -142,46 +362,244 @@ def rk4(s,t0,tf,h=30):
 
     return s
 
-def time_period(s,h=30):
-    """Returns the nodal time period of an orbit.
+def rk4_batch(S,t0,tf,h=30):
+    """Runge-Kutta 4th Order Numerical Integrator for many states at once.
+       Every state takes the same steps as with rk4, the force model is
+       evaluated once per stage for all the states that are still moving.
 
        Args:
-           s(1x6 numpy array): the state vector [rx,ry,rz,vx,vy,vz]
+           S(nx6 numpy array): the state vectors [rx,ry,rz,vx,vy,vz]
+           t0(float or 1xn numpy array): initial times
+           tf(float or 1xn numpy array): final times
            h(float): step-size
 
+      Returns:
+           nx6 numpy array: the states at the times tf
+    """
+
+    S = np.array(S,dtype=float,ndmin=2)
+    t = np.broadcast_to(np.asarray(t0,dtype=float),(len(S),)).copy()
+    tf = np.broadcast_to(np.asarray(tf,dtype=float),(len(S),))
+
+    while(True):
+        left = tf-t
+        active = np.nonzero(np.abs(left) > 0.00001)[0]
+        if len(active) == 0:
+            break
+
+        step = np.where(np.abs(left[active]) < h, left[active], np.copysign(h,left[active]))[:,None]
+        s = S[active]
+
+        k1 = step*sdot_batch(s)
+        k2 = step*sdot_batch(s+k1/2)
+        k3 = step*sdot_batch(s+k2/2)
+        k4 = step*sdot_batch(s+k3)
+
+        S[active] = s+(k1+2*k2+2*k3+k4)/6
+        t[active] = t[active]+step[:,0]
+
+    return S
+
+def hermite(S0,S1,dt):
+    """Returns the coefficients of the cubic Hermite interpolations of the
+       positions between pairs of states, in powers of the fraction of the
+       interval. The error is below a metre for low orbits and 60 second
+       intervals.
+
+       Args:
+           S0(nx6 numpy array): the states at the start of the intervals
+           S1(nx6 numpy array): the states at the end of the intervals
+           dt(1xn numpy array): the lengths of the intervals
+
        Returns:
-           float: the nodal time period of the orbit
+           tuple: four nx3 numpy arrays
     """
 
-    t = 0
+    r0, v0, r1, v1 = S0[:,0:3], S0[:,3:6]*dt[:,None], S1[:,0:3], S1[:,3:6]*dt[:,None]
+    return r0, v0, 3*(r1-r0)-2*v0-v1, 2*(r0-r1)+v0+v1
 
-    old_z, pass_1 = 0, None
+def hermite_states(c,t0,dt,t):
+    """Evaluates the Hermite interpolations of hermite.
 
-    while(True):
-        k1 = h*sdot(s)
-        k2 = h*sdot(s+k1/2)
-        k3 = h*sdot(s+k2/2)
-        k4 = h*sdot(s+k3)
+       Args:
+           c(tuple): output of hermite
+           t0(1xn numpy array): the start times of the intervals
+           dt(1xn numpy array): the lengths of the intervals
+           t(1xn numpy array): the times, one per interval
 
-        s = s+(k1+2*k2+2*k3+k4)/6
-        t = t+h
+       Returns:
+           tuple: (nx3 positions, nx3 velocities) at the times t
+    """
+
+    s = ((t-t0)/dt)[:,None]
+    r = c[0]+s*(c[1]+s*(c[2]+s*c[3]))
+    v = (c[1]+s*(2*c[2]+3*s*c[3]))/dt[:,None]
+    return r, v
 
-        if (s[2]>=0 and old_z<0):
-            dt = -s[2]/s[5]
-            t2 = t+dt
+def nodal_period(S):
+    """Returns the analytic nodal time period of orbits under J2, from the
+       secular rates of the mean anomaly and of the argument of perigee.
+       The mean semi-major axis is the osculating one minus its first order
+       J2 short periodic variation (Kozai). Drag is not taken into account.
+       Within a second of time_period for low orbits with e < 0.05.
 
-            if pass_1 is None:
-                pass_1 = t2
-            else:
-                return t2-pass_1
+       Args:
+           S(1x6 or nx6 numpy array): the state vectors [rx,ry,rz,vx,vy,vz]
 
-        old_z = s[2]
+       Returns:
+           float or 1xn numpy array: the nodal time periods of the orbits
+    """
+
+    S = np.asarray(S,dtype=float)
+    single = S.ndim == 1
+    S = np.atleast_2d(S)
+    mu = 398600.4405
+    r, v = S[:,0:3], S[:,3:6]
+
+    mag_r = np.sqrt(np.sum(r**2,axis=1))
+    h = np.cross(r,v)
+    mag_h = np.sqrt(np.sum(h**2,axis=1))
+    a = 1/(2/mag_r-np.sum(v**2,axis=1)/mu)
+    e2 = np.maximum(1-mag_h**2/(mu*a),0)
+    cos_i = h[:,2]/mag_h
+    sin2_i = 1-cos_i**2
+
+    # argument of latitude from the ascending node, any direction works for equatorial orbits
+    node = np.column_stack((-h[:,1],h[:,0],np.zeros(len(S))))
+    mag_n = np.sqrt(np.sum(node**2,axis=1))
+    node = np.where((mag_n > 0)[:,None],node/np.where(mag_n > 0,mag_n,1)[:,None],[1.0,0.0,0.0])
+    ahead = np.cross(h/mag_h[:,None],node)
+    cos_2u = (np.sum(r*node,axis=1)**2-np.sum(r*ahead,axis=1)**2)/mag_r**2
+
+    ratio = (a/mag_r)**3
+    da = J2*Re**2/a*((ratio-(1-e2)**-1.5)*(1-1.5*sin2_i)+1.5*ratio*sin2_i*cos_2u)
+    a = a-da
+
+    n = np.sqrt(mu/a**3)
+    k = 0.75*J2*(Re/(a*(1-e2)))**2
+    rate = n*(1+k*np.sqrt(1-e2)*(3*cos_i**2-1))+n*k*(5*cos_i**2-1)
+    period = 2*np.pi/rate
+
+    return period[0] if single else period
+
+def _rkf45_step(S,h):
+    """One Runge-Kutta Fehlberg 4(5) step of many states, h is the 1xn
+       array of the step-sizes. Returns the 4th order states and the norms
+       of their error estimates."""
+
+    h = h[:,None]
+    k1 = h*sdot_batch(S)
+    k2 = h*sdot_batch(S+k1/4)
+    k3 = h*sdot_batch(S+3/32*k1+9/32*k2)
+    k4 = h*sdot_batch(S+1932/2197*k1-7200/2197*k2+7296/2197*k3)
+    k5 = h*sdot_batch(S+439/216*k1-8*k2+3680/513*k3-845/4104*k4)
+    k6 = h*sdot_batch(S-8/27*k1+2*k2-3544/2565*k3+1859/4104*k4-11/40*k5)
+
+    y = S+25/216*k1+1408/2565*k3+2197/4104*k4-k5/5
+    z = S+16/135*k1+6656/12825*k3+28561/56430*k4-9/50*k5+2/55*k6
+
+    return y, np.sqrt(np.sum((y-z)**2,axis=1))
+
+def _node_crossing(S,h):
+    """Time after the states S of the ascending node crossing within the
+       steps h, from Newton iterations on z with single RKF45 steps."""
+
+    tau = h/2
+    for _ in range(4):
+        y, _ = _rkf45_step(S,tau)
+        tau = np.clip(tau-y[:,2]/y[:,5],0,h)
+    return tau
+
+def time_period(s,h=30,tol=1e-6,max_steps=10000,analytic=False):
+    """Returns the nodal time period of orbits, from the times of two
+       consecutive ascending node crossings. The states are integrated
+       together with RKF45 and adaptive step-sizes, and every crossing is
+       refined from the step in which z changes sign.
+
+       Args:
+           s(1x6 or nx6 numpy array): the state vectors [rx,ry,rz,vx,vy,vz]
+           h(float): initial step-size
+           tol(float): tolerance of the error of a step
+           max_steps(int): maximum number of steps, the periods of the
+                           orbits that have not crossed the node twice by
+                           then are NaN, as those of equatorial orbits
+           analytic(bool): return nodal_period, without integration
+
+       Returns:
+           float or 1xn numpy array: the nodal time periods of the orbits
+    """
+
+    if analytic:
+        return nodal_period(s)
+
+    S = np.array(s,dtype=float)
+    single = S.ndim == 1
+    S = np.atleast_2d(S)
+    n = len(S)
+
+    t = np.zeros(n)
+    step = np.full(n,float(h))
+    first = np.full(n,np.nan)
+    period = np.full(n,np.nan)
+    # the force model keeps equatorial orbits in the equatorial plane, they have no nodes
+    active = np.nonzero((S[:,2] != 0) | (S[:,5] != 0))[0]
+
+    for _ in range(max_steps):
+        if len(active) == 0:
+            break
+
+        y, err = _rkf45_step(S[active],step[active])
+        accept = err <= tol
+        # step-size control of rkf45, within a factor of 4
+        factor = np.clip(0.84*(tol/np.maximum(err,1e-300))**0.25,0.25,4)
+        factor = np.where(np.isfinite(factor),factor,0.25)
+
+        idx = active[accept]
+        old, new = S[idx], y[accept]
+        cross = (old[:,2] < 0) & (new[:,2] >= 0)
+        if np.any(cross):
+            c = idx[cross]
+            event = t[c]+_node_crossing(old[cross],step[c])
+            period[c] = np.where(np.isnan(first[c]),np.nan,event-first[c])
+            first[c] = np.where(np.isnan(first[c]),event,first[c])
+
+        S[idx] = new
+        t[idx] = t[idx]+step[idx]
+        step[active] = step[active]*factor
+        active = active[np.isnan(period[active])]
+
+    instrument.count("time_period_unfinished",len(active))
+
+    return period[0] if single else period
 
 def propagate_state(s,t0,tf):
     """Equivalent to the rk4 function."""
 
     return rk4(s,t0,tf)
 
+def propagate_states(s,t0,t,h=30):
+    """Propagates a state to many times in a single pass. Every state is
+       propagated from the previous one, so the whole timeline is integrated
+       only once.
+
+       Args:
+           s(1x6 numpy array): the state vector at t0 [rx,ry,rz,vx,vy,vz]
+           t0(float): initial time
+           t(1xn numpy array): output times, sorted in increasing order
+           h(float): maximum step-size
+
+       Returns:
+           nx6 numpy array: the states at the times t
+    """
+
+    states = np.empty((len(t),6))
+    for i,tf in enumerate(t):
+        s = rk4(s,t0,tf,h)
+        t0 = tf
+        states[i] = s
+
+    return states
+
 if __name__ == "__main__":
     s = np.array([2.87393871e+03,5.22992358e+03,3.23958865e+03,-3.49496655e+00,4.87211332e+00,-4.76792145e+00])
     t0, tf = 0, 88796.3088704
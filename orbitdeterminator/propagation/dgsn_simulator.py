@@ -13,9 +13,10 @@ import threading
 from functools import partial
 import numpy as np
 
-from orbitdeterminator.propagation.cowell import propagate_state
+from orbitdeterminator.propagation.cowell import (propagate_state, propagate_states)
 from orbitdeterminator.util.teme_to_ecef import conv_to_ecef
 from orbitdeterminator.util.new_tle_kep_state import kep_to_state
+from orbitdeterminator.propagation.buffered_writer import buffered_save_r
 
 class DGSNSimulator():
     """A class for the simulator."""
@@ -108,6 +109,50 @@ class DGSNSimulator():
         self.is_running = False
         self.op_writer.close()
 
+    def fast_forward(self, duration, file_name=None, seed=None):
+        """Generates observations offline, as fast as possible, instead of
+           in real time. Uses the same noise and gap model as calc(), but
+           draws all the intervals and the noise at once, propagates the
+           orbit once over the whole timeline and writes the result to
+           file_name in a single write, in the format of save_r.
+
+           Args:
+               duration(float): simulated time span in seconds
+               file_name(string): file the observations are appended to,
+                                  nothing is written if None
+               seed(int): seed of the random generator
+
+           Returns:
+               nx4 numpy array: the observations [t,x,y,z]
+        """
+
+        rng = np.random.RandomState(seed)
+
+        # intervals are integers in [1,period] like in calc(), so there
+        # can never be more than duration observations
+        n = max(int(duration),0)
+        t = self.t + np.cumsum(rng.randint(1,self.period+1,n))
+        t = t[t <= self.t+duration]
+
+        states = propagate_states(self.s,self.t0,t)
+        r = states[:,0:3] + rng.normal(0,self.r_jit,(len(t),3))
+        obs = np.column_stack((t,r))
+
+        # continue the real time simulation from the last propagated state
+        if len(t) > 0:
+            self.s = states[-1]
+            self.t = self.t0 = t[-1]
+
+        if self.dgsn_omega is not None:
+            obs = obs[np.abs(np.cos(self.dgsn_omega*t)) >= self.dgsn_thresh]
+
+        if file_name is not None:
+            lines = ["{} {} {} {}\r\n".format(int(row[0]),*row[1:4]) for row in obs]
+            with open(file_name,'a+') as f:
+                f.write("".join(lines))
+
+        return obs
+
 def __sig_handler(simulator, signal, frame):
     """Ctrl-C handler"""
 
@@ -236,7 +281,7 @@ if __name__ == "__main__":
     #params.dgsn_period = 1350
     #params.dgsn_thresh = 0.7
 
-    params.op_writer = save_r('ISS_DGSN.csv')
+    params.op_writer = buffered_save_r('ISS_DGSN.csv',header=False)
 
     s = DGSNSimulator(params)
     signal.signal(signal.SIGINT, partial(__sig_handler,s))
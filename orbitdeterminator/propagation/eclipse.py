@@ -0,0 +1,203 @@
+"""Computes the intervals that objects spend in the shadow of the Earth.
+
+   The position of the Sun comes from the low precision analytic
+   ephemeris of the Astronomical Almanac, accurate to about 0.01 degrees
+   between 1950 and 2050. Two shadow models are available:
+
+   * cylindrical: the umbra is a cylinder of the radius of the Earth
+     behind it, there is no penumbra
+   * conical: the umbra and the penumbra are the cones tangent to the
+     Earth and to the Sun, from the apparent radii of both seen by the
+     object
+
+   The shadow functions are evaluated for the whole ephemeris at once.
+   The crossings of the shadow boundaries are bracketed by the samples
+   where the functions change sign, and refined by bisection on cubic
+   Hermite interpolations of the states (cowell.hermite), so the cost is
+   linear in the length of the ephemeris. The samples must be closer than
+   the shortest shadow interval, a minute is enough for any orbit.
+"""
+
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+import numpy as np
+
+from util import instrument
+from propagation import cowell
+
+Re = 6378.137  # equatorial radius of the Earth
+Rs = 696000.0  # radius of the Sun
+AU = 149597870.7
+
+SUNLIT, PENUMBRA, UMBRA = 0, 1, 2
+
+def sun_position(t):
+    """Returns the position of the Sun from the low precision ephemeris of
+       the Astronomical Almanac.
+
+       Args:
+           t(float or numpy array): unix timestamps
+
+       Returns:
+           numpy array: ...x3 positions of the Sun in km, in the equatorial
+                        frame of date
+    """
+
+    T = (np.asarray(t,dtype=float)/86400+2440587.5-2451545.0)/36525
+
+    mean_lon = 280.460+36000.771*T
+    M = np.radians(357.5291092+35999.05034*T)
+    lon = np.radians(mean_lon+1.914666471*np.sin(M)+0.019994643*np.sin(2*M))
+    r = AU*(1.000140612-0.016708617*np.cos(M)-0.000139589*np.cos(2*M))
+    eps = np.radians(23.439291-0.0130042*T)
+
+    return np.stack((r*np.cos(lon),r*np.cos(eps)*np.sin(lon),r*np.sin(eps)*np.sin(lon)),axis=-1)
+
+def cylindrical(r,r_sun):
+    """Shadow function of the cylindrical model.
+
+       Args:
+           r(numpy array): ...x3 positions of the objects in km
+           r_sun(numpy array): ...x3 positions of the Sun in km
+
+       Returns:
+           numpy array: distance in km of the objects from the umbra,
+                        negative inside
+    """
+
+    u = r_sun/np.sqrt(np.sum(r_sun**2,axis=-1))[...,None]
+    along = np.sum(r*u,axis=-1)
+    across = np.sqrt(np.maximum(np.sum(r**2,axis=-1)-along**2,0))
+
+    # on the side of the Sun the function only has to be positive and continuous
+    return np.where(along < 0,across-Re,across-Re+along)
+
+def conical(r,r_sun):
+    """Shadow functions of the conical model. The object is in the
+       penumbra when the angle between the centres of the Earth and of the
+       Sun it sees is smaller than the sum of their apparent radii, and in
+       the umbra when it is smaller than their difference.
+
+       Args:
+           r(numpy array): ...x3 positions of the objects in km
+           r_sun(numpy array): ...x3 positions of the Sun in km
+
+       Returns:
+           tuple: (umbra, penumbra) functions in radians, negative inside
+    """
+
+    s = r_sun-r
+    mag_r = np.sqrt(np.sum(r**2,axis=-1))
+    mag_s = np.sqrt(np.sum(s**2,axis=-1))
+
+    earth = np.arcsin(np.minimum(Re/mag_r,1))
+    sun = np.arcsin(Rs/mag_s)
+    theta = np.arccos(np.clip(-np.sum(r*s,axis=-1)/(mag_r*mag_s),-1,1))
+
+    return theta-(earth-sun), theta-(earth+sun)
+
+def _functions(r,r_sun,model):
+    if model == "conical":
+        umbra, penumbra = conical(r,r_sun)
+        return {UMBRA: umbra, PENUMBRA: penumbra}
+    if model == "cylindrical":
+        return {UMBRA: cylindrical(r,r_sun)}
+    raise ValueError("unknown shadow model %r, expected 'conical' or 'cylindrical'" % model)
+
+def shadow(r,t,model="conical"):
+    """Returns the shadow condition of positions.
+
+       Args:
+           r(numpy array): ...x3 positions in km
+           t(float or numpy array): unix timestamps of the positions
+           model(string): "conical" or "cylindrical"
+
+       Returns:
+           numpy array: SUNLIT, PENUMBRA or UMBRA for every position
+    """
+
+    functions = _functions(np.asarray(r,dtype=float),sun_position(t),model)
+    condition = np.zeros(np.shape(functions[UMBRA]),dtype=int)
+    for kind in sorted(functions):
+        condition = np.where(functions[kind] < 0,np.maximum(condition,kind),condition)
+    return condition
+
+def _refine(S0,S1,t0,dt,kind,entry,model,iterations):
+    """Bisection of the brackets of the shadow boundary crossings."""
+
+    c = cowell.hermite(S0,S1,dt)
+
+    def inside(t):
+        r, _ = cowell.hermite_states(c,t0,dt,t)
+        return _functions(r,sun_position(t),model)[kind] < 0
+
+    a, b = t0.copy(), t0+dt
+    for _ in range(iterations):
+        mid = (a+b)/2
+        # before an entry and after an exit the object is outside
+        before = inside(mid) != entry
+        a = np.where(before,mid,a)
+        b = np.where(before,b,mid)
+
+    return (a+b)/2
+
+def intervals(t,S,model="conical",iterations=30):
+    """Finds the shadow intervals of ephemerides, from cowell or SGP4.
+
+       Args:
+           t(1xn numpy array): unix timestamps of the samples, in increasing
+                               order
+           S(numpy array): nx6 states [rx,ry,rz,vx,vy,vz] of one object or
+                           mxnx6 states of m objects at the times t
+           model(string): "conical" or "cylindrical"
+           iterations(int): number of bisections of the crossings
+
+       Returns:
+           dict: "object", "kind" (UMBRA or PENUMBRA), "entry" and "exit"
+                 times of every interval, as arrays sorted by object, kind
+                 and time. The penumbra intervals include the umbra ones.
+                 The entries before the first sample and the exits after
+                 the last one are NaN.
+    """
+
+    t = np.asarray(t,dtype=float)
+    S = np.array(S,dtype=float,ndmin=2)
+    if S.ndim == 2:
+        S = S[None]
+
+    functions = _functions(S[...,0:3],sun_position(t)[None],model)
+    found = []
+
+    for kind, g in functions.items():
+        inside = g < 0
+
+        # in shadow at the start or at the end of the ephemeris
+        for k, entry, order in ((0,True,t[0]-1),(-1,False,t[-1]+1)):
+            obj = np.nonzero(inside[:,k])[0]
+            found.append((obj,np.full(len(obj),kind),np.full(len(obj),entry),np.full(len(obj),np.nan),
+                          np.full(len(obj),order)))
+
+        for entry in (True,False):
+            obj, k = np.nonzero(inside[:,1:] & ~inside[:,:-1] if entry else inside[:,:-1] & ~inside[:,1:])
+            dt = t[k+1]-t[k]
+            times = _refine(S[obj,k],S[obj,k+1],t[k],dt,kind,entry,model,iterations)
+            instrument.count("eclipse_crossings",len(times))
+            found.append((obj,np.full(len(obj),kind),np.full(len(obj),entry),times,times))
+
+    obj, kind, entry, times, order = (np.concatenate(x) for x in zip(*found))
+    idx = np.lexsort((order,kind,obj))
+    obj, kind, entry, times = obj[idx], kind[idx], entry[idx], times[idx]
+
+    # the crossings of every object and kind alternate, every interval starts with an entry
+    interval = np.cumsum(entry)-1
+    n = interval[-1]+1 if len(interval) else 0
+
+    result = {"object": np.zeros(n,dtype=int), "kind": np.zeros(n,dtype=int), "entry": np.full(n,np.nan),
+              "exit": np.full(n,np.nan)}
+    result["object"][interval] = obj
+    result["kind"][interval] = kind
+    result["entry"][interval[entry]] = times[entry]
+    result["exit"][interval[~entry]] = times[~entry]
+
+    return result
@@ -0,0 +1,210 @@
+"""Outputs the locations of many satellites periodically. This is like
+   simulator.py, but a single scheduler thread drives all the satellites
+   from a heap ordered event queue instead of one timer thread per
+   satellite. All the satellites that are due at a tick are propagated
+   with one batched call and the results are passed to the op_writer of
+   every satellite.
+"""
+
+import sys
+import time
+import heapq
+import signal
+import threading
+from functools import partial
+import numpy as np
+
+from orbitdeterminator.propagation.cowell import rk4_batch
+from orbitdeterminator.util.new_tle_kep_state import kep_to_state
+from orbitdeterminator.propagation.simulator import OpWriter
+from orbitdeterminator.propagation.buffered_writer import routed_save_r
+
+class MultiSimulator():
+    """A class for the multi satellite simulator."""
+
+    def __init__(self,params):
+        """Initializes the simulator.
+
+           Args:
+               params: A MultiSimParams object containing keps,epoch,t0,
+                       period,speed and op_writers
+
+           Returns:
+               nothing
+        """
+
+        keps = np.array(params.keps,dtype=float,ndmin=2)
+        n = len(keps)
+
+        self.period    = np.broadcast_to(np.asarray(params.period,dtype=float),(n,)).copy()
+        self.speed     = params.speed
+        self.t_start   = params.t0
+
+        if params.op_writers is None:
+            self.op_writers = [OpWriter() for i in range(n)]
+        else:
+            self.op_writers = list(params.op_writers)
+        if len(self.op_writers) != n:
+            raise ValueError("one op_writer per satellite is needed")
+
+        self.s = np.array([kep_to_state(kep).flatten() for kep in keps])
+        self.t = np.full(n,float(params.t0))
+
+        # propagate every satellite from its epoch to t0
+        epoch = np.broadcast_to(np.asarray(params.epoch,dtype=float),(n,))
+        self.s = rk4_batch(self.s,epoch,self.t)
+
+        # the event queue holds (next time, satellite index)
+        self.events = [(self.t[i],i) for i in range(n)]
+        heapq.heapify(self.events)
+
+        self.sched_thr = None
+        self.stop_event = threading.Event()
+        self.is_running = False
+
+    def open(self):
+        """Opens the op_writers of all the satellites."""
+
+        for writer in self.op_writers:
+            writer.open()
+
+    def close(self):
+        """Closes the op_writers of all the satellites."""
+
+        for writer in self.op_writers:
+            writer.close()
+
+    def step(self,t_now):
+        """Processes every event that is due at t_now. Due satellites are
+           propagated together to their own event time and rescheduled
+           one period later.
+
+           Args:
+               t_now(float): current time of simulation
+
+           Returns:
+               int: the number of satellites that were propagated
+        """
+
+        due = []
+        while self.events and self.events[0][0] <= t_now:
+            due.append(heapq.heappop(self.events))
+        if not due:
+            return 0
+
+        tf = np.array([e[0] for e in due])
+        idx = np.array([e[1] for e in due])
+
+        self.s[idx] = rk4_batch(self.s[idx],self.t[idx],tf)
+        self.t[idx] = tf
+
+        for i,t in zip(idx,tf):
+            self.op_writers[i].write(t,self.s[i])
+            heapq.heappush(self.events,(t+self.period[i],i))
+
+        return len(due)
+
+    def run_until(self,t_end):
+        """Runs the simulation offline, as fast as possible, until t_end.
+           Satellites with the same event time are still batched together.
+
+           Args:
+               t_end(float): time at which the simulation stops
+        """
+
+        while self.events and self.events[0][0] <= t_end:
+            self.step(self.events[0][0])
+
+    def simulate(self):
+        """Starts the scheduler thread and waits for keyboard input.
+           Press q or Ctrl-C to quit the simulator cleanly."""
+
+        self.is_running = True
+        self.stop_event.clear()
+
+        self.open()
+        self.sched_thr = threading.Thread(target=self.schedule)
+        self.sched_thr.start()
+
+        # listen for commands.
+        # only quit command implemented for now
+        while self.is_running:
+            c = input()
+            if (c == 'q'):
+                self.stop()
+
+    def schedule(self):
+        """The scheduler loop. Sleeps until the next event is due in wall
+           clock time, then processes all the events that are due."""
+
+        wall_start = time.time()
+        while not self.stop_event.is_set() and self.events:
+            t_next = self.events[0][0]
+            wait = wall_start + (t_next-self.t_start)/self.speed - time.time()
+            if wait > 0 and self.stop_event.wait(wait):
+                break
+
+            # catch up with all the events that are due by now
+            t_now = max(t_next,self.t_start + (time.time()-wall_start)*self.speed)
+            self.step(t_now)
+
+    def stop(self):
+        """Stops the simulator cleanly."""
+
+        self.stop_event.set()
+        if self.sched_thr is not None:
+            self.sched_thr.join()
+            self.sched_thr = None
+        self.is_running = False
+        self.close()
+
+def __sig_handler(simulator, signal, frame):
+    """Ctrl-C handler"""
+
+    simulator.stop()
+    sys.exit(0)
+
+class MultiSimParams():
+    """MultiSimParams class. This is just a container for all
+       the parameters required to start the simulation.
+
+       Params
+       ------
+       keps(nx6 numpy array): the intial osculating keplerian elements
+                              of every satellite
+       epoch(float or 1xn numpy array): the epoch of the above keps
+       period(float or 1xn numpy array): time period between observations
+       t0(float): starting time of the simulation
+       speed(float): speed of the simulation
+       op_writers(list): one OpWriter per satellite, OpWriter() if None
+
+    """
+
+    keps = None
+    epoch = None
+    period = 1
+    t0 = int(time.time())
+    speed = 1
+    op_writers = None
+
+if __name__ == "__main__":
+    epoch = 1531152114
+    iss_kep = np.array([6785.68682,0.0003456,51.6418,290.0933,266.6543,212.430557])
+
+    # a ring of satellites in the orbit of the ISS
+    n = 100
+    keps = np.tile(iss_kep,(n,1))
+    keps[:,5] = np.linspace(0,360,n,endpoint=False)
+
+    params = MultiSimParams()
+    params.keps = keps
+    params.epoch = epoch
+    params.period = 10
+    params.speed = 10
+    # one buffer and flush thread shared by all the satellites
+    writer = routed_save_r(['SAT_{:03d}.csv'.format(i) for i in range(n)])
+    params.op_writers = [writer.channel(i) for i in range(n)]
+
+    s = MultiSimulator(params)
+    signal.signal(signal.SIGINT, partial(__sig_handler,s))
+    s.simulate()
@@ -0,0 +1,343 @@
+"""Predicts the passes of many satellites over many ground stations.
+
+   The satellites are propagated together on a coarse time grid with a
+   batched propagator, cowell.rk4_batch by default, and the elevation of
+   every satellite from every station and its rate are computed for the
+   whole grid step at once. Rise and set are bracketed by the steps where
+   the elevation crosses the minimum elevation, culminations by the steps
+   where the elevation rate changes sign. The brackets are refined by
+   bisection on cubic Hermite interpolations of the states at the two
+   ends of the step, so the refinement does not call the propagator. The
+   interpolation error is below a metre for low orbits and 60 second
+   steps.
+
+   The full elevation is only computed for the pairs of satellites and
+   stations that pass a cheap prefilter: the angle between the satellite
+   and the station seen from the centre of the Earth has to be inside the
+   horizon cone of the station for the altitude of the satellite, widened
+   by the angle the satellite can move in a step. The other pairs cannot
+   be visible at any time of the step, so they cannot have events.
+
+   Passes shorter than a step are found from their culmination. Passes
+   that are in progress at the start or at the end of the window have NaN
+   rise or set times. The stations are on the WGS84 ellipsoid, the
+   satellite states are in the TEME frame of util/teme_to_ecef.py and the
+   times are unix timestamps.
+"""
+
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+import numpy as np
+
+from util import (teme_to_ecef, instrument)
+from propagation import cowell
+
+Re = 6378.137  # equatorial radius of WGS84
+f = 1/298.257223563  # flattening of WGS84
+w = 2*np.pi*1.00273790935/86400  # rotation rate of the Earth, consistent with teme_to_ecef.gmst
+tilt = np.radians(0.2)  # upper bound of the angle between the normal to the ellipsoid and the radial direction
+
+RISE, CULMINATION, SET = 0, 1, 2
+
+def station_ecef(stations):
+    """Returns the positions and the local vertical of ground stations.
+
+       Args:
+           stations(nx3 numpy array): geodetic [latitude, longitude, altitude]
+                                      in degrees, degrees and km
+
+       Returns:
+           tuple: (nx3 positions in km, nx3 unit normals to the ellipsoid),
+                  in the ECEF frame
+    """
+
+    stations = np.array(stations,dtype=float,ndmin=2)
+    lat, lon = np.radians(stations[:,0]), np.radians(stations[:,1])
+    alt = stations[:,2]
+
+    e2 = f*(2-f)
+    N = Re/np.sqrt(1-e2*np.sin(lat)**2)
+    up = np.column_stack((np.cos(lat)*np.cos(lon),np.cos(lat)*np.sin(lon),np.sin(lat)))
+    pos = np.column_stack(((N+alt)*np.cos(lat)*np.cos(lon),(N+alt)*np.cos(lat)*np.sin(lon),
+                           (N*(1-e2)+alt)*np.sin(lat)))
+
+    return pos, up
+
+def _rotate(vectors,theta):
+    """Rotates ECEF vectors to TEME, theta are the sidereal times in radians."""
+
+    c, s = np.cos(theta), np.sin(theta)
+    x = c*vectors[...,0]-s*vectors[...,1]
+    y = s*vectors[...,0]+c*vectors[...,1]
+    return np.stack((x,y,np.broadcast_to(vectors[...,2],x.shape)),axis=-1)
+
+def sin_elevation(r,t,pos,up):
+    """Returns the sine of the elevation of satellites from stations,
+       without its rate. All the arguments are broadcast together.
+
+       Args:
+           r(numpy array): ...x3 satellite positions in TEME
+           t(float or numpy array): times of the positions
+           pos(numpy array): ...x3 station positions in ECEF
+           up(numpy array): ...x3 station normals in ECEF
+
+       Returns:
+           numpy array: sine of the elevations
+    """
+
+    theta = np.radians(teme_to_ecef.gmst(t))
+    rho = r-_rotate(pos,theta)
+    return np.sum(rho*_rotate(up,theta),axis=-1)/np.sqrt(np.sum(rho**2,axis=-1))
+
+def candidates(S,t,pos,sin_min,step):
+    """Prefilter of the pairs of satellites and stations that can be
+       visible during a step ending or starting at t. The angle between a
+       satellite and a station seen from the centre of the Earth is
+       compared with the horizon cone of the station,
+       arccos(|pos|cos(el)/|r|)-el, for the largest radius the satellite
+       can reach in the step and the minimum elevation lowered by the tilt
+       of the normal to the ellipsoid, plus the angle the satellite and the
+       station can move apart in the step.
+
+       Args:
+           S(nx6 numpy array): satellite states in TEME at t
+           t(float): time of the states
+           pos(mx3 numpy array): station positions in ECEF
+           sin_min(float): sine of the minimum elevation
+           step(float): length of the step in seconds
+
+       Returns:
+           nxm boolean numpy array: False for the pairs that cannot be
+                                    visible in the step
+    """
+
+    R = _rotate(pos,np.radians(teme_to_ecef.gmst(t)))
+    mag_R = np.sqrt(np.sum(R**2,axis=1))
+    mag_r = np.sqrt(np.sum(S[:,0:3]**2,axis=1))
+    speed = np.sqrt(np.sum(S[:,3:6]**2,axis=1))
+
+    el = np.arcsin(sin_min)-tilt
+    r_max = mag_r+speed*step
+    cone = np.arccos(np.clip(mag_R[None]*np.cos(el)/r_max[:,None],-1,1))-el
+    # a factor 2 on the motion covers the change of the speed in the step
+    cone += (2*speed/mag_r+w)[:,None]*step
+
+    cos_sep = (S[:,0:3]@R.T)/(mag_r[:,None]*mag_R[None])
+    return cos_sep > np.cos(np.minimum(cone,np.pi))
+
+def elevation(r,v,t,pos,up):
+    """Returns the sine of the elevation of satellites from stations and
+       its time derivative. All the arguments are broadcast together.
+
+       Args:
+           r(numpy array): ...x3 satellite positions in TEME
+           v(numpy array): ...x3 satellite velocities in TEME
+           t(float or numpy array): times of the states
+           pos(numpy array): ...x3 station positions in ECEF
+           up(numpy array): ...x3 station normals in ECEF
+
+       Returns:
+           tuple: (sine of the elevations, their rates in 1/s)
+    """
+
+    theta = np.radians(teme_to_ecef.gmst(t))
+    R, U = _rotate(pos,theta), _rotate(up,theta)
+
+    rho = r-R
+    # the station moves with the rotation of the Earth
+    rho_dot = v-w*np.stack((-R[...,1],R[...,0],np.zeros(R.shape[:-1])),axis=-1)
+    U_dot = w*np.stack((-U[...,1],U[...,0],np.zeros(U.shape[:-1])),axis=-1)
+
+    d = np.sqrt(np.sum(rho**2,axis=-1))
+    sin_el = np.sum(rho*U,axis=-1)/d
+    rate = (np.sum(rho_dot*U,axis=-1)+np.sum(rho*U_dot,axis=-1))/d-sin_el*np.sum(rho*rho_dot,axis=-1)/d**2
+
+    return sin_el, rate
+
+def _refine(events,pos,up,sin_min,iterations=20):
+    """Refines the brackets of the events by bisection, all of them at once.
+
+       Args:
+           events(dict): arrays "kind", "station", "S0", "S1", "t0", "dt" and
+                         the search intervals "lo", "hi"
+           pos(nx3 numpy array): station positions in ECEF
+           up(nx3 numpy array): station normals in ECEF
+           sin_min(float): sine of the minimum elevation
+           iterations(int): number of bisections
+
+       Returns:
+           tuple: (times of the events, sine of the elevations at them)
+    """
+
+    kind = events["kind"]
+    sta = events["station"]
+    c = cowell.hermite(events["S0"],events["S1"],events["dt"])
+    P, U = pos[sta], up[sta]
+    culm = np.nonzero(kind == CULMINATION)[0]
+
+    def g(t):
+        r, v = cowell.hermite_states(c,events["t0"],events["dt"],t)
+        # every function goes from negative to positive in its bracket
+        value = sin_elevation(r,t,P,U)-sin_min
+        value[kind == SET] *= -1
+        # the rate is only needed in the brackets of the culminations
+        value[culm] = -elevation(r[culm],v[culm],t[culm],P[culm],U[culm])[1]
+        return value
+
+    a, b = events["lo"].copy(), events["hi"].copy()
+    for _ in range(iterations):
+        mid = (a+b)/2
+        neg = g(mid) < 0
+        a = np.where(neg,mid,a)
+        b = np.where(neg,b,mid)
+
+    t = (a+b)/2
+    r, _ = cowell.hermite_states(c,events["t0"],events["dt"],t)
+    return t, sin_elevation(r,t,P,U)
+
+def _events(kind,sat,sta,S0,S1,t0,dt,lo,hi):
+    n = len(sat)
+    return {"kind": np.full(n,kind), "satellite": sat, "station": sta, "S0": S0, "S1": S1,
+            "t0": np.full(n,t0), "dt": np.full(n,dt), "lo": np.asarray(lo,dtype=float)*np.ones(n),
+            "hi": np.asarray(hi,dtype=float)*np.ones(n)}
+
+def _concat(chunks):
+    return {key: np.concatenate([c[key] for c in chunks]) for key in chunks[0]}
+
+def _assemble(kind,sat,sta,t,el,order,n_sta):
+    """Groups the events of every satellite and station into passes."""
+
+    idx = np.lexsort((order,sta,sat))
+    kind, sat, sta, t, el = kind[idx], sat[idx], sta[idx], t[idx], el[idx]
+
+    group = sat*n_sta+sta
+    start = np.ones(len(group),dtype=bool)
+    start[1:] = group[1:] != group[:-1]
+
+    # a pass starts with every rise, and with the first event of every pair if it is not a rise
+    pass_id = np.cumsum((kind == RISE) | start)-1
+    n = pass_id[-1]+1 if len(pass_id) else 0
+
+    passes = {"satellite": np.zeros(n,dtype=int), "station": np.zeros(n,dtype=int),
+              "rise": np.full(n,np.nan), "culmination": np.full(n,np.nan), "set": np.full(n,np.nan),
+              "max_elevation": np.full(n,np.nan)}
+    passes["satellite"][pass_id] = sat
+    passes["station"][pass_id] = sta
+
+    rise, sets = kind == RISE, kind == SET
+    passes["rise"][pass_id[rise]] = t[rise]
+    passes["set"][pass_id[sets]] = t[sets]
+
+    # the highest culmination of every pass, the events are sorted so the last assignment wins
+    culm = np.nonzero(kind == CULMINATION)[0]
+    culm = culm[np.lexsort((el[culm],pass_id[culm]))]
+    passes["culmination"][pass_id[culm]] = t[culm]
+    passes["max_elevation"][pass_id[culm]] = np.degrees(np.arcsin(np.clip(el[culm],-1,1)))
+
+    return passes
+
+def predict(S,t0,tf,stations,min_elevation=10.0,step=60.0,propagator=cowell.rk4_batch,chunk=64):
+    """Predicts all the passes of the satellites over the stations.
+
+       Args:
+           S(nx6 numpy array): the state vectors of the satellites at t0, in
+                               TEME [rx,ry,rz,vx,vy,vz]
+           t0(float): start of the window, unix timestamp
+           tf(float): end of the window, unix timestamp
+           stations(mx3 numpy array): geodetic [latitude, longitude,
+                                      altitude] of the stations in degrees,
+                                      degrees and km
+           min_elevation(float): elevation above which a satellite is
+                                 visible, in degrees
+           step(float): coarse time step in seconds
+           propagator(function): batched propagator (S,t0,tf) -> states,
+                                 cowell.rk4_batch by default
+           chunk(int): number of steps whose events are refined together
+
+       Returns:
+           dict: "satellite", "station", "rise", "culmination", "set" times
+                 and "max_elevation" in degrees of every pass, as arrays
+                 sorted by satellite, station and time. Times outside the
+                 window are NaN.
+    """
+
+    S = np.array(S,dtype=float,ndmin=2)
+    pos, up = station_ecef(stations)
+    sin_min = np.sin(np.radians(min_elevation))
+
+    grid = np.append(np.arange(t0,tf,step),tf)
+    pending, fixed = [], []
+    shape = (len(S),len(pos))
+
+    def flush():
+        if not pending:
+            return
+        events = _concat(pending)
+        pending.clear()
+        t, el = _refine(events,pos,up,sin_min)
+        instrument.count("pass_events_refined",len(t))
+
+        # passes shorter than a step: rise and set around a visible culmination inside the step
+        kind, sat, sta = events["kind"], events["satellite"], events["station"]
+        short = (kind == CULMINATION) & (el >= sin_min) & events["short"]
+        if np.any(short):
+            extra = {key: np.concatenate((values[short],values[short])) for key, values in events.items()}
+            m = np.count_nonzero(short)
+            extra["kind"] = np.repeat([RISE,SET],m)
+            extra["lo"] = np.concatenate((events["lo"][short],t[short]))
+            extra["hi"] = np.concatenate((t[short],events["hi"][short]))
+            t2, el2 = _refine(extra,pos,up,sin_min)
+            kind, sat, sta = (np.concatenate((a,extra[k])) for a, k in ((kind,"kind"),(sat,"satellite"),
+                                                                           (sta,"station")))
+            t, el = np.concatenate((t,t2)), np.concatenate((el,el2))
+
+        # culminations below the minimum elevation are not passes
+        keep = (kind != CULMINATION) | (el >= sin_min)
+        fixed.append((kind[keep],sat[keep],sta[keep],t[keep],el[keep],t[keep]))
+
+    def visible_at(k,S_k,kind,order):
+        sin_el, _ = elevation(S_k[:,None,0:3],S_k[:,None,3:6],grid[k],pos[None],up[None])
+        sat, sta = np.nonzero(sin_el >= sin_min)
+        n = len(sat)
+        fixed.append((np.full(n,kind),sat,sta,np.full(n,np.nan),sin_el[sat,sta],np.full(n,order)))
+
+    # passes in progress at the start
+    visible_at(0,S,RISE,t0-1)
+
+    prev = None
+    for k, t in enumerate(grid):
+        if k > 0:
+            S_prev = S
+            S = propagator(S,grid[k-1],t)
+        # the elevation of the pairs that fail the prefilter is not needed, their NaN rate has no sign change
+        sat, sta = np.nonzero(candidates(S,t,pos,sin_min,step))
+        instrument.count("pass_pairs_elevation",len(sat))
+        sin_el, rate = np.full(shape,-1.0), np.full(shape,np.nan)
+        sin_el[sat,sta], rate[sat,sta] = elevation(S[sat,0:3],S[sat,3:6],t,pos[sta],up[sta])
+        visible = sin_el >= sin_min
+
+        if prev is not None:
+            vis_prev, rate_prev = prev
+            t_prev, dt = grid[k-1], t-grid[k-1]
+            for kind, mask in ((RISE,~vis_prev & visible),(SET,vis_prev & ~visible),
+                               (CULMINATION,(rate_prev > 0) & (rate <= 0))):
+                sat, sta = np.nonzero(mask)
+                events = _events(kind,sat,sta,S_prev[sat],S[sat],t_prev,dt,t_prev,t)
+                events["short"] = ~vis_prev[sat,sta] & ~visible[sat,sta]
+                pending.append(events)
+
+        prev = (visible,rate)
+        if k % chunk == 0:
+            flush()
+
+    flush()
+
+    # passes in progress at the end
+    visible_at(len(grid)-1,S,SET,tf+1)
+
+    kind, sat, sta, t, el, order = (np.concatenate(x) for x in zip(*fixed))
+    passes = _assemble(kind,sat,sta,t,el,order,len(pos))
+    instrument.count("passes",len(passes["satellite"]))
+
+    return passes
@@ -11,6 +11,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.
 import numpy as np
 import math
 from kep_determination.gibbsMethod import *
+from util import instrument
 
 pi = np.pi
 meu = 398600.4418
@@ -160,6 +161,7 @@ class SGP4(object):
         Returns:
             tuple: position and velocity vector
         '''
+        instrument.count("sgp4_evaluations")
 
         # Constants
         s = ae + 78 / xkmper
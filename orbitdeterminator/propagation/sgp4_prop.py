@@ -2,12 +2,16 @@
    However, this does not generate an artificial TLE. So there is no
    string manipulation involved. Hence this is faster than sgp4_prop_string."""
 
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
 from datetime import datetime
 import numpy as np
 from sgp4.model import Satellite
 from sgp4.earth_gravity import wgs72
 from sgp4.propagation import sgp4init
 from orbitdeterminator.util.state_kep import state_kep
+from util import (instrument, kepler)
 
 def __true_to_mean(T,e):
     """Converts true anomaly to mean anomaly.
@@ -20,9 +24,7 @@ def __true_to_mean(T,e):
            float: the mean anomaly in degrees
     """
 
-    T = np.radians(T)
-    E = np.arctan2((1-e**2)*np.sin(T),e+np.cos(T))
-    M = E - e*np.sin(E)
+    M = kepler.true_to_mean(np.radians(T),e)
     M = np.degrees(M)
     M = M%360
     return M
@@ -109,6 +111,7 @@ def propagate_kep(kep,t0,tf,bstar=0.21109E-4):
     """
 
     sat = kep_to_sat(kep,t0,bstar=bstar)
+    instrument.count("sgp4_evaluations")
     tf = datetime.utcfromtimestamp(tf).timetuple()
     pos, vel = sat.propagate(
         tf.tm_year, tf.tm_mon, tf.tm_mday, tf.tm_hour, tf.tm_min, tf.tm_sec)
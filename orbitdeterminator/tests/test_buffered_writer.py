@@ -0,0 +1,143 @@
+import sys
+import os.path
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from orbitdeterminator.propagation.buffered_writer import (buffered_save_r, buffered_save_npy, routed_save_r,
+                                                           load_npy_chunks)
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+
+def states(n):
+    t = np.arange(n) + 1531152114
+    s = np.column_stack((t * 0.5, t * 0.25, -t * 1.0, t * 0.1, t * 0.2, t * 0.3))
+    return t, s
+
+
+def test_buffered_save_r(tmpdir):
+    file_name = str(tmpdir.join("out.csv"))
+    t, s = states(2500)
+
+    writer = buffered_save_r(file_name, buffer_size=1000)
+    writer.open()
+    for i in range(len(t)):
+        writer.write(int(t[i]), s[i])
+        writer.write(int(t[i]), s[i])     # repeated times are skipped
+    writer.close()
+
+    saved = np.loadtxt(file_name, comments='#')
+    assert_array_equal(saved, np.column_stack((t, s[:, 0:3])))
+    with open(file_name) as f:
+        assert f.readline().startswith('# Begin write')
+
+
+# Without the header the file has the format of dgsn_simulator.save_r
+def test_buffered_save_r_no_header(tmpdir):
+    file_name = str(tmpdir.join("out.csv"))
+    t, s = states(10)
+
+    writer = buffered_save_r(file_name, header=False)
+    writer.open()
+    for i in range(len(t)):
+        writer.write(int(t[i]), s[i])
+    writer.close()
+
+    with open(file_name) as f:
+        assert not f.read().startswith('#')
+    assert_array_equal(np.loadtxt(file_name), np.column_stack((t, s[:, 0:3])))
+
+
+# The channels share one buffer and thread, every satellite gets its own file
+def test_routed_save_r(tmpdir):
+    names = [str(tmpdir.join("SAT_{}.csv".format(i))) for i in range(3)]
+    t, s = states(500)
+
+    writer = routed_save_r(names, buffer_size=100)
+    channels = [writer.channel(i) for i in range(3)]
+    for channel in channels:
+        channel.open()
+    assert writer.flush_thr is not None
+    for k in range(len(t)):
+        for i, channel in enumerate(channels):
+            if k % (i+1) == 0:
+                channel.write(int(t[k]), s[k] * (i+1))
+                channel.write(int(t[k]), s[k] * (i+1))
+    for channel in channels:
+        assert writer.flush_thr is not None
+        channel.close()
+    assert writer.flush_thr is None
+
+    for i, name in enumerate(names):
+        saved = np.loadtxt(name, comments='#')
+        assert_array_equal(saved, np.column_stack((t, s[:, 0:3] * (i+1)))[::i+1])
+
+
+def test_buffered_save_npy(tmpdir):
+    name = str(tmpdir.join("out"))
+    t, s = states(250)
+
+    writer = buffered_save_npy(name, buffer_size=100, columns=6)
+    writer.open()
+    for i in range(len(t)):
+        writer.write(t[i], s[i])
+    writer.close()
+
+    assert_array_equal(load_npy_chunks(name), np.column_stack((t, s)))
+
+
+# Rows are flushed periodically even if the buffer never fills up
+def test_periodic_flush(tmpdir):
+    name = str(tmpdir.join("out"))
+    t, s = states(5)
+
+    writer = buffered_save_npy(name, buffer_size=1000, flush_interval=0.05)
+    writer.open()
+    for i in range(len(t)):
+        writer.write(t[i], s[i])
+
+    deadline = time.time() + 5
+    while len(load_npy_chunks(name)) < 5 and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(load_npy_chunks(name)) == 5
+    writer.close()
+
+
+# A small max_buffer only slows the writer down, nothing gets lost
+def test_bounded_buffer(tmpdir):
+    name = str(tmpdir.join("out"))
+    t, s = states(3000)
+
+    writer = buffered_save_npy(name, buffer_size=10, max_buffer=20)
+    writer.open()
+    for i in range(len(t)):
+        writer.write(t[i], s[i])
+    writer.close()
+
+    assert len(load_npy_chunks(name)) == 3000
+
+
+class failing_writer(buffered_save_npy):
+    fail = True
+
+    def flush_rows(self, rows):
+        if self.fail:
+            raise IOError("disk full")
+        super().flush_rows(rows)
+
+
+# A failed flush is raised by write() instead of blocking it, and no row is lost
+def test_flush_error(tmpdir):
+    name = str(tmpdir.join("out"))
+    t, s = states(50)
+
+    writer = failing_writer(name, buffer_size=10, max_buffer=20)
+    writer.open()
+    with pytest.raises(IOError):
+        for i in range(len(t)):
+            writer.write(t[i], s[i])
+    written = i
+
+    writer.fail = False
+    writer.close()
+    assert_array_equal(load_npy_chunks(name)[:, 0], t[0:written])
@@ -41,3 +41,24 @@ kep4 = np.array([[20000, 0.3, 90.0, 0.8, 0.0, 28.0],
 def test_check_keplerian_fail_2():
     with pytest.raises(AssertionError):
         assert_array_equal(lamberts_kalman.check_keplerian(kep4), kep4)
+
+
+# Screens a row for every reason and wraps the angles of the kept rows
+kep5 = np.array([[7000, 0.01, 51.6, -30.0, -120.0, 405.0],
+                 [7000, 1.0, 51.6, 30.0, 120.0, 45.0],
+                 [-7000, 1.2, 51.6, 30.0, 120.0, 45.0],
+                 [7000, 0.2, 51.6, 30.0, 120.0, 45.0],
+                 [7000, np.nan, 51.6, 30.0, 120.0, 45.0]])
+
+
+def test_screen_keplerian():
+    kep_final, reasons = lamberts_kalman.screen_keplerian(kep5)
+
+    assert_array_equal(kep_final, [[7000, 0.01, 51.6, 330.0, 240.0, 45.0]])
+    assert_array_equal(reasons, [0, lamberts_kalman.REJECT_HYPERBOLIC,
+                                 lamberts_kalman.REJECT_HYPERBOLIC | lamberts_kalman.REJECT_NEGATIVE_A,
+                                 lamberts_kalman.REJECT_SUBSURFACE, lamberts_kalman.REJECT_NOT_FINITE])
+    assert lamberts_kalman.rejection_counts(reasons) == {"hyperbolic": 2, "negative_a": 1, "subsurface": 1,
+                                                         "not_finite": 1, "kept": 1}
+    # the input is not modified
+    assert kep5[0, 3] == -30.0
@@ -0,0 +1,72 @@
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from propagation import (cowell, conjunction)
+from util import orbit_arrays
+import numpy as np
+import pytest
+
+
+def catalog(kep):
+    return orbit_arrays.StateArray.from_elements(orbit_arrays.ElementArray.from_columns(0, kep)).values().copy()
+
+
+rng = np.random.RandomState(1)
+n = 120
+kep = np.column_stack((rng.uniform(6800, 7300, n), rng.uniform(0, 0.02, n), rng.uniform(0, 180, n),
+                       rng.uniform(0, 360, n), rng.uniform(0, 360, n), rng.uniform(0, 360, n)))
+S = catalog(kep)
+
+# object 1 passes 0.5 km from object 0 at t = 634 on a plane turned by 60 degrees
+A = cowell.rk4(S[0], 0, 634.0)
+k = A[0:3] / np.linalg.norm(A[0:3])
+B = A.copy()
+B[0:3] += [0.3, 0.4, 0.0]
+B[3:6] = A[3:6] * np.cos(np.pi / 3) + np.cross(k, A[3:6]) * np.sin(np.pi / 3)
+S[1] = cowell.rk4(B, 634.0, 0)
+
+
+def test_screen():
+    result = conjunction.screen(S, 0, 1500, threshold=20.0, step=20.0)
+
+    assert result["i"][0] == 0 and result["j"][0] == 1
+    assert result["tca"][0] == pytest.approx(634.0, abs=0.5)
+    assert result["distance"][0] < 0.5
+    assert np.all(result["distance"] <= 20.0)
+    assert np.all(np.diff(result["tca"]) >= 0)
+
+    # brute force check of the distances every 2 seconds
+    t = np.arange(0, 1502, 2.0)
+    states = [S]
+    for t1, t2 in zip(t[:-1], t[1:]):
+        states.append(cowell.rk4_batch(states[-1], t1, t2))
+    P = np.array(states)[:, :, 0:3]
+    i, j = np.triu_indices(n, 1)
+    d = np.min(np.sqrt(np.sum((P[:, i] - P[:, j]) ** 2, axis=2)), axis=0)
+
+    close = set(zip(i[d < 19.0], j[d < 19.0]))
+    assert close <= set(zip(result["i"], result["j"]))
+    for a, b, dist in zip(result["i"], result["j"], result["distance"]):
+        assert dist <= d[(i == a) & (j == b)][0] + 1e-6
+
+
+def test_apogee_perigee_filter():
+    geometry = conjunction.orbit_geometry(catalog(np.array([[7000.0, 0.0, 10.0, 0.0, 0.0, 0.0],
+                                                             [7100.0, 0.0, 80.0, 0.0, 0.0, 0.0],
+                                                             [7050.0, 0.01, 50.0, 0.0, 0.0, 0.0]])))
+    i, j = np.array([0, 0, 1]), np.array([1, 2, 2])
+
+    assert list(conjunction.apogee_perigee_filter(geometry, i, j, 10.0)) == [False, True, True]
+    assert list(conjunction.apogee_perigee_filter(geometry, i, j, 150.0)) == [True, True, True]
+
+
+def test_orbit_path_filter():
+    # same circular radius, different planes: the orbits cross
+    geometry = conjunction.orbit_geometry(catalog(np.array([[7000.0, 0.0, 10.0, 0.0, 0.0, 0.0],
+                                                             [7000.0, 0.0, 80.0, 0.0, 40.0, 0.0],
+                                                             [7000.0, 0.1, 80.0, 90.0, 0.0, 0.0],
+                                                             [7000.0, 0.0, 10.0, 0.0, 0.0, 90.0]])))
+    i, j = np.array([0, 0, 0]), np.array([1, 2, 3])
+
+    # the eccentric orbit is 70 km below the circle on the line of nodes, the last pair is coplanar
+    assert list(conjunction.orbit_path_filter(geometry, i, j, 10.0)) == [True, False, True]
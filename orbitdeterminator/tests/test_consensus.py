@@ -0,0 +1,95 @@
+import sys
+import os
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from util import synthetic_track
+from kep_determination import consensus
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+kep = np.array([7000.0, 0.01, 51.6, 30.0, 120.0, 45.0])
+track, truth = synthetic_track.generate_track(kep, length=3000, noise=0.05, seed=0)
+
+
+def test_shape_residual():
+    assert consensus.shape_residual(kep, truth) < 1e-9
+    # the noise along the track does not count
+    assert consensus.shape_residual(kep, track) == pytest.approx(0.05 * np.sqrt(2), rel=0.1)
+
+    # the residual does not depend on the true anomaly
+    other = kep.copy()
+    other[5] = 200.0
+    assert consensus.orbit_distance(kep, other, track) == 0.0
+    assert consensus.first_anomaly(kep, truth) == pytest.approx(45.0)
+
+
+def test_blend():
+    other = kep.copy()
+    other[3:5] = [kep[3] + 1.0, kep[4] - 1.0]
+    assert_allclose(consensus.blend([kep, other], [1.0, 1.0], truth)[0:5], [7000.0, 0.01, 51.6, 30.5, 119.5])
+
+    # angles are averaged on the circle
+    wrapped = kep.copy()
+    wrapped[3:5] = [359.0, 1.0]
+    wrapped2 = kep.copy()
+    wrapped2[3:5] = [1.0, 359.0]
+    mean = consensus.blend([wrapped, wrapped2], [1.0, 1.0], truth)
+    assert_allclose(np.minimum(mean[3:5], 360.0 - mean[3:5]), [0.0, 0.0], atol=1e-9)
+
+
+def test_determine_stops_early():
+    result = consensus.determine(track, workers=1)
+
+    # gibbs and the ellipse fit agree before lambert's solution is run
+    assert set(result["agreeing"]) == {"gibbs", "ellipse_fit"}
+    assert result["stopped"] == ["lamberts"]
+    assert result["results"]["interpolation"]["residual"] > 1.0
+    assert_allclose(result["kep"][0:5], kep[0:5], rtol=1e-4, atol=1e-2)
+    assert result["kep"][5] == pytest.approx(kep[5], abs=1e-2)
+
+
+def test_determine_pool():
+    result = consensus.determine(track, methods=("gibbs", "ellipse_fit", "interpolation"), quorum=None,
+                                 workers=3, blended=False)
+
+    assert result["stopped"] == []
+    assert set(result["results"]) == {"gibbs", "ellipse_fit", "interpolation"}
+    assert result["best"] in ("gibbs", "ellipse_fit")
+    assert_allclose(result["kep"][0:5], kep[0:5], rtol=1e-4, atol=1e-2)
+
+    with pytest.raises(ValueError):
+        consensus.determine(track, methods=("gauss",))
+
+
+_run_method = consensus._run_method
+
+
+def _raising(name, data):
+    if name == "gibbs":
+        raise RuntimeError("worker failed")
+    return _run_method(name, data)
+
+
+def _dying(name, data):
+    if name == "gibbs":
+        os._exit(1)
+    return _run_method(name, data)
+
+
+# A method whose worker raises is reported as failed instead of blocking the others
+def test_determine_worker_error(monkeypatch):
+    monkeypatch.setattr(consensus, "_run_method", _raising)
+    result = consensus.determine(track, methods=("gibbs", "ellipse_fit"), quorum=None, workers=2)
+
+    assert "RuntimeError" in result["results"]["gibbs"]["error"]
+    assert result["best"] == "ellipse_fit"
+
+
+# A method whose worker dies is stopped after the timeout
+def test_determine_timeout(monkeypatch):
+    monkeypatch.setattr(consensus, "_run_method", _dying)
+    result = consensus.determine(track, methods=("gibbs", "ellipse_fit"), quorum=None, workers=2, timeout=10)
+
+    assert result["stopped"] == ["gibbs"]
+    assert result["best"] == "ellipse_fit"
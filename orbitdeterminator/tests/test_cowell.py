@@ -0,0 +1,96 @@
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from propagation import cowell
+from util import orbit_arrays
+import numpy as np
+import pytest
+
+kep = np.array([[6785.6, 0.0003, 51.6, 290.0, 266.6, 212.4], [7078.0, 0.001, 98.2, 30.0, 177.0, 0.0],
+                [7500.0, 0.02, 30.0, 10.0, 20.0, 30.0], [7000.0, 0.001, 0.0, 0.0, 0.0, 0.0]])
+S = orbit_arrays.StateArray.from_elements(orbit_arrays.ElementArray.from_columns(0, kep)).values().copy()
+
+
+def fixed_step_period(s, h=5):
+    # two ascending node crossings with fixed RK4 steps, interpolated linearly
+    t, crossings = 0, []
+    while len(crossings) < 2:
+        new = cowell.rk4(s, t, t + h, h)
+        if s[2] < 0 <= new[2]:
+            crossings.append(t + h * s[2] / (s[2] - new[2]))
+        s, t = new, t + h
+    return crossings[1] - crossings[0]
+
+
+def test_time_period():
+    assert cowell.time_period(S[0]) == pytest.approx(fixed_step_period(S[0]), abs=0.01)
+
+
+def test_time_period_batch():
+    periods = cowell.time_period(S)
+
+    assert periods[0:3] == pytest.approx([cowell.time_period(s) for s in S[0:3]], abs=1e-6)
+    # equatorial orbits do not cross the node
+    assert np.isnan(periods[3])
+
+
+def test_nodal_period(monkeypatch):
+    assert cowell.time_period(S[0:3], analytic=True) == pytest.approx(cowell.time_period(S[0:3]), abs=1.0)
+    assert cowell.nodal_period(S[0]) == pytest.approx(cowell.nodal_period(S)[0])
+
+    # without J2 the nodal period is the keplerian one
+    monkeypatch.setattr(cowell, "J2", 0)
+    assert cowell.nodal_period(S[1]) == pytest.approx(2 * np.pi * np.sqrt(kep[1, 0] ** 3 / 398600.4405))
+
+
+def test_max_steps():
+    assert np.isnan(cowell.time_period(S[0], max_steps=10))
+
+
+def test_density():
+    h = np.linspace(100, 1300, 10001)
+    assert cowell.density(h) == pytest.approx(0.6 * np.exp(-(h - 175) * (29.4 - 0.012 * h) / 915), rel=5e-4)
+    assert cowell.density(400.0) == pytest.approx(cowell.density(np.array([400.0]))[0])
+    # the table keeps decreasing above the fit, up to geostationary orbits
+    assert np.all(np.diff(cowell.density(np.linspace(1000, 40000, 100))) < 0)
+
+
+def test_drag_table():
+    states = np.vstack((S[0:3], S[0:3] * [0.98, 0.98, 0.98, 1, 1, 1]))
+    reference = cowell.drag_batch(states)
+    batch = cowell.drag_table_batch(states)
+
+    assert batch == pytest.approx(reference, rel=5e-4, abs=1e-20)
+    assert np.array([cowell.drag_table(s) for s in states]) == pytest.approx(batch, rel=1e-12, abs=1e-25)
+    assert cowell.drag(states[3]) == pytest.approx(reference[3], rel=1e-12)
+
+
+def zonal_potential(r, degree):
+    from numpy.polynomial import legendre
+    mag_r = np.linalg.norm(r)
+    U = 0
+    for n, Jn in zip(range(2, degree + 1), (cowell.J2, cowell.J3, cowell.J4, cowell.J5, cowell.J6)):
+        U -= cowell.mu / mag_r * Jn * (cowell.Re / mag_r) ** n * legendre.legval(r[2] / mag_r, np.eye(n + 1)[n])
+    return U
+
+
+@pytest.mark.parametrize("degree", [2, 3, 6])
+def test_zonal_pert(degree):
+    for s in S[0:3]:
+        gradient = [(zonal_potential(s[0:3] + d, degree) - zonal_potential(s[0:3] - d, degree)) / 2e-3
+                    for d in np.eye(3) * 1e-3]
+        assert cowell.zonal_pert(s, degree) == pytest.approx(gradient, rel=1e-6)
+    assert cowell.zonal_pert_batch(S, degree) == pytest.approx(np.array([cowell.zonal_pert(s, degree) for s in S]),
+                                                               rel=1e-12)
+
+
+def test_zonal_degree():
+    assert cowell.zonal_pert_batch(S, 2) == pytest.approx(cowell.j2_pert_batch(S), rel=1e-12)
+    assert cowell.zonal_pert(S[0], 0) == pytest.approx(np.zeros(3))
+    with pytest.raises(ValueError):
+        cowell.zonal_pert(S[0], 7)
+
+    # the default of the force model is J2
+    assert cowell.sdot(S[0]) == pytest.approx(cowell.sdot(S[0], 2), rel=1e-15)
+    assert cowell.sdot_batch(S, 6) == pytest.approx(np.array([cowell.sdot(s, 6) for s in S]), rel=1e-12)
+    assert not np.allclose(cowell.sdot(S[0], 6)[3:6] - cowell.sdot(S[0], 2)[3:6], 0, rtol=0, atol=1e-12)
@@ -0,0 +1,56 @@
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from orbitdeterminator.propagation.dgsn_simulator import (DGSNSimulator, SimParams)
+from orbitdeterminator.propagation.cowell import propagate_state
+import numpy as np
+import pytest
+from numpy.testing import (assert_array_equal, assert_allclose)
+
+epoch = 1531152114
+iss_kep = np.array([6785.6420, 0.0003456, 51.6418, 290.0933, 266.6543, 212.4306])
+
+
+def make_simulator(r_jit=0, dgsn_period=None, dgsn_thresh=0.5):
+    params = SimParams()
+    params.kep = iss_kep
+    params.epoch = epoch
+    params.t0 = epoch + 100
+    params.period = 5
+    params.r_jit = r_jit
+    params.dgsn_period = dgsn_period
+    params.dgsn_thresh = dgsn_thresh
+    return DGSNSimulator(params)
+
+
+# Without noise the observations are the propagated positions at irregular times
+def test_fast_forward_no_noise():
+    sim = make_simulator()
+    s0, t0 = sim.s.copy(), sim.t0
+    obs = sim.fast_forward(600, seed=1)
+
+    intervals = np.diff(np.concatenate(([t0], obs[:, 0])))
+    assert np.all((intervals >= 1) & (intervals <= 5))
+    assert obs[-1, 0] <= t0 + 600
+    assert_allclose(obs[-1, 1:4], propagate_state(s0, t0, obs[-1, 0])[0:3], atol=1e-3)
+    assert sim.t == obs[-1, 0]
+
+
+def test_fast_forward_seeded():
+    obs1 = make_simulator(r_jit=15).fast_forward(300, seed=7)
+    obs2 = make_simulator(r_jit=15).fast_forward(300, seed=7)
+    assert_array_equal(obs1, obs2)
+
+
+# Every written observation has to be inside a visibility window of the gap model
+def test_fast_forward_gaps(tmpdir):
+    sim = make_simulator(r_jit=1, dgsn_period=100, dgsn_thresh=0.7)
+    file_name = str(tmpdir.join("dgsn.csv"))
+    obs = sim.fast_forward(1000, file_name=file_name, seed=0)
+
+    assert np.all(np.abs(np.cos(np.pi / 100 * obs[:, 0])) >= 0.7)
+    assert np.max(np.diff(obs[:, 0])) > 5
+
+    saved = np.loadtxt(file_name)
+    assert saved.shape == obs.shape
+    assert_allclose(saved, obs)
@@ -0,0 +1,57 @@
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from propagation import cowell
+from kep_determination import differential_correction
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+s = np.array([2.87393871e+03, 5.22992358e+03, 3.23958865e+03, -3.49496655e+00, 4.87211332e+00, -4.76792145e+00])
+t = np.arange(0, 3000, 20.0)
+truth = cowell.propagate_states(s, 0, t)
+noise = np.random.RandomState(0).normal(0, 0.05, (len(t), 3))
+data = np.column_stack((t, truth[:, 0:3] + noise))
+
+
+def test_propagate_stm():
+    sf, phi = differential_correction.propagate_stm(s, np.eye(6), 0, 600)
+    assert_allclose(sf, cowell.rk4(s, 0, 600), rtol=1e-12)
+
+    # compare with central differences of the propagation
+    numeric = np.empty((6, 6))
+    for j, d in enumerate([1e-3] * 3 + [1e-6] * 3):
+        a = np.zeros(6)
+        a[j] = d
+        numeric[:, j] = (cowell.rk4(s + a, 0, 600) - cowell.rk4(s - a, 0, 600)) / (2 * d)
+    assert_allclose(phi, numeric, rtol=1e-5, atol=1e-6)
+
+
+def test_differential_correction():
+    s0 = s + np.array([2.0, -3.0, 1.0, 2e-3, -1e-3, 1e-3])
+    solution = differential_correction.differential_correction(data, s0, sigma=0.05)
+
+    assert solution["converged"]
+    assert solution["iterations"] <= 6
+    assert solution["rms"] == pytest.approx(0.05, rel=0.1)
+
+    # the error of the fitted state is consistent with its covariance
+    sd = np.sqrt(np.diag(solution["covariance"]))
+    assert np.all(np.abs(solution["state"] - s) < 4 * sd)
+
+
+def test_initial_state():
+    s0 = differential_correction.initial_state(data)
+    assert np.linalg.norm(s0[0:3] - s[0:3]) < 0.5
+    assert np.linalg.norm(s0[3:6] - s[3:6]) < 0.05
+
+    solution = differential_correction.differential_correction(data, s0, sigma=0.05)
+    assert solution["converged"]
+    assert np.linalg.norm(solution["state"][0:3] - s[0:3]) < 0.1
+
+
+def test_time_order():
+    with pytest.raises(ValueError):
+        differential_correction.differential_correction(data[::-1], s)
+    with pytest.raises(ValueError):
+        differential_correction.differential_correction(data, s, t0=100.0)
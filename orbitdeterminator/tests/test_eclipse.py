@@ -0,0 +1,74 @@
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from propagation import (cowell, eclipse)
+from util import orbit_arrays
+import calendar
+import numpy as np
+import pytest
+
+kep = np.array([[6785.6, 0.0003, 51.6, 290.0, 266.6, 212.4], [7078.0, 0.001, 98.2, 30.0, 177.0, 0.0]])
+S = orbit_arrays.StateArray.from_elements(orbit_arrays.ElementArray.from_columns(0, kep)).values().copy()
+t0 = calendar.timegm((2017, 9, 20, 0, 0, 0))
+
+
+def ephemeris(step, length=3 * 3600):
+    t = t0 + np.arange(0, length + step / 2, step)
+    return t, np.array([cowell.propagate_states(s, t0, t) for s in S])
+
+
+def test_sun_position():
+    # example 5-1 of Vallado, Fundamentals of Astrodynamics and Applications
+    r = eclipse.sun_position(calendar.timegm((2006, 4, 2, 0, 0, 0)))
+    assert r == pytest.approx([146186178, 28789122, 12481127], rel=1e-6)
+
+
+def test_shadow_models():
+    r_sun = np.array([eclipse.AU, 0, 0])
+    # the umbra narrows and the penumbra widens behind the Earth
+    r = np.array([[-7000.0, y, 0] for y in (0, 6330, 6360, 6400, 6430)] + [[7000.0, 0, 0]])
+
+    assert list(eclipse.cylindrical(r, r_sun) < 0) == [True, True, True, False, False, False]
+    umbra, penumbra = eclipse.conical(r, r_sun)
+    assert list(umbra < 0) == [True, True, False, False, False, False]
+    assert list(penumbra < 0) == [True, True, True, True, False, False]
+
+
+@pytest.mark.parametrize("model", ["conical", "cylindrical"])
+def test_intervals(model):
+    t, S_coarse = ephemeris(60.0)
+    result = eclipse.intervals(t, S_coarse, model)
+
+    # brute force check of the shadow condition every second
+    t_fine, S_fine = ephemeris(1.0)
+    condition = eclipse.shadow(S_fine[..., 0:3], t_fine, model)
+
+    for o in range(len(S)):
+        for kind in ((eclipse.PENUMBRA, eclipse.UMBRA) if model == "conical" else (eclipse.UMBRA,)):
+            inside = (condition[o] >= kind).astype(int)
+            entries = t_fine[1:][np.diff(inside) == 1]
+            exits = t_fine[1:][np.diff(inside) == -1]
+
+            sel = (result["object"] == o) & (result["kind"] == kind)
+            assert len(entries) > 0
+            entry, exit = result["entry"][sel], result["exit"][sel]
+            if inside[0]:
+                assert np.isnan(entry[0])
+                entry = entry[1:]
+            if inside[-1]:
+                assert np.isnan(exit[-1])
+                exit = exit[:-1]
+            assert entry == pytest.approx(entries, abs=1.0)
+            assert exit == pytest.approx(exits, abs=1.0)
+
+
+def test_single_object():
+    t, S_coarse = ephemeris(60.0)
+    one = eclipse.intervals(t, S_coarse[1])
+    both = eclipse.intervals(t, S_coarse)
+    sel = both["object"] == 1
+
+    assert np.all(one["object"] == 0)
+    assert one["entry"] == pytest.approx(both["entry"][sel], nan_ok=True)
+    with pytest.raises(ValueError):
+        eclipse.intervals(t, S_coarse, "spherical")
@@ -0,0 +1,58 @@
+import sys
+import os.path
+import subprocess
+import pytest
+
+_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+
+# Modules that must only be loaded when the code path that needs them runs
+_HEAVY = ("matplotlib", "mpl_toolkits", "pykep", "scipy.signal", "scipy.interpolate", "scipy.optimize")
+
+# Generous upper bound for the cumulative import time of a pipeline entry point (microseconds).
+# numpy alone takes a fraction of this, the heavy modules above push it well past the budget.
+_BUDGET_US = 1500000
+
+
+def import_profile(module):
+    '''
+    Imports a module in a fresh interpreter with -X importtime and parses the report
+
+    Args:
+        module (string): name of the module to import
+
+    Returns:
+        dict: cumulative import time in microseconds for every module loaded
+    '''
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c", "import %s" % module],
+                         cwd=_ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                         universal_newlines=True)
+    assert res.returncode == 0, res.stderr
+
+    profile = {}
+    for line in res.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        profile[name.strip()] = int(cumulative)
+
+    return profile
+
+
+@pytest.mark.parametrize("module", [
+    "main",
+    "automated",
+    "filters.sav_golay",
+    "filters.triple_moving_average",
+    "kep_determination.lamberts_kalman",
+    "kep_determination.interpolation",
+    "kep_determination.ellipse_fit",
+])
+def test_no_heavy_imports(module):
+    loaded = import_profile(module)
+    heavy = [name for name in loaded if name.startswith(_HEAVY)]
+    assert heavy == []
+
+
+@pytest.mark.parametrize("module", ["main", "automated"])
+def test_import_budget(module):
+    assert import_profile(module)[module] < _BUDGET_US
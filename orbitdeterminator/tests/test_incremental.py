@@ -0,0 +1,58 @@
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from util import synthetic_track
+from kep_determination import (incremental, interpolation, lamberts_kalman)
+import numpy as np
+import pytest
+from numpy.testing import (assert_array_equal, assert_allclose)
+
+kep = np.array([7000.0, 0.01, 51.6, 30.0, 120.0, 45.0])
+track, _ = synthetic_track.generate_track(kep, length=400, noise=0.01, seed=0)
+R = 0.01 ** 2
+
+
+def test_single_block():
+    od = incremental.IncrementalOD(methods=("interpolation",))
+    estimate = od.append(track)["interpolation"]
+
+    batch = lamberts_kalman.kalman(interpolation.interpolate_range(track, 0, len(track) - 1), R)
+    assert_array_equal(estimate, batch)
+    assert od.counts() == {"interpolation": len(track) - 1}
+
+
+def test_blocks():
+    od = incremental.IncrementalOD(methods=("interpolation",))
+    assert od.elements("interpolation") is None
+
+    for block in np.array_split(track, [1, 50, 51, 200, 200]):
+        od.append(block)
+
+    # every pair of points is used once, also across the blocks
+    assert od.counts() == {"interpolation": len(track) - 1}
+    assert od.n_points == len(track)
+
+    batch = lamberts_kalman.kalman(interpolation.interpolate_range(track, 0, len(track) - 1), R)
+    assert_allclose(od.elements("interpolation"), batch, rtol=1e-8)
+
+
+def test_time_order():
+    od = incremental.IncrementalOD(methods=("interpolation",))
+    od.append(track[0:100])
+
+    with pytest.raises(ValueError):
+        od.append(track[50:150])
+    with pytest.raises(ValueError):
+        incremental.IncrementalOD(methods=("gibbs",))
+
+
+def test_lamberts():
+    pytest.importorskip("pykep")
+    data = track[0:60]
+
+    od = incremental.IncrementalOD(methods=("lamberts",))
+    od.append(data[0:30])
+    od.append(data[30:60])
+
+    batch = lamberts_kalman.kalman(lamberts_kalman.create_kep(data), R)
+    assert_allclose(od.elements(), batch, rtol=1e-6)
@@ -4,15 +4,37 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.
 from orbitdeterminator.util import input_transf
 import numpy as np
 import pytest
-from numpy.testing import assert_array_equal
+from numpy.testing import (assert_array_equal, assert_allclose)
 
 
 # This test takes one array with cartesian coordinates transform it into spherical coordinates
 # with cart_to_spher function and then apply to that computed array the vice versa process to
-# see if the final results if the initial array
+# see if the final results if the initial array. The input must not be modified.
 
 def test_imput_transf():
     expected = np.array([[0, 1000, 1000, 2000]])
     given = input_transf.cart_to_spher(expected)
 
-    assert_array_equal(input_transf.spher_to_cart(given), expected)
+    assert_array_equal(expected, [[0, 1000, 1000, 2000]])
+    assert_allclose(input_transf.spher_to_cart(given), expected, rtol=1e-12)
+
+
+def test_known_values():
+    cart = np.array([[1.0, 0.0, 2.0, 0.0], [2.0, 1.0, 1.0, np.sqrt(2)]])
+    spher = input_transf.cart_to_spher(cart)
+
+    assert_allclose(spher, [[1.0, np.pi / 2, 0.0, 2.0], [2.0, np.pi / 4, np.pi / 4, 2.0]], atol=1e-15)
+
+
+def test_out():
+    data = np.random.RandomState(0).uniform(-7000, 7000, (1000, 4))
+    out = np.empty_like(data)
+
+    assert input_transf.cart_to_spher(data, out=out) is out
+    assert_allclose(input_transf.spher_to_cart(out.copy(), out=out), data, rtol=1e-9, atol=1e-9)
+
+    # in place conversion
+    copy = data.copy()
+    input_transf.cart_to_spher(copy, out=copy)
+    input_transf.spher_to_cart(copy, out=copy)
+    assert_allclose(copy, data, rtol=1e-9, atol=1e-9)
@@ -0,0 +1,61 @@
+import sys
+import os.path
+import json
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from util import instrument
+from propagation import cowell
+import numpy as np
+import pytest
+
+s = np.array([2.87393871e+03, 5.22992358e+03, 3.23958865e+03, -3.49496655e+00, 4.87211332e+00, -4.76792145e+00])
+
+
+@pytest.fixture()
+def metrics():
+    instrument.reset()
+    instrument.enable()
+    yield
+    instrument.disable()
+    instrument.reset()
+
+
+# Checks that nothing is recorded while instrumentation is disabled
+def test_disabled():
+    instrument.reset()
+    with instrument.timer("filtering"):
+        cowell.sdot(s)
+    assert instrument.metrics() == {"timers": {}, "counters": {}}
+
+
+def test_timers_and_counters(metrics):
+    with instrument.timer("propagation"):
+        cowell.rk4(s, 0, 60, 30)
+    with instrument.timer("propagation"):
+        pass
+
+    snapshot = instrument.metrics()
+    assert snapshot["timers"]["propagation"]["calls"] == 2
+    assert snapshot["timers"]["propagation"]["total_seconds"] >= snapshot["timers"]["propagation"]["max_seconds"]
+    # two RK4 steps with four force model evaluations each
+    assert snapshot["counters"]["force_model_calls"] == 8
+
+
+def test_timed_decorator(metrics):
+    @instrument.timed("stage")
+    def stage(x):
+        return 2 * x
+
+    assert stage(2) == 4
+    assert instrument.metrics()["timers"]["stage"]["calls"] == 1
+
+
+def test_exports(metrics):
+    with instrument.timer("kalman"):
+        pass
+    instrument.count("lambert_solves", 3)
+
+    assert json.loads(instrument.to_json())["counters"] == {"lambert_solves": 3}
+
+    text = instrument.to_prometheus()
+    assert 'orbitdeterminator_stage_calls_total{stage="kalman"} 1' in text
+    assert "orbitdeterminator_lambert_solves_total 3" in text
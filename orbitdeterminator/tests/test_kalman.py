@@ -4,7 +4,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.
 from orbitdeterminator.kep_determination import lamberts_kalman
 import numpy as np
 import pytest
-from numpy.testing import assert_array_equal
+from numpy.testing import (assert_array_equal, assert_allclose)
 
 # The first test checks the fact that if we give to the kalman filter three identical sets of keplerian elements
 # the final approximation will be equal to this set
@@ -32,3 +32,44 @@ def test_kalman_fail():
 
     with pytest.raises(AssertionError):
         assert_array_equal(given, expected)
+
+
+rng = np.random.RandomState(0)
+kep = np.array([7000.0, 0.01, 51.6, 30.0, 120.0, 45.0]) + rng.normal(0, 0.1, (200, 6))
+
+
+def reference_kalman(kep, R, Q=1e-8):
+    # the original filter, one scalar kalman filter per element channel
+    x_final = np.zeros((1, 6))
+    for i in range(0, 6):
+        xhat, P = np.mean(kep[:, i]), 1.0
+        for k in range(1, len(kep)):
+            Pminus = P + Q
+            K = Pminus / (Pminus + R)
+            xhat = xhat + K * (kep[k, i] - xhat)
+            P = (1 - K) * Pminus
+        x_final[0, i] = xhat
+    return x_final
+
+
+# A stack of element histories, e.g. one per satellite, is filtered in one call and gives the results of filtering
+# every history on its own
+def test_stack():
+    # random walks with a different scale on every channel, so every filter sees a drifting history
+    history = np.cumsum(rng.normal(0, 1, (3, 150, 6)) * [10.0, 1e-3, 0.5, 2.0, 1.0, 5.0], axis=1)
+    stack = np.array([7000.0, 0.01, 51.6, 30.0, 120.0, 45.0]) + history
+    final = lamberts_kalman.kalman(stack, 0.5)
+
+    assert final.shape == (3, 1, 6)
+    for i in range(3):
+        expected = reference_kalman(stack[i], 0.5)
+        assert_allclose(final[i], expected, rtol=1e-12)
+        assert_allclose(lamberts_kalman.kalman(stack[i], 0.5), expected, rtol=1e-12)
+
+
+# Filtering in two parts gives the result of filtering everything at once
+def test_continue():
+    xhat, P = lamberts_kalman.kalman_update(kep[1:100], np.mean(kep, axis=0), 1.0, 0.01 ** 2)
+    xhat, P = lamberts_kalman.kalman_update(kep[100:], xhat, P, 0.01 ** 2)
+
+    assert_allclose(xhat, lamberts_kalman.kalman(kep, 0.01 ** 2)[0], rtol=1e-15)
@@ -0,0 +1,37 @@
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from util import (kepler, anom_conv, tle_kep_state)
+from util.new_tle_kep_state import MtoT
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+
+@pytest.mark.parametrize("e", [0.0, 0.0003456, 0.1, 0.5, 0.9, 0.99, 0.9999])
+def test_kepler_equation(e):
+    M = np.linspace(-20, 20, 20001)
+    E = kepler.mean_to_ecc(M, e)
+
+    assert_allclose(kepler.ecc_to_mean(E, e), M, rtol=0, atol=1e-13)
+
+
+# The conversions are inverse to each other and keep the revolutions
+def test_round_trip():
+    nu = np.linspace(0, 4 * np.pi, 101)
+    e = np.linspace(0, 0.95, 101)
+
+    assert_allclose(kepler.ecc_to_true(kepler.true_to_ecc(nu, e), e), nu, atol=1e-12)
+    assert_allclose(kepler.mean_to_true(kepler.true_to_mean(nu, e), e), nu, atol=1e-12)
+    assert np.all(np.diff(kepler.true_to_mean(nu, 0.7)) > 0)
+
+
+def test_helpers():
+    e = 0.7151443
+    E = anom_conv.true_to_ecc(np.array([0.5, 2.0]), e)
+    assert_allclose(np.cos(E), (e + np.cos([0.5, 2.0])) / (1 + e * np.cos([0.5, 2.0])))
+
+    nu = MtoT(1.0, e)
+    assert kepler.true_to_mean(nu, e) == pytest.approx(1.0, abs=1e-13)
+    assert tle_kep_state.Mtov(np.degrees(1.0), e) == pytest.approx(np.degrees(nu), abs=1e-10)
+    assert tle_kep_state.Mtov(300.0, e) > 180
@@ -0,0 +1,67 @@
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from orbitdeterminator.propagation.multi_simulator import (MultiSimulator, MultiSimParams)
+from orbitdeterminator.propagation.simulator import OpWriter
+from orbitdeterminator.propagation import cowell
+from orbitdeterminator.util.new_tle_kep_state import kep_to_state
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+epoch = 1531152114
+iss_kep = np.array([6785.6420, 0.0003456, 51.6418, 290.0933, 266.6543, 212.4306])
+
+
+class collect(OpWriter):
+    def __init__(self):
+        self.rows = []
+
+    def write(self, t, s):
+        self.rows.append([t, *s])
+
+
+def make_simulator(n, period):
+    keps = np.tile(iss_kep, (n, 1))
+    keps[:, 5] = np.linspace(0, 360, n, endpoint=False)
+
+    params = MultiSimParams()
+    params.keps = keps
+    params.epoch = epoch
+    params.t0 = epoch + 100
+    params.period = period
+    params.op_writers = [collect() for i in range(n)]
+    return MultiSimulator(params), keps
+
+
+def test_rk4_batch():
+    s = np.ravel(kep_to_state(iss_kep))
+    S = np.vstack((s, s, 1.01 * s))
+    tf = np.array([100.0, -500.0, 3000.0])
+
+    final = cowell.rk4_batch(S, 0, tf)
+    for i in range(3):
+        assert_allclose(final[i], cowell.rk4(S[i], 0, tf[i]), rtol=1e-12, atol=1e-9)
+
+
+def test_run_until():
+    sim, keps = make_simulator(4, np.array([10, 10, 20, 30]))
+    sim.open()
+    sim.run_until(epoch + 160)
+    sim.close()
+
+    for i, writer in enumerate(sim.op_writers):
+        rows = np.array(writer.rows)
+        assert_allclose(rows[:, 0], np.arange(epoch + 100, epoch + 161, sim.period[i]))
+
+        s = cowell.rk4(np.ravel(kep_to_state(keps[i])), epoch, epoch + 100)
+        expected = cowell.propagate_states(s, epoch + 100, rows[:, 0])
+        assert_allclose(rows[:, 1:7], expected, rtol=1e-9, atol=1e-6)
+
+
+# All the satellites due at the same time are propagated in one call
+def test_batched_steps():
+    sim, _ = make_simulator(50, 10)
+    assert sim.step(epoch + 100) == 50
+    assert sim.step(epoch + 105) == 0
+    assert sim.step(epoch + 110) == 50
@@ -0,0 +1,83 @@
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from util import (orbit_arrays, state_kep, kep_state, synthetic_track)
+from util.orbit_arrays import (StateArray, ElementArray)
+from kep_determination.gibbsMethod import Gibbs
+from kep_determination import lamberts_kalman
+from filters import sav_golay
+import numpy as np
+import pytest
+from numpy.testing import (assert_array_equal, assert_allclose)
+
+kep = np.array([[7000.0, 0.01, 51.6, 30.0, 120.0, 45.0],
+                [15711.578566, 0.377617, 90.0, 0.887383, 10.0, 28.357744]])
+
+
+def test_views():
+    states = StateArray.from_columns([1.0, 2.0, 3.0], np.arange(18).reshape(3, 6))
+
+    assert states.data.shape == (3, 7) and states.data.flags["C_CONTIGUOUS"]
+    assert_array_equal(states.t, [1.0, 2.0, 3.0])
+    assert_array_equal(states.vz, [5.0, 11.0, 17.0])
+    assert np.asarray(states) is states.data
+
+    # slices share the buffer
+    head = states[0:2]
+    head.x = -1.0
+    assert isinstance(head, StateArray) and len(head) == 2
+    assert_array_equal(states.x, [-1.0, -1.0, 12.0])
+    assert np.shares_memory(states.track(), states.data)
+
+    with pytest.raises(ValueError):
+        StateArray(np.zeros((3, 6)))
+
+
+def test_slice_views():
+    states = StateArray.from_columns(np.arange(6.0), np.arange(36.0).reshape(6, 6))
+
+    # basic slices, stepped or not, write through to the buffer
+    for key in (slice(1, 4), slice(0, 6, 2), slice(None, None, -1), 3):
+        view = states[key]
+        assert np.shares_memory(view.data, states.data)
+        view.y = -1.0
+        assert_array_equal(states.y[key], -1.0)
+
+    even = states[::2]
+    assert not even.data.flags["C_CONTIGUOUS"]
+    assert StateArray(even.data, contiguous=True).data.flags["C_CONTIGUOUS"]
+
+    # index arrays and masks copy
+    assert not np.shares_memory(states[[0, 2]].data, states.data)
+    assert not np.shares_memory(states[states.t > 2].data, states.data)
+
+
+def test_conversions():
+    elements = ElementArray.from_columns([0.0, 10.0], kep)
+    states = StateArray.from_elements(elements)
+
+    for i in range(len(kep)):
+        expected = np.ravel(kep_state.kep_state(np.reshape(kep[i], (6, 1))))
+        assert_allclose(states.data[i, 1:], expected, rtol=1e-12)
+        assert_allclose(ElementArray.from_states(states).data[i, 1:], state_kep.state_kep(states.r[i], states.v[i]),
+                        rtol=1e-9)
+
+    assert_allclose(ElementArray.from_states(states).elements(), kep, rtol=1e-9)
+
+
+def test_from_gibbs():
+    s = np.ravel(kep_state.kep_state(np.reshape(kep[0], (6, 1))))
+    elements = ElementArray.from_gibbs(Gibbs.orbital_elements(list(s[0:3]), list(s[3:6])))
+
+    assert_allclose(elements.elements()[0], kep[0], rtol=1e-6)
+
+
+# The pipeline functions take the containers without any conversion
+def test_pipeline():
+    track, _ = synthetic_track.generate_track(kep[0], length=51)
+    states = StateArray.from_track(track)
+
+    assert_array_equal(sav_golay.golay(states, 21, 3), sav_golay.golay(track, 21, 3))
+
+    elements = ElementArray.from_columns(np.arange(2), kep)
+    assert_array_equal(lamberts_kalman.kalman(elements, 0.01 ** 2), lamberts_kalman.kalman(kep.copy(), 0.01 ** 2))
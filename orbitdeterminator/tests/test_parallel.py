@@ -0,0 +1,30 @@
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from util import synthetic_track
+from kep_determination import (parallel, interpolation, lamberts_kalman)
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+kep = np.array([7000.0, 0.01, 51.6, 30.0, 120.0, 45.0])
+track, _ = synthetic_track.generate_track(kep, length=500, noise=0.01, seed=0)
+
+
+def test_chunks():
+    assert parallel.chunks(1, 100, 4) == [(1, 25), (25, 50), (50, 75), (75, 100)]
+    assert parallel.chunks(0, 3, 8) == [(0, 1), (1, 2), (2, 3)]
+
+
+# The parallel output has to be bit for bit the serial one
+def test_interpolate():
+    assert_array_equal(parallel.interpolate(track, workers=2), interpolation.main(track))
+    assert_array_equal(parallel.interpolate(track, workers=2, n_chunks=7, start=0, stop=len(track) - 1),
+                       interpolation.interpolate_range(track, 0, len(track) - 1))
+
+
+def test_create_kep():
+    pytest.importorskip("pykep")
+    data = track[0:60]
+
+    assert_array_equal(parallel.create_kep(data, workers=2, n_chunks=5), lamberts_kalman.create_kep(data))
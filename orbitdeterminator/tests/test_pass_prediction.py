@@ -0,0 +1,102 @@
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from propagation import (cowell, pass_prediction)
+from util import (orbit_arrays, teme_to_ecef)
+import numpy as np
+import pytest
+
+kep = np.array([[6785.6, 0.0003, 51.6, 290.0, 266.6, 212.4]])
+S = orbit_arrays.StateArray.from_elements(orbit_arrays.ElementArray.from_columns(0, kep)).values().copy()
+stations = np.array([[-33.9, 18.4, 0.0], [35.4, 139.6, 0.0]])
+t0 = 1502634717.0
+tf = t0 + 6 * 3600
+
+
+def brute_force(S, t0, tf, stations, min_elevation, step=2.0):
+    grid = np.arange(t0, tf + step / 2, step)
+    states = [S]
+    for a, b in zip(grid[:-1], grid[1:]):
+        states.append(cowell.rk4_batch(states[-1], a, b))
+    states = np.array(states)
+    pos, up = pass_prediction.station_ecef(stations)
+    sin_el, _ = pass_prediction.elevation(states[:, :, None, 0:3], states[:, :, None, 3:6], grid[:, None, None],
+                                          pos[None], up[None])
+    return grid, np.degrees(np.arcsin(sin_el))
+
+
+def test_station_ecef():
+    pos, up = pass_prediction.station_ecef([[0, 0, 0], [90, 0, 1.0], [45, 90, 0]])
+
+    assert pos[0] == pytest.approx([6378.137, 0, 0])
+    assert pos[1] == pytest.approx([0, 0, 6356.752314 + 1.0])
+    assert np.linalg.norm(up, axis=1) == pytest.approx(np.ones(3))
+    assert pos[2, 0] == pytest.approx(0, abs=1e-9)
+
+
+def test_gmst():
+    t = t0 + np.arange(0, 86400, 3600.0)
+    # the sidereal day is shorter than the solar day
+    assert np.diff(np.unwrap(np.radians(teme_to_ecef.gmst(t)))) == pytest.approx(
+        np.full(23, pass_prediction.w * 3600))
+    assert teme_to_ecef.gmst(t, t[0]) == pytest.approx(teme_to_ecef.gmst(t), abs=1e-6)
+
+
+def test_predict():
+    passes = pass_prediction.predict(S, t0, tf, stations, min_elevation=10.0)
+    grid, elevation = brute_force(S, t0, tf, stations, 10.0)
+
+    for m in range(len(stations)):
+        visible = (elevation[:, 0, m] >= 10.0).astype(int)
+        rises = grid[1:][np.diff(visible) == 1]
+        sets = grid[1:][np.diff(visible) == -1]
+
+        sel = passes["station"] == m
+        assert len(rises) > 0
+        assert np.all(passes["satellite"][sel] == 0)
+        assert passes["rise"][sel] == pytest.approx(rises, abs=2.0)
+        assert passes["set"][sel] == pytest.approx(sets, abs=2.0)
+        for rise, culmination, top in zip(passes["rise"][sel], passes["culmination"][sel],
+                                          passes["max_elevation"][sel]):
+            inside = (grid >= rise) & (grid <= culmination + 60)
+            assert rise < culmination
+            assert top == pytest.approx(np.max(elevation[inside, 0, m]), abs=0.05)
+
+
+def test_window_cuts_pass():
+    passes = pass_prediction.predict(S, t0, tf, stations, min_elevation=10.0)
+    first = passes["rise"][passes["station"] == 0][0]
+
+    # starting in the middle of the first pass
+    S_mid = cowell.rk4_batch(S, t0, first + 60)
+    cut = pass_prediction.predict(S_mid, first + 60, first + 3600, stations[0:1], min_elevation=10.0)
+
+    assert np.isnan(cut["rise"][0])
+    assert cut["set"][0] == pytest.approx(passes["set"][passes["station"] == 0][0], abs=1e-3)
+
+
+# The prefilter never drops a pair that is visible at any time of the step
+def test_candidates():
+    rng = np.random.RandomState(0)
+    n = 400
+    kep = np.column_stack((rng.uniform(6700, 30000, n), rng.uniform(0, 0.3, n), rng.uniform(0, 180, n),
+                           rng.uniform(0, 360, (n, 3))))
+    kep[:, 0] = np.maximum(kep[:, 0], 6700 / (1 - kep[:, 1]))
+    S = orbit_arrays.StateArray.from_elements(orbit_arrays.ElementArray.from_columns(0, kep)).values().copy()
+    pos, up = pass_prediction.station_ecef(np.column_stack((rng.uniform(-89, 89, 20), rng.uniform(-180, 180, 20),
+                                                            rng.uniform(0, 4, 20))))
+    sin_min, step = np.sin(np.radians(5.0)), 60.0
+
+    grid = t0 + np.arange(0, step + 1, 5.0)
+    visible = np.zeros((n, len(pos)), dtype=bool)
+    states = S
+    for k, t in enumerate(grid):
+        if k > 0:
+            states = cowell.rk4_batch(states, grid[k - 1], t)
+        visible |= pass_prediction.sin_elevation(states[:, None, 0:3], t, pos[None], up[None]) >= sin_min
+
+    assert np.any(visible)
+    for S_end, t in ((S, grid[0]), (states, grid[-1])):
+        keep = pass_prediction.candidates(S_end, t, pos, sin_min, step)
+        assert np.all(keep[visible])
+        assert np.count_nonzero(keep) < 0.5 * keep.size
@@ -2,6 +2,7 @@ import sys
 import os.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
 from filters import sav_golay
+from util import synthetic_track
 import numpy as np
 from numpy.testing import assert_array_equal
 import pytest
@@ -44,3 +45,23 @@ def test_golay_parmerrors(my_data):
 def test_golay_parmerrors(my_data):
 	with pytest.raises(Exception):
 		result = sav_golay.golay(my_data, 3, 3)
+
+
+# On equally spaced points the irregular mode gives the result of scipy's filter
+def test_golay_irregular_uniform():
+	kep = np.array([6785.6420, 0.0003456, 51.6418, 290.0933, 266.6543, 212.4306])
+	track, _ = synthetic_track.generate_track(kep, length=500, noise=1.0, seed=0)
+
+	np.testing.assert_allclose(sav_golay.golay(track, 31, 3, irregular=True), sav_golay.golay(track, 31, 3),
+							   rtol=0, atol=1e-8)
+
+
+def test_golay_irregular():
+	kep = np.array([6785.6420, 0.0003456, 51.6418, 290.0933, 266.6543, 212.4306])
+	track, truth = synthetic_track.generate_track(kep, length=2000, cadence=3, cadence_jitter=0.9, noise=1.0, seed=0)
+
+	irregular = sav_golay.golay(track, 31, 3, irregular=True)
+	uniform = sav_golay.golay(track, 31, 3)
+	assert_array_equal(irregular[:, 0], track[:, 0])
+	assert np.std(irregular[:, 1:4] - truth[:, 1:4]) < 0.5
+	assert np.std(uniform[:, 1:4] - truth[:, 1:4]) > 2.0
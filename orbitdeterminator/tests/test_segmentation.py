@@ -0,0 +1,60 @@
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from util import (synthetic_track, golay_window, instrument)
+from filters import (segmentation, sav_golay, triple_moving_average)
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+kep = np.array([6785.6420, 0.0003456, 51.6418, 290.0933, 266.6543, 212.4306])
+track, truth = synthetic_track.generate_track(kep, length=8000, noise=20.0, gap_period=1500, gap_fraction=0.6,
+                                              seed=0)
+
+
+def test_split_gaps():
+    segments = segmentation.split_gaps(track)
+
+    assert [len(s) for s in segments] == [600, 600, 600, 600, 600, 500]
+    assert_array_equal(np.concatenate(segments), track)
+    assert len(segmentation.split_gaps(track, max_gap=1000)) == 1
+
+
+# Smoothing across the gaps corrupts the points near them
+def test_filter_track():
+    filtered = segmentation.filter_track(track, 20.0)
+    assert_array_equal(filtered[:, 0], track[:, 0])
+
+    rms = np.sqrt(np.mean((filtered[:, 1:4] - truth[:, 1:4]) ** 2))
+    assert rms < 10.0
+
+    data = triple_moving_average.generate_filtered_data(track, 3)
+    across = sav_golay.golay(data, golay_window.window(20.0, data), 3)
+    assert np.sqrt(np.mean((across[:, 1:4] - truth[:, 1:4]) ** 2)) > 10 * rms
+
+    assert_array_equal(segmentation.filter_track(track, 20.0, workers=2, min_parallel=2), filtered)
+
+
+# Without gaps the result is the one of the filters on the whole data set
+def test_no_gaps():
+    data = track[0:600]
+    filtered = triple_moving_average.generate_filtered_data(data, 3)
+    filtered = sav_golay.golay(filtered, golay_window.window(20.0, filtered), 3)
+
+    assert_array_equal(segmentation.filter_track(data, 20.0), filtered)
+
+
+# The window choice of every segment is a sub-timer of the filtering, like in main.process
+def test_window_selection_timer():
+    instrument.reset()
+    instrument.enable()
+    try:
+        with instrument.timer("filtering"):
+            segmentation.filter_track(track, 20.0)
+        timers = instrument.metrics()["timers"]
+    finally:
+        instrument.disable()
+        instrument.reset()
+
+    assert timers["filtering.window_selection"]["calls"] == 6
+    assert timers["filtering.window_selection"]["total_seconds"] <= timers["filtering"]["total_seconds"]
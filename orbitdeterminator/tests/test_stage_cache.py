@@ -0,0 +1,71 @@
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from util.stage_cache import (StageCache, run_stage)
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+
+@pytest.fixture()
+def cache(tmpdir):
+    return StageCache(str(tmpdir))
+
+
+# Checks that a stage is computed once and then served from the cache
+def test_stage_cached(cache):
+    calls = []
+    data = np.arange(12, dtype=float).reshape((3, 4))
+
+    def stage():
+        calls.append(1)
+        return data * 2
+
+    first, key1 = cache.run("double", data, {"factor": 2}, stage)
+    second, key2 = cache.run("double", data, {"factor": 2}, stage)
+
+    assert len(calls) == 1
+    assert key1 == key2
+    assert_array_equal(first, second)
+
+
+# Checks that changing the parameters of a late stage only reruns that stage
+def test_late_stage_rerun(cache):
+    calls = {"early": 0, "late": 0}
+    data = np.ones((5, 4))
+
+    def early():
+        calls["early"] += 1
+        return data + 1
+
+    def late():
+        calls["late"] += 1
+        return data + 2
+
+    for R in (1.0, 1.0, 2.0):
+        _, key = cache.run("early", data, {"window": 3}, early)
+        cache.run("late", key, {"R": R}, late)
+
+    assert calls == {"early": 1, "late": 2}
+
+
+# Checks that the least recently used entries are evicted first
+def test_eviction(tmpdir):
+    one = np.zeros(1000)
+    cache = StageCache(str(tmpdir), max_size=3 * 8500)
+
+    keys = [cache.run("stage", i, {}, lambda: one)[1] for i in range(3)]
+    os.utime(os.path.join(str(tmpdir), keys[0] + ".npy"), (0, 0))
+    os.utime(os.path.join(str(tmpdir), keys[1] + ".npy"), (1, 1))
+    cache.load(keys[0])
+    cache.run("stage", 3, {}, lambda: one)
+
+    assert cache.load(keys[1]) is None
+    assert cache.load(keys[0]) is not None
+    assert cache.size() <= cache.max_size
+
+
+def test_run_stage_without_cache():
+    value, key = run_stage(None, "stage", None, {}, lambda: 42)
+    assert value == 42
+    assert key is None
@@ -0,0 +1,51 @@
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from util import (synthetic_track, kep_state)
+from benchmarks import run_benchmarks
+import numpy as np
+import pytest
+from numpy.testing import (assert_array_equal, assert_allclose)
+
+kep = np.array([7000.0, 0.01, 51.6, 30.0, 120.0, 45.0])
+
+
+# The same seed has to give the same track
+def test_seeded():
+    track1, _ = synthetic_track.generate_track(kep, length=100, noise=1.0, cadence_jitter=0.5, seed=3)
+    track2, _ = synthetic_track.generate_track(kep, length=100, noise=1.0, cadence_jitter=0.5, seed=3)
+    track3, _ = synthetic_track.generate_track(kep, length=100, noise=1.0, cadence_jitter=0.5, seed=4)
+
+    assert_array_equal(track1, track2)
+    assert not np.array_equal(track1, track3)
+
+
+# The first truth point is the state given by the keplerian elements
+def test_truth_matches_kep_state():
+    _, truth = synthetic_track.generate_track(kep, length=10)
+    expected = np.ravel(kep_state.kep_state(np.reshape(kep, (6, 1))))[0:3]
+
+    assert_allclose(truth[0, 1:4], expected, rtol=1e-9)
+
+
+def test_noise_and_cadence():
+    track, truth = synthetic_track.generate_track(kep, length=5000, cadence=2.0, noise=0.5, seed=0)
+
+    assert_allclose(np.diff(track[:, 0]), 2.0)
+    assert np.std(track[:, 1:4] - truth[:, 1:4]) == pytest.approx(0.5, rel=0.05)
+
+
+def test_gaps():
+    track, truth = synthetic_track.generate_track(kep, length=1000, gap_period=100, gap_fraction=0.3)
+
+    assert len(track) == 700
+    assert np.max(np.diff(track[:, 0])) == pytest.approx(31.0)
+
+
+# Runs the benchmark suite on a tiny track and compares it with itself
+def test_benchmarks():
+    results = run_benchmarks.run(["sav_golay", "gibbs"], length=51, repeat=1)
+
+    assert set(results["benchmarks"]) == {"sav_golay", "gibbs"}
+    assert results["meta"]["length"] == 51
+    assert run_benchmarks.compare(results, results) == {}
@@ -0,0 +1,63 @@
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from util import (window_sweep, golay_window)
+import numpy as np
+from numpy.testing import assert_array_equal
+
+grid = dict(errors=[1.0, 10.0], tma_windows=[3], windows=[2, 11, 51, 401], degrees=[3, 4], seeds=2, length=300)
+
+
+def test_sweep_grid():
+    result = window_sweep.sweep(**grid)
+
+    assert result["rms"].shape == (2, 2, 1, 4, 2)
+    assert result["computed"] == 32
+    # even windows and windows longer than the track are skipped
+    assert np.all(np.isnan(result["rms"][:, :, :, 0]))
+    assert np.all(np.isnan(result["rms"][:, :, :, 3]))
+    assert np.all(result["rms"][:, :, :, 1:3] > 0)
+
+    errors, windows, rms = window_sweep.best_windows(result)
+    assert_array_equal(errors, [1.0, 10.0])
+    assert set(windows) <= {11, 51}
+    assert rms[1] > rms[0]
+
+
+def test_sweep_resume(tmpdir):
+    first = window_sweep.sweep(cache_dir=str(tmpdir), **grid)
+    second = window_sweep.sweep(cache_dir=str(tmpdir), **grid)
+
+    assert first["computed"] == 32
+    assert second["computed"] == 0
+    assert_array_equal(first["rms"], second["rms"])
+
+    # a larger grid only computes the new results
+    third = window_sweep.sweep(cache_dir=str(tmpdir), **dict(grid, errors=[1.0, 10.0, 20.0]))
+    assert third["computed"] == 16
+
+    # so does a new window or degree, the results of the others are kept
+    fourth = window_sweep.sweep(cache_dir=str(tmpdir), **dict(grid, windows=[2, 11, 21, 51, 401], degrees=[2, 3, 4]))
+    assert fourth["computed"] == 4 * 5 * 3 - 4 * 4 * 2
+    assert_array_equal(fourth["rms"][:, :, :, [0, 1, 3, 4]][..., 1:3], first["rms"])
+
+
+def test_sweep_workers(tmpdir):
+    serial = window_sweep.sweep(**grid)
+    parallel = window_sweep.sweep(cache_dir=str(tmpdir), workers=2, **grid)
+
+    assert parallel["computed"] == 32
+    assert_array_equal(serial["rms"], parallel["rms"])
+
+
+def test_window_params():
+    data = np.zeros((1000, 4))
+
+    assert golay_window.window(2.0, data) == golay_window.window(2.0, data, golay_window.DEFAULT_PARAMS)
+    assert golay_window.window(2.0, data, (20.0, 0.0, 1.0, 1.0)) == 51
+
+    # the fit recovers the parameters of windows that follow the curve
+    params = (15.0, 2e6, 1.5, 4.0)
+    errors = np.array([0.5, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 20.0])
+    windows = 1e6 / (params[0] + params[1] / (1 + (errors / params[2]) ** params[3]))
+    assert np.allclose(window_sweep.fit_curve(errors, windows, 1e6), params, rtol=1e-3)
@@ -1,6 +1,10 @@
 """Vectorized anomaly conversion scripts"""
 
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
 import numpy as np
+from util import kepler
 
 def true_to_ecc(theta,e):
     """Converts true anomaly to eccentric anomaly.
@@ -13,16 +17,7 @@ def true_to_ecc(theta,e):
            numpy array: array of eccentric anomalies (in radians)
     """
 
-    pi2=2*np.pi
-    raw = np.arctan2((1-e**2)*np.sin(theta), e+np.cos(theta))
-    raw = raw%pi2
-
-    # revolution correction code
-    correct = (theta//pi2)*pi2
-    raw = raw+correct
-    correct = np.clip((raw-theta)//pi2,0,None)*pi2
-
-    return raw-correct
+    return kepler.true_to_ecc(theta,e)
 
 def ecc_to_mean(E,e):
     """Converts eccentric anomaly to mean anomaly.
@@ -35,7 +30,7 @@ def ecc_to_mean(E,e):
            numpy array: array of mean anomalies (in radians)
     """
 
-    return E - e*np.sin(E)
+    return kepler.ecc_to_mean(E,e)
 
 def mean_to_t(M,a):
     """Converts mean anomaly to time elapsed.
@@ -1,4 +1,9 @@
-def window(error, data):
+# parameters (c0, c1, e0, p) of the curve c = c0 + c1 / (1 + (error / e0) ** p) used for errors up to 40 km. These
+# are the historic defaults, window_sweep.fit_curve can regenerate them from a sweep
+DEFAULT_PARAMS = (10.26, 10676069.73, 1.242, 5.367)
+
+
+def window(error, data, params=None):
     '''
     Calculates the constant c which is needed to determine the savintzky - golay filter window
     window = len(data) / c ,where c is a constant strongly related to the error contained in the data set
@@ -6,13 +11,15 @@ def window(error, data):
     Args:
         error(float): the a-priori error estimation for each measurment
         data(numpy array): the positional data set
+        params(tuple): parameters (c0, c1, e0, p) of the curve for errors up to 40 km, DEFAULT_PARAMS if None
 
     Returns:
         float: constant which describes the window that needs to be inputed to the savintzky - golay filter
 
     '''
+    c0, c1, e0, p = DEFAULT_PARAMS if params is None else params
     if error <= 40.0:
-        c = 10.26 + (10676069.73 / (1 + ((error/1.242)**5.367)))
+        c = c0 + (c1 / (1 + ((error/e0)**p)))
     else:
         c = (- 0.046725 * error) + 13.102
 
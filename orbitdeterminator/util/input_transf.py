@@ -5,69 +5,80 @@ Converts cartesian co-ordinates to spherical co-ordinates and vice versa
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+import numpy as np
 from util import read_data
-from math import *
 
-def cart_to_spher(data):
+def _output(data, out):
+    # the columns of out are used as scratch space, so the input is copied if it shares memory with out
+    if out is None:
+        out = np.empty(np.shape(data))
+    elif np.may_share_memory(out, data):
+        data = np.array(data, dtype=float)
+    return np.asarray(data), out
+
+
+def cart_to_spher(data, out=None):
     '''
     Takes as an input a data set containing points in cartesian format (time, x, y, z) and returns the computed
-    spherical coordinates (time, azimuth, elevation, r)
+    spherical coordinates (time, azimuth, elevation, r). The whole array is converted at once and the input is
+    not modified.
 
     Args:
         data (numpy array): containing the cartesian coordinates in format of (time, x, y, z)
+        out (numpy array): optional float array of the same shape as data to store the result in, can be data
+                           itself for an in place conversion
 
     Returns:
         numpy array: array of spherical coordinates in format of (time, azimuth, elevation, r)
     '''
 
-    for i in range(0, len(data)):
-        x = data[i, 1]
-        y = data[i, 2]
-        z = data[i, 3]
+    data, out = _output(data, out)
+    x, y, z = data[:, 1], data[:, 2], data[:, 3]
 
-        r = sqrt(x**2 + y**2 + z**2)
-        elevation = atan2(z, sqrt(x**2 + y**2))
-        azimuth = atan2(y, x)
-        result = data
-        result[i, 1] = azimuth
-        result[i, 2] = elevation
-        result[i, 3] = r
+    np.hypot(x, y, out=out[:, 3])
+    np.arctan2(z, out[:, 3], out=out[:, 2])
+    np.hypot(out[:, 3], z, out=out[:, 3])
+    np.arctan2(y, x, out=out[:, 1])
+    out[:, 0] = data[:, 0]
 
-    return result
+    return out
 
 
-def spher_to_cart(data):
+def spher_to_cart(data, out=None):
     '''
     Takes as an input a data set containing points in spherical format (time, azimuth, elevation, r) and
-    returns the computed cartesian coordinates (time, x, y, z).
+    returns the computed cartesian coordinates (time, x, y, z). The whole array is converted at once and the
+    input is not modified.
 
     Args:
         data (numpy array): containing the spherical coordinates in format of (time, azimuth, elevation, r)
+        out (numpy array): optional float array of the same shape as data to store the result in, can be data
+                           itself for an in place conversion
 
     Returns:
         numpy array: array of cartesian coordinates in format of (time, x, y, z)
     '''
 
-    for i in range(0, len(data)):
-        elevation = data[i, 1]
-        azimuth = data[i, 2]
-        r = data[i, 3]
-
-        x = r * cos(elevation) * cos(azimuth)
-        y = r * cos(elevation) * sin(azimuth)
-        z = r * sin(elevation)
+    data, out = _output(data, out)
+    azimuth, elevation, r = data[:, 1], data[:, 2], data[:, 3]
 
-        result = data
-        result[i, 1] = x
-        result[i, 2] = y
-        result[i, 3] = z
+    # r * cos(elevation) is kept in the z column until x and y are done
+    np.cos(elevation, out=out[:, 3])
+    out[:, 3] *= r
+    np.cos(azimuth, out=out[:, 1])
+    out[:, 1] *= out[:, 3]
+    np.sin(azimuth, out=out[:, 2])
+    out[:, 2] *= out[:, 3]
+    np.sin(elevation, out=out[:, 3])
+    out[:, 3] *= r
+    out[:, 0] = data[:, 0]
 
-    return result
+    return out
 
 if __name__ == "__main__":
 
     data = read_data.load_data("orbit.csv")
     new_data = cart_to_spher(data)
     same_data = spher_to_cart(new_data)
-    print(same_data == data)
+    print(np.allclose(same_data, data))
 
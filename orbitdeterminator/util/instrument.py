@@ -0,0 +1,196 @@
+'''
+Timers and counters for the stages of the orbit determination pipeline.
+
+Instrumentation is disabled by default. While disabled, timer() returns a shared no-op context manager and
+count() returns after a single flag check, so the hooks can stay in hot code such as the force models.
+Collected metrics can be exported as JSON or in the Prometheus text exposition format.
+'''
+
+import json
+import time
+import threading
+from functools import wraps
+
+_enabled = False
+_lock = threading.Lock()
+_timers = {}
+_counters = {}
+
+
+class _NullTimer():
+    '''Context manager that does nothing, returned by timer() while instrumentation is disabled'''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer():
+    '''Context manager that adds its wall clock duration to the named timer'''
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        with _lock:
+            stats = _timers.get(self.name)
+            if stats is None:
+                _timers[self.name] = [1, elapsed, elapsed]
+            else:
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] = max(stats[2], elapsed)
+        return False
+
+
+def enable():
+    '''Starts collecting metrics'''
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    '''Stops collecting metrics, already collected values are kept'''
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    '''
+    Returns:
+        bool: True if metrics are being collected
+    '''
+    return _enabled
+
+
+def reset():
+    '''Clears all collected metrics'''
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+
+def timer(name):
+    '''
+    Times a block of code
+
+    Args:
+        name (string): name of the timer, e.g. "filtering". A dotted name such as "filtering.window_selection" is a
+            sub-timer, its time is also counted by the enclosing "filtering" timer
+
+    Returns:
+        context manager: adds the duration of the with block to the timer
+    '''
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(name)
+
+
+def timed(name):
+    '''
+    Decorator that times every call of a function
+
+    Args:
+        name (string): name of the timer
+
+    Returns:
+        function: the decorator
+    '''
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, n=1):
+    '''
+    Increments a counter
+
+    Args:
+        name (string): name of the counter, e.g. "force_model_calls"
+        n (int): increment
+    '''
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def metrics():
+    '''
+    Returns:
+        dict: snapshot of the metrics in the format
+        {"timers": {name: {"calls", "total_seconds", "max_seconds"}}, "counters": {name: value}}
+    '''
+    with _lock:
+        timers = {name: {"calls": calls, "total_seconds": total, "max_seconds": longest}
+                  for name, (calls, total, longest) in _timers.items()}
+        counters = dict(_counters)
+
+    return {"timers": timers, "counters": counters}
+
+
+def to_json(indent=2):
+    '''
+    Returns:
+        string: the metrics as a JSON document
+    '''
+    return json.dumps(metrics(), indent=indent, sort_keys=True)
+
+
+def to_prometheus(prefix="orbitdeterminator"):
+    '''
+    Args:
+        prefix (string): prefix of the metric names
+
+    Returns:
+        string: the metrics in the Prometheus text exposition format
+    '''
+    snapshot = metrics()
+    lines = []
+
+    lines.append("# TYPE %s_stage_seconds_total counter" % prefix)
+    for name, stats in sorted(snapshot["timers"].items()):
+        lines.append('%s_stage_seconds_total{stage="%s"} %r' % (prefix, name, stats["total_seconds"]))
+    lines.append("# TYPE %s_stage_calls_total counter" % prefix)
+    for name, stats in sorted(snapshot["timers"].items()):
+        lines.append('%s_stage_calls_total{stage="%s"} %d' % (prefix, name, stats["calls"]))
+    lines.append("# TYPE %s_stage_max_seconds gauge" % prefix)
+    for name, stats in sorted(snapshot["timers"].items()):
+        lines.append('%s_stage_max_seconds{stage="%s"} %r' % (prefix, name, stats["max_seconds"]))
+    for name, value in sorted(snapshot["counters"].items()):
+        lines.append("# TYPE %s_%s_total counter" % (prefix, name))
+        lines.append("%s_%s_total %d" % (prefix, name, value))
+
+    return "\n".join(lines) + "\n"
+
+
+def export(path):
+    '''
+    Writes the metrics to a file, in Prometheus text format if the file name ends with .prom and as JSON otherwise
+
+    Args:
+        path (string): output file
+    '''
+    with open(path, "w") as f:
+        if path.endswith(".prom"):
+            f.write(to_prometheus())
+        else:
+            f.write(to_json())
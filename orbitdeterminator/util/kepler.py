@@ -0,0 +1,130 @@
+"""Vectorized conversions between the mean, eccentric and true anomaly of
+   elliptic orbits. All the functions work element-wise on numpy arrays
+   (or floats), angles are in radians and the number of revolutions of the
+   input is kept, so unwrapped anomalies stay unwrapped.
+
+   Kepler's equation is solved with a fixed number of Halley iterations
+   instead of iterating to a tolerance, so the cost and the precision do
+   not depend on the input. The starter is Danby's E = M + 0.85e, except
+   close to perigee of very eccentric orbits where the root of the cubic
+   expansion E - e(E - E^3/6) = M is used. With this starter three
+   iterations give full double precision for e up to 0.9999.
+"""
+
+import numpy as np
+
+ITERATIONS = 3
+
+def _beta(e):
+    return e/(1+np.sqrt(1-e**2))
+
+def mean_to_ecc(M,e,iterations=ITERATIONS):
+    """Converts mean anomaly to eccentric anomaly by solving Kepler's
+       equation.
+
+       Args:
+           M(numpy array): mean anomalies (in radians)
+           e(float or numpy array): eccentricity, 0 <= e < 1
+           iterations(int): number of Halley iterations
+
+       Returns:
+           numpy array: eccentric anomalies (in radians)
+    """
+
+    M = np.asarray(M,dtype=float)
+    e = np.asarray(e,dtype=float)
+
+    # solve in [-pi,pi) and add the revolutions back at the end
+    m = np.remainder(M+np.pi,2*np.pi)-np.pi
+    E = m+0.85*e*np.sign(m)
+
+    # cubic starter near perigee, solved with Cardano's formula
+    es = np.maximum(e,1e-3)
+    p = 6*(1-es)/es
+    q = -6*m/es
+    d = np.sqrt(q*q/4+p**3/27)
+    E3 = np.cbrt(-q/2+d)+np.cbrt(-q/2-d)
+    E = np.where((e > 0.5) & (np.abs(E3) < 1),E3,E)
+
+    for _ in range(iterations):
+        se, ce = e*np.sin(E), e*np.cos(E)
+        f = E-se-m
+        df = 1-ce
+        E = E-f*df/(df*df-0.5*f*se)
+
+    return E+(M-m)
+
+def ecc_to_mean(E,e):
+    """Converts eccentric anomaly to mean anomaly.
+
+       Args:
+           E(numpy array): eccentric anomalies (in radians)
+           e(float or numpy array): eccentricity
+
+       Returns:
+           numpy array: mean anomalies (in radians)
+    """
+
+    return E-e*np.sin(E)
+
+def ecc_to_true(E,e):
+    """Converts eccentric anomaly to true anomaly.
+
+       Args:
+           E(numpy array): eccentric anomalies (in radians)
+           e(float or numpy array): eccentricity
+
+       Returns:
+           numpy array: true anomalies (in radians)
+    """
+
+    b = _beta(e)
+    return E+2*np.arctan(b*np.sin(E)/(1-b*np.cos(E)))
+
+def true_to_ecc(nu,e):
+    """Converts true anomaly to eccentric anomaly.
+
+       Args:
+           nu(numpy array): true anomalies (in radians)
+           e(float or numpy array): eccentricity
+
+       Returns:
+           numpy array: eccentric anomalies (in radians)
+    """
+
+    b = _beta(e)
+    return nu-2*np.arctan(b*np.sin(nu)/(1+b*np.cos(nu)))
+
+def mean_to_true(M,e,iterations=ITERATIONS):
+    """Converts mean anomaly to true anomaly.
+
+       Args:
+           M(numpy array): mean anomalies (in radians)
+           e(float or numpy array): eccentricity, 0 <= e < 1
+           iterations(int): number of Halley iterations
+
+       Returns:
+           numpy array: true anomalies (in radians)
+    """
+
+    return ecc_to_true(mean_to_ecc(M,e,iterations),e)
+
+def true_to_mean(nu,e):
+    """Converts true anomaly to mean anomaly.
+
+       Args:
+           nu(numpy array): true anomalies (in radians)
+           e(float or numpy array): eccentricity
+
+       Returns:
+           numpy array: mean anomalies (in radians)
+    """
+
+    return ecc_to_mean(true_to_ecc(nu,e),e)
+
+if __name__ == "__main__":
+    M = np.linspace(0,4*np.pi,9)
+    e = 0.7151443
+    nu = mean_to_true(M,e)
+    print(nu)
+    print(true_to_mean(nu,e))
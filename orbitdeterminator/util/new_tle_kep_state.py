@@ -1,8 +1,12 @@
 """This module computes the state vector from keplerian elements."""
 
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
 import math
 import numpy as np
 from scipy.optimize import fsolve
+from util import kepler
 
 mu = 398600.4418
 
@@ -17,25 +21,13 @@ def __MtoE(M,e):
            float: The eccentric anomaly (in radians)
     """
 
-    E = M
-    dy = 1
-    while(abs(dy) > 0.0001):
-        M2 = E - e*math.sin(E)
-        dy = M - M2
-        dx = dy/(1-e*math.cos(E))
-        E = E+dx
-
-    return E
+    return float(kepler.mean_to_ecc(M,e))
 
 def __TtoE(T,e):
-    E = math.atan2((1-e**2)**0.5*math.sin(T),e+math.cos(T))
-    E = E%(2*math.pi)
-    return E
+    return float(kepler.true_to_ecc(T,e)%(2*math.pi))
 
 def __EtoT(E,e):
-    T = math.atan2((1-e**2)**0.5*math.sin(E),math.cos(E)-e)
-    T = T%(2*math.pi)
-    return T
+    return float(kepler.ecc_to_true(E,e)%(2*math.pi))
 
 def MtoT(M,e):
     return __EtoT(__MtoE(M,e),e)
@@ -0,0 +1,296 @@
+'''
+Array backed containers for batches of state vectors and keplerian elements.
+
+Both containers keep all their rows in one Nx7 float64 buffer whose first column is the time:
+
+    StateArray:   (t, x, y, z, vx, vy, vz)
+    ElementArray: (t, a, e, i, ω, Ω, v)
+
+The columns are available as named views (states.x, elements.raan, ...), slicing rows returns a container that
+shares the buffer, also for stepped slices, and np.asarray() returns the buffer itself, so no copies are made when
+they are passed around. Like in numpy, selecting rows with an index array or a mask returns a copy.
+The first four columns of a StateArray are the (time, x, y, z) format used by the filters, so a StateArray can be
+given directly to them.
+'''
+
+import numpy as np
+
+mu = 398600.4405
+
+
+def _column(index, doc):
+    def get(self):
+        return self.data[:, index]
+
+    def set(self, value):
+        self.data[:, index] = value
+
+    return property(get, set, doc=doc)
+
+
+class _OrbitArray(object):
+    '''
+    Common part of StateArray and ElementArray
+    '''
+
+    columns = ()
+
+    def __init__(self, data, contiguous=False):
+        '''
+        Wraps an existing Nx7 array, without copying it if it already is a float64 array. Views such as stepped
+        slices are kept as they are, so writes go through to the array they view
+
+        Args:
+            data (numpy array): Nx7 array with the time in the first column
+            contiguous (bool): copy the array if it is not C contiguous
+        '''
+        data = np.ascontiguousarray(data, dtype=np.float64) if contiguous else np.asarray(data, dtype=np.float64)
+        if data.ndim == 1:
+            data = data.reshape(1, -1)
+        if data.ndim != 2 or data.shape[1] != len(self.columns):
+            raise ValueError("expected an array with %d columns %s, got shape %s"
+                             % (len(self.columns), self.columns, data.shape))
+        self.data = data
+
+    @classmethod
+    def empty(cls, n):
+        '''
+        Creates an uninitialized container of n rows
+        '''
+        return cls(np.empty((n, len(cls.columns))))
+
+    @classmethod
+    def from_columns(cls, t, values):
+        '''
+        Creates a container from the times and an Nx6 array of values
+
+        Args:
+            t (numpy array or float): times of the rows
+            values (numpy array): Nx6 array, or a single row in any shape with 6 values
+
+        Returns:
+            the new container
+        '''
+        values = np.reshape(np.asarray(values, dtype=np.float64), (-1, len(cls.columns) - 1))
+        obj = cls.empty(len(values))
+        obj.data[:, 0] = t
+        obj.data[:, 1:] = values
+        return obj
+
+    t = _column(0, "times")
+
+    def values(self):
+        '''
+        Returns:
+            numpy array: Nx6 view of the buffer without the time column
+        '''
+        return self.data[:, 1:]
+
+    def copy(self):
+        return type(self)(self.data.copy())
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, key):
+        # row selections keep the container type, anything else behaves like the buffer. Slices are views of the
+        # buffer, index arrays and masks are copies as in numpy
+        if isinstance(key, tuple):
+            return self.data[key]
+        if isinstance(key, (int, np.integer)):
+            key = slice(key, key + 1 or None)
+        return type(self)(self.data[key])
+
+    def __setitem__(self, key, value):
+        self.data[key] = np.asarray(value)
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None or np.dtype(dtype) == self.data.dtype:
+            return self.data.copy() if copy else self.data
+        return self.data.astype(dtype)
+
+    def __repr__(self):
+        return "%s(%d rows, columns %s)" % (type(self).__name__, len(self), self.columns)
+
+
+class StateArray(_OrbitArray):
+    '''
+    State vectors (t, x, y, z, vx, vy, vz) in km and km/s
+    '''
+
+    columns = ("t", "x", "y", "z", "vx", "vy", "vz")
+
+    x = _column(1, "x positions")
+    y = _column(2, "y positions")
+    z = _column(3, "z positions")
+    vx = _column(4, "x velocities")
+    vy = _column(5, "y velocities")
+    vz = _column(6, "z velocities")
+
+    @property
+    def r(self):
+        '''Nx3 view of the positions'''
+        return self.data[:, 1:4]
+
+    @property
+    def v(self):
+        '''Nx3 view of the velocities'''
+        return self.data[:, 4:7]
+
+    def track(self):
+        '''
+        Returns:
+            numpy array: Nx4 view (time, x, y, z) of the buffer, in the format used by the filters
+        '''
+        return self.data[:, 0:4]
+
+    @classmethod
+    def from_track(cls, track):
+        '''
+        Creates a StateArray from a positional data set, the velocities are set to NaN
+
+        Args:
+            track (numpy array): Nx4 positional data in format (time, x, y, z)
+        '''
+        track = np.asarray(track, dtype=np.float64)
+        obj = cls.empty(len(track))
+        obj.data[:, 0:4] = track[:, 0:4]
+        obj.data[:, 4:7] = np.nan
+        return obj
+
+    @classmethod
+    def from_elements(cls, elements):
+        '''
+        Converts keplerian elements to state vectors, all the rows at once. Same conversion as kep_state.kep_state
+
+        Args:
+            elements (ElementArray): the keplerian elements
+
+        Returns:
+            StateArray: the state vectors at the same times
+        '''
+        a, e = elements.a, elements.e
+        inc, argp, raan, nu = np.radians(elements.data[:, 3:7]).T
+
+        slr = a * (1 - e * e)
+        rm = slr / (1 + e * np.cos(nu))
+        sarglat, carglat = np.sin(argp + nu), np.cos(argp + nu)
+        c4 = np.sqrt(mu / slr)
+        c5 = e * np.cos(argp) + carglat
+        c6 = e * np.sin(argp) + sarglat
+        sinc, cinc = np.sin(inc), np.cos(inc)
+        sraan, craan = np.sin(raan), np.cos(raan)
+
+        obj = cls.empty(len(elements))
+        obj.data[:, 0] = elements.t
+        obj.data[:, 1] = rm * (craan * carglat - sraan * cinc * sarglat)
+        obj.data[:, 2] = rm * (sraan * carglat + cinc * sarglat * craan)
+        obj.data[:, 3] = rm * sinc * sarglat
+        obj.data[:, 4] = -c4 * (craan * c6 + sraan * cinc * c5)
+        obj.data[:, 5] = -c4 * (sraan * c6 - craan * cinc * c5)
+        obj.data[:, 6] = c4 * c5 * sinc
+        return obj
+
+
+class ElementArray(_OrbitArray):
+    '''
+    Keplerian elements (t, a, e, i, ω, Ω, v): semi major axis in km, eccentricity, inclination, argument of
+    perigee, right ascension of the ascending node and true anomaly in degrees
+    '''
+
+    columns = ("t", "a", "e", "inc", "argp", "raan", "nu")
+
+    a = _column(1, "semi major axes")
+    e = _column(2, "eccentricities")
+    inc = _column(3, "inclinations")
+    argp = _column(4, "arguments of perigee")
+    raan = _column(5, "right ascensions of the ascending node")
+    nu = _column(6, "true anomalies")
+
+    def elements(self):
+        '''
+        Returns:
+            numpy array: Nx6 view (a, e, i, ω, Ω, v) of the buffer, in the format used by the kalman filter
+        '''
+        return self.data[:, 1:7]
+
+    @classmethod
+    def from_gibbs(cls, elements, t=0.0):
+        '''
+        Creates an ElementArray from the output of Gibbs.orbital_elements, which is in the order
+        (a, i, Ω, e, ω, v)
+
+        Args:
+            elements (list): one or more lists of elements as returned by Gibbs.orbital_elements
+            t (numpy array or float): times of the elements
+        '''
+        elements = np.reshape(np.asarray(elements, dtype=np.float64), (-1, 6))
+        return cls.from_columns(t, elements[:, [0, 3, 1, 4, 2, 5]])
+
+    @classmethod
+    def from_states(cls, states):
+        '''
+        Converts state vectors to keplerian elements, all the rows at once. Same conversion as state_kep.state_kep
+
+        Args:
+            states (StateArray): the state vectors
+
+        Returns:
+            ElementArray: the keplerian elements at the same times
+        '''
+        r, v = states.r, states.v
+        mag_r = np.sqrt(np.sum(r * r, axis=1))
+        mag_v = np.sqrt(np.sum(v * v, axis=1))
+
+        h = np.cross(r, v)
+        mag_h = np.sqrt(np.sum(h * h, axis=1))
+
+        e = np.cross(v, h) / mu - r / mag_r[:, None]
+        mag_e = np.sqrt(np.sum(e * e, axis=1))
+
+        n = np.column_stack((-h[:, 1], h[:, 0], np.zeros(len(h))))
+        mag_n = np.sqrt(np.sum(n * n, axis=1))
+
+        def angle(cos, flip):
+            ang = np.arccos(np.clip(cos, -1, 1))
+            return np.degrees(np.where(flip, 2 * np.pi - ang, ang))
+
+        obj = cls.empty(len(states))
+        obj.data[:, 0] = states.t
+        obj.data[:, 1] = 1 / ((2 / mag_r) - (mag_v ** 2 / mu))
+        obj.data[:, 2] = mag_e
+        obj.data[:, 3] = np.degrees(np.arccos(np.clip(h[:, 2] / mag_h, -1, 1)))
+        obj.data[:, 4] = angle(np.sum(n * e, axis=1) / (mag_n * mag_e), e[:, 2] < 0)
+        obj.data[:, 5] = angle(n[:, 0] / mag_n, n[:, 1] < 0)
+        obj.data[:, 6] = angle(np.sum(e * r, axis=1) / (mag_r * mag_e), np.sum(r * v, axis=1) < 0)
+        return obj
+
+
+def as_track(data):
+    '''
+    Returns the (time, x, y, z) view of a StateArray, any other input is returned unchanged
+
+    Args:
+        data (StateArray or numpy array): positional data
+
+    Returns:
+        numpy array: positional data in format (time, x, y, z, ...)
+    '''
+    if isinstance(data, StateArray):
+        return data.track()
+    return data
+
+
+def as_elements(kep):
+    '''
+    Returns the (a, e, i, ω, Ω, v) view of an ElementArray, any other input is returned unchanged
+
+    Args:
+        kep (ElementArray or numpy array): keplerian elements
+
+    Returns:
+        numpy array: keplerian elements in format (a, e, i, ω, Ω, v)
+    '''
+    if isinstance(kep, ElementArray):
+        return kep.elements()
+    return kep
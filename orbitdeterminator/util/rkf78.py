@@ -3,9 +3,13 @@ Uses Runge Kutta Fehlberg 7(8) numerical integration method to compute the state
 a time interval tf
 '''
 
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
 from math import *
 from decimal import *
 import numpy as np
+from util import instrument
 np.set_printoptions(precision=16)
 
 
@@ -20,6 +24,7 @@ def ypol_a(y):
         numpy array: derivative of the state vector (velocity + acceleration)
 
     '''
+    instrument.count("force_model_calls")
     mu=398600.4405
     y_parag = np.zeros((6,1))
     agrav = np.zeros((3,1))
@@ -0,0 +1,188 @@
+'''
+Content addressed on-disk cache for the stages of the orbit determination pipeline.
+
+Every stage result is stored as a .npy file named after a hash of the stage name, the key of the stage it
+depends on (or the raw input data for the first stage) and the stage parameters. Because the key of a stage
+contains the key of its parent, changing a parameter of a late stage only invalidates that stage and the ones
+after it. The cache is bounded in size and evicts the least recently used entries first.
+'''
+
+import os
+import hashlib
+import numpy as np
+
+
+class StageCache():
+    '''
+    On-disk cache of numpy arrays with LRU size based eviction
+    '''
+
+    def __init__(self, directory, max_size=256 * 2**20):
+        '''
+        Args:
+            directory (string): folder where the cached stage outputs are stored, created if missing
+            max_size (int): maximum size of the cache in bytes
+        '''
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def digest(obj):
+        '''
+        Computes the hash of a stage input or parameter
+
+        Args:
+            obj: numpy array, bytes, string, number or a dict/list/tuple of those
+
+        Returns:
+            string: hex digest of obj
+        '''
+        h = hashlib.sha1()
+        if isinstance(obj, np.ndarray):
+            obj = np.ascontiguousarray(obj)
+            h.update(str(obj.dtype).encode())
+            h.update(str(obj.shape).encode())
+            h.update(obj.tobytes())
+        elif isinstance(obj, bytes):
+            h.update(obj)
+        elif isinstance(obj, dict):
+            for name in sorted(obj):
+                h.update(name.encode())
+                h.update(StageCache.digest(obj[name]).encode())
+        elif isinstance(obj, (list, tuple)):
+            for item in obj:
+                h.update(StageCache.digest(item).encode())
+        else:
+            h.update(repr(obj).encode())
+
+        return h.hexdigest()
+
+    def key(self, stage, parent, params):
+        '''
+        Computes the cache key of a stage
+
+        Args:
+            stage (string): name of the stage
+            parent: key of the stage this one depends on, or the raw input of the first stage
+            params (dict): parameters of the stage
+
+        Returns:
+            string: the cache key
+        '''
+        return self.digest((stage, parent, params))
+
+    def __path(self, key):
+        return os.path.join(self.directory, key + ".npy")
+
+    def load(self, key):
+        '''
+        Loads a cached stage output and marks it as recently used
+
+        Args:
+            key (string): cache key
+
+        Returns:
+            numpy array: the cached output or None if it is not in the cache
+        '''
+        path = self.__path(key)
+        try:
+            value = np.load(path)
+        except (IOError, ValueError):
+            return None
+        os.utime(path, None)
+
+        return value
+
+    def store(self, key, value, evict=True):
+        '''
+        Stores a stage output and evicts old entries if the cache became too large
+
+        Args:
+            key (string): cache key
+            value (numpy array): output of the stage
+            evict (bool): evict old entries now, False to call evict once after many stores
+        '''
+        path = self.__path(key)
+        tmp = path + ".%d.tmp" % os.getpid()
+        with open(tmp, "wb") as f:
+            np.save(f, np.asarray(value))
+        os.replace(tmp, path)
+        if evict:
+            self.evict()
+
+    def size(self):
+        '''
+        Returns:
+            int: total size of the cached entries in bytes
+        '''
+        return sum(size for _, size, _ in self.__entries())
+
+    def __entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npy"):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    # evicted by another process sharing the directory
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+        return entries
+
+    def evict(self):
+        '''
+        Deletes the least recently used entries until the cache fits in max_size
+        '''
+        entries = sorted(self.__entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
+
+    def run(self, stage, parent, params, func):
+        '''
+        Returns the cached output of a stage, computing and storing it on a miss
+
+        Args:
+            stage (string): name of the stage
+            parent: key of the stage this one depends on, or the raw input of the first stage
+            params (dict): parameters of the stage
+            func (function): computes the output of the stage, called without arguments
+
+        Returns:
+            tuple: (output of the stage, cache key of the stage)
+        '''
+        key = self.key(stage, parent, params)
+        value = self.load(key)
+        if value is None:
+            value = func()
+            self.store(key, value)
+
+        return value, key
+
+
+def run_stage(cache, stage, parent, params, func):
+    '''
+    Runs a pipeline stage through cache, or directly if cache is None
+
+    Args:
+        cache (StageCache): the cache or None
+        stage (string): name of the stage
+        parent: key of the stage this one depends on, or the raw input of the first stage
+        params (dict): parameters of the stage
+        func (function): computes the output of the stage, called without arguments
+
+    Returns:
+        tuple: (output of the stage, cache key of the stage or None when there is no cache)
+    '''
+    if cache is None:
+        return func(), None
+
+    return cache.run(stage, parent, params, func)
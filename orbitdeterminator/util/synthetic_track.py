@@ -0,0 +1,92 @@
+'''
+Generates synthetic positional tracks (time, x, y, z) of a satellite on a keplerian orbit together with the
+noise free truth. Length, cadence, gaussian noise and gaps between passes are configurable and every track is
+reproducible from its seed.
+'''
+
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+import numpy as np
+from util import kepler
+
+mu = 398600.4405
+
+
+def kepler_positions(kep, t):
+    '''
+    Computes the positions of a satellite on an unperturbed keplerian orbit
+
+    Args:
+        kep (numpy array): keplerian elements at t = 0 in the format [semi major axis (km), eccentricity,
+                           inclination (deg), argument of perigee (deg), right ascension of the ascending node (deg),
+                           true anomaly (deg)]
+        t (numpy array): times in seconds after the epoch of kep
+
+    Returns:
+        numpy array: nx3 array of positions (x, y, z) in km
+    '''
+    a, e = kep[0], kep[1]
+    inc, argp, raan, nu0 = np.radians(kep[2:6])
+
+    M = kepler.true_to_mean(nu0, e) + np.sqrt(mu / a ** 3) * np.asarray(t, dtype=float)
+    E = kepler.mean_to_ecc(M, e)
+
+    x_p = a * (np.cos(E) - e)
+    y_p = a * np.sqrt(1 - e ** 2) * np.sin(E)
+
+    cw, sw = np.cos(argp), np.sin(argp)
+    co, so = np.cos(raan), np.sin(raan)
+    ci, si = np.cos(inc), np.sin(inc)
+    P = np.array([co * cw - so * sw * ci, so * cw + co * sw * ci, sw * si])
+    Q = np.array([-co * sw - so * cw * ci, -so * sw + co * cw * ci, cw * si])
+
+    return np.outer(x_p, P) + np.outer(y_p, Q)
+
+
+def generate_track(kep, length=1000, cadence=1.0, noise=0.0, cadence_jitter=0.0, gap_period=None,
+                   gap_fraction=0.0, t0=0.0, seed=None):
+    '''
+    Generates a noisy synthetic track and its truth
+
+    Args:
+        kep (numpy array): keplerian elements at t0, see kepler_positions
+        length (int): number of points in the track before the gaps are removed
+        cadence (float): mean time in seconds between two observations
+        noise (float): standard deviation of the gaussian noise added to every axis, in km
+        cadence_jitter (float): between 0 and 1, the intervals between observations are drawn uniformly from
+                                cadence * [1 - cadence_jitter, 1 + cadence_jitter]
+        gap_period (float): time in seconds between the starts of two consecutive passes, None for no gaps
+        gap_fraction (float): between 0 and 1, fraction of every gap_period without observations
+        t0 (float): time of the first observation
+        seed (int): seed of the random generator
+
+    Returns:
+        tuple: (track, truth), two numpy arrays in the format (time, x, y, z)
+    '''
+    rng = np.random.RandomState(seed)
+
+    if cadence_jitter > 0:
+        steps = cadence * rng.uniform(1 - cadence_jitter, 1 + cadence_jitter, length - 1)
+    else:
+        steps = np.full(length - 1, float(cadence))
+    t = np.concatenate(([0.0], np.cumsum(steps)))
+
+    if gap_period is not None and gap_fraction > 0:
+        t = t[np.mod(t, gap_period) < (1 - gap_fraction) * gap_period]
+
+    truth = np.empty((len(t), 4))
+    truth[:, 0] = t + t0
+    truth[:, 1:4] = kepler_positions(kep, t)
+
+    track = truth.copy()
+    if noise > 0:
+        track[:, 1:4] += rng.normal(0.0, noise, (len(t), 3))
+
+    return track, truth
+
+
+if __name__ == "__main__":
+    iss_kep = np.array([6785.6420, 0.0003456, 51.6418, 290.0933, 266.6543, 212.4306])
+    track, truth = generate_track(iss_kep, length=10, noise=0.5, seed=0)
+    print(track)
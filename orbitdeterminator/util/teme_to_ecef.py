@@ -3,6 +3,35 @@
 from datetime import datetime, timezone
 import numpy as np
 
+def gmst(t,t_ref=None):
+    """Greenwich mean sidereal time, the angle between the TEME and the ECEF
+       frames.
+
+       Args:
+           t(float or numpy array): unix timestamps
+           t_ref(float): the sidereal time at the UTC midnight before t_ref
+                         is continued linearly to all the times, if None the
+                         midnight before every time is used
+
+       Returns:
+           float or numpy array: the sidereal times in degrees, in [0,360)
+    """
+
+    t = np.asarray(t,dtype=float)
+    if t_ref is None:
+        t_mid = np.floor(t/86400)*86400
+    else:
+        midnight = datetime.fromtimestamp(t_ref,tz=timezone.utc)
+        midnight = midnight.replace(hour=0,minute=0,second=0,microsecond=0)
+        t_mid = midnight.timestamp()
+
+    J2000 = 946728000
+    Tu = (t_mid-J2000)/86400/36525
+    tg0h = 24110.54841 + 8640184.812866*Tu + 0.093104*Tu**2 - 6.2e-6*Tu**3
+    we = 1.00273790935
+    tgt = tg0h + we*(t-t_mid)
+    return (tgt%86400)*360/86400
+
 def conv_to_ecef(coords):
     """Converts coordinates in TEME frame to ECEF frame.
 
@@ -26,16 +55,7 @@ def conv_to_ecef(coords):
     lat = np.degrees(np.arcsin(z/alt))
     lng = np.degrees(np.arctan2(y,x)%(2*np.pi))
 
-    midnight = datetime.fromtimestamp(t[0],tz=timezone.utc)
-    midnight = midnight.replace(hour=0,minute=0,second=0,microsecond=0)
-    t_mid = midnight.timestamp()
-
-    J2000 = 946728000
-    Tu = (t_mid-J2000)/86400/36525
-    tg0h = 24110.54841 + 8640184.812866*Tu + 0.093104*Tu**2 - 6.2e-6*Tu**3
-    we = 1.00273790935
-    tgt = tg0h + we*(t-t_mid)
-    era = (tgt%86400)*360/86400
+    era = gmst(t,t[0])
     lng = lng-era
     return np.column_stack((t,lat,lng,alt))
 
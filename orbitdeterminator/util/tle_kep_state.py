@@ -1,12 +1,16 @@
 """Old script kinda bad coding practises.
 Important! Output state vector in km"""
 
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
 import numpy as np
 from math import *
+from util import kepler
 
 
 def Mtov(M, e):
-	# Computes true anomaly v from a given mean anomaly M and eccentricity e by using Newton-Raphson method
+	# Computes true anomaly v from a given mean anomaly M and eccentricity e by solving Kepler's equation
 
 	# input
 
@@ -16,18 +20,7 @@ def Mtov(M, e):
 	# output
 
 	# v = true anomaly (degrees)
-	i = 1
-	Eo = 100
-	while True:
-		E = Eo - ((Eo - e * sin(Eo) - M) / (1 - e * cos(Eo)))
-		Eo = E
-		i = i + 1
-		if i == 100: break
-
-	v_pre = (cos(E) - e) / (1 - e * cos(E))
-	v = acos(v_pre)
-	v = degrees(v)
-	return v
+	return degrees(kepler.mean_to_true(radians(M), e)) % 360
 
 
 def Kep_state(kep):
@@ -0,0 +1,235 @@
+'''
+Recalibrates the curve that golay_window uses to choose the Savintzky - Golay window for an a-priori error.
+
+For every error level a few synthetic tracks with known truth are generated and filtered with every combination of
+triple moving average window, Savintzky - Golay window and polynomial degree of the grid, and the RMS of the
+residuals against the truth is recorded. The best window of every error level gives the constant c = length / window
+and the curve c(error) of golay_window is refitted to them.
+
+The grid is split into cells of one track and one triple moving average window, which run on a process pool. With
+a cache directory the result of every window and degree of every cell is stored in a StageCache, so an interrupted
+sweep resumes where it stopped and a sweep with a larger grid only computes the new results:
+
+    python util/window_sweep.py --cache sweep_cache --workers 4 -o sweep.json
+'''
+
+import sys
+import os.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+
+import json
+import argparse
+import numpy as np
+
+from util import (synthetic_track, golay_window, stage_cache)
+
+# ISS like orbit used for the synthetic tracks
+_KEP = np.array([6785.6420, 0.0003456, 51.6418, 290.0933, 266.6543, 212.4306])
+
+ERRORS = [0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 40.0]
+TMA_WINDOWS = [2, 3, 5]
+WINDOWS = [5, 7, 11, 15, 21, 31, 45, 61, 91, 121, 181, 241, 301, 401, 501]
+DEGREES = [2, 3, 4, 5]
+
+
+def _score_cell(cell, pairs):
+    '''
+    Filters one synthetic track with one triple moving average window and some Savintzky - Golay windows and degrees
+
+    Args:
+        cell (dict): the track and the triple moving average window
+        pairs (list): (window, degree) pairs to score
+
+    Returns:
+        list: RMS of the residuals against the truth in km of every pair, NaN where the window is not valid for the
+        degree or the track
+    '''
+    from filters import (sav_golay, triple_moving_average)
+
+    track, truth = synthetic_track.generate_track(_KEP, length=cell["length"], cadence=cell["cadence"],
+                                                  noise=cell["error"], seed=cell["seed"])
+    filtered = triple_moving_average.generate_filtered_data(track, cell["tma_window"])
+
+    rms = []
+    for window, degree in pairs:
+        if window % 2 == 0 or window <= degree or window > len(track):
+            rms.append(np.nan)
+            continue
+        res = sav_golay.golay(filtered, window, degree)[:, 1:4] - truth[:, 1:4]
+        rms.append(np.sqrt(np.mean(res ** 2)))
+
+    return rms
+
+
+def _run_cell(cell, cache=None):
+    '''
+    Scores a cell for all the windows and degrees of the grid. With a cache every (window, degree) result is a
+    separate entry and only the missing ones are computed
+
+    Returns:
+        tuple: (rms of the cell, len(windows)xlen(degrees), number of results that were computed)
+    '''
+    pairs = [(w, d) for w in cell["windows"] for d in cell["degrees"]]
+    params = {name: value for name, value in cell.items() if name not in ("windows", "degrees")}
+    keys = [None] * len(pairs)
+    rms = [None] * len(pairs)
+
+    if cache is not None:
+        for i, (window, degree) in enumerate(pairs):
+            keys[i] = cache.key("window_sweep", None, dict(params, window=window, degree=degree))
+            value = cache.load(keys[i])
+            if value is not None:
+                rms[i] = float(value)
+
+    missing = [i for i, value in enumerate(rms) if value is None]
+    if missing:
+        for i, value in zip(missing, _score_cell(cell, [pairs[i] for i in missing])):
+            rms[i] = value
+            if cache is not None:
+                # the sweep evicts once at the end instead of listing the directory at every store
+                cache.store(keys[i], value, evict=False)
+
+    return np.reshape(rms, (len(cell["windows"]), len(cell["degrees"]))), len(missing)
+
+
+# cache of the worker processes, created once per process by _init_worker
+_cache = None
+
+
+def _init_worker(cache_dir):
+    global _cache
+    _cache = None if cache_dir is None else stage_cache.StageCache(cache_dir, max_size=2**40)
+
+
+def _run_worker_cell(cell):
+    return _run_cell(cell, _cache)
+
+
+def sweep(errors=ERRORS, tma_windows=TMA_WINDOWS, windows=WINDOWS, degrees=DEGREES, seeds=3, length=3000,
+          cadence=1.0, cache_dir=None, workers=1):
+    '''
+    Runs the sweep over the whole grid
+
+    Args:
+        errors (list): noise levels of the synthetic tracks, standard deviation in km
+        tma_windows (list): windows of the triple moving average
+        windows (list): windows of the Savintzky - Golay filter, odd
+        degrees (list): degrees of the Savintzky - Golay polynomial
+        seeds (int): number of synthetic tracks per error level
+        length (int): number of points of the synthetic tracks
+        cadence (float): seconds between two points of the tracks
+        cache_dir (string): directory of the cache of the results, no cache if None
+        workers (int): number of processes
+
+    Returns:
+        dict: the grid, "rms" with shape (errors, seeds, tma_windows, windows, degrees) and "computed", the number
+        of (window, degree) results that were not found in the cache
+    '''
+    cells = [{"error": float(error), "seed": seed, "tma_window": int(tma), "windows": [int(w) for w in windows],
+              "degrees": [int(d) for d in degrees], "length": int(length), "cadence": float(cadence)}
+             for error in errors for seed in range(seeds) for tma in tma_windows]
+
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cache_dir,)) as pool:
+            results = list(pool.map(_run_worker_cell, cells))
+    else:
+        _init_worker(cache_dir)
+        results = [_run_cell(cell, _cache) for cell in cells]
+
+    if cache_dir is not None:
+        stage_cache.StageCache(cache_dir, max_size=2**40).evict()
+
+    rms = np.array([r for r, _ in results]).reshape(len(errors), seeds, len(tma_windows), len(windows), len(degrees))
+
+    return {"errors": list(errors), "tma_windows": list(tma_windows), "windows": list(windows),
+            "degrees": list(degrees), "seeds": seeds, "length": length, "cadence": cadence, "rms": rms,
+            "computed": sum(computed for _, computed in results)}
+
+
+def best_windows(result, tma_window=3, degree=3):
+    '''
+    Finds the window with the lowest mean RMS over the tracks of every error level
+
+    Args:
+        result (dict): output of sweep
+        tma_window (int): triple moving average window of the pipeline
+        degree (int): Savintzky - Golay degree of the pipeline
+
+    Returns:
+        tuple: (errors, best windows, RMS of the best windows) as numpy arrays
+    '''
+    t = result["tma_windows"].index(tma_window)
+    d = result["degrees"].index(degree)
+    mean_rms = np.mean(result["rms"][:, :, t, :, d], axis=1)
+
+    with np.errstate(invalid='ignore'):
+        best = np.nanargmin(mean_rms, axis=1)
+    windows = np.asarray(result["windows"])[best]
+    return np.asarray(result["errors"], dtype=float), windows, mean_rms[np.arange(len(best)), best]
+
+
+def fit_curve(errors, windows, length, params=golay_window.DEFAULT_PARAMS):
+    '''
+    Fits the parameters of the golay_window curve c = c0 + c1 / (1 + (error / e0) ** p) to the best windows, with
+    c = length / window. The fit is done on log(c) because c spans several orders of magnitude
+
+    Args:
+        errors (numpy array): error levels up to 40 km, at least 4
+        windows (numpy array): best window of every error level
+        length (int): number of points of the tracks the windows were found for
+        params (tuple): initial guess of (c0, c1, e0, p)
+
+    Returns:
+        tuple: the fitted (c0, c1, e0, p), to be given to golay_window.window
+    '''
+    # scipy.optimize is slow to import, so load it only when fitting
+    from scipy.optimize import curve_fit
+
+    errors = np.asarray(errors, dtype=float)
+    c = length / np.asarray(windows, dtype=float)
+    keep = errors <= 40.0
+    if np.count_nonzero(keep) < 4:
+        raise ValueError("at least 4 error levels up to 40 km are needed to fit the curve")
+
+    def log_curve(error, c0, c1, e0, p):
+        return np.log(c0 + c1 / (1 + (error / e0) ** p))
+
+    fitted, _ = curve_fit(log_curve, errors[keep], np.log(c[keep]), p0=params, bounds=(1e-9, np.inf),
+                          maxfev=20000)
+    return tuple(float(x) for x in fitted)
+
+
+def read_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-o', '--output', type=str, help="JSON file for the results", default='window_sweep.json')
+    parser.add_argument('-c', '--cache', type=str, help="directory of the cell cache, to resume sweeps",
+                        default=None)
+    parser.add_argument('-w', '--workers', type=int, help="number of processes", default=1)
+    parser.add_argument('-n', '--length', type=int, help="number of points of the synthetic tracks", default=3000)
+    parser.add_argument('--cadence', type=float, help="seconds between observations", default=1.0)
+    parser.add_argument('-s', '--seeds', type=int, help="synthetic tracks per error level", default=3)
+    parser.add_argument('--errors', type=float, nargs='*', default=ERRORS, help="error levels in km")
+    parser.add_argument('--tma_windows', type=int, nargs='*', default=TMA_WINDOWS,
+                        help="triple moving average windows")
+    parser.add_argument('--windows', type=int, nargs='*', default=WINDOWS, help="Savintzky - Golay windows")
+    parser.add_argument('--degrees', type=int, nargs='*', default=DEGREES, help="Savintzky - Golay degrees")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = read_args()
+    result = sweep(args.errors, args.tma_windows, args.windows, args.degrees, args.seeds, args.length,
+                   args.cadence, args.cache, args.workers)
+    errors, windows, rms = best_windows(result)
+    params = fit_curve(errors, windows, args.length)
+
+    for error, window, r in zip(errors, windows, rms):
+        print("error %8.3f km: best window %4d, rms %.4f km" % (error, window, r))
+    print("fitted params:", params)
+    print("computed %d results" % result["computed"])
+
+    output = dict(result, rms=result["rms"].tolist(), best_windows=windows.tolist(), best_rms=rms.tolist(),
+                  params=params)
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)